@@ -0,0 +1,375 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import mysql.connector
+
+import main
+from config import DB_CONFIG
+from sql_tokenizer import split_sql_statements
+
+
+logger = logging.getLogger(__name__)
+
+# שם מסד הנתונים בסקריפטים שנוצרים - מוחלף בזמן ההרצה כמו בסקריפטים האמיתיים
+SOURCE_DB_NAME = 'kupathairnew'
+BENCHMARK_DB_NAME = 'script_runner_benchmark'
+
+BENCHMARK_CASES = ('order_file', 'replace_db_name', 'split', 'execute')
+
+# חריגה מותרת מה-baseline לפני שתוצאה נחשבת לרגרסיה
+DEFAULT_TOLERANCE = 0.15
+
+
+class FakeCursor:
+    """cursor מדומה של mysql.connector - מחכה latency שניות לכל round-trip"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.with_rows = False
+        self.rowcount = -1
+        self.warning_count = 0
+        self._results = 0
+
+    def execute(self, operation, params=None):
+        if self.connection.latency:
+            time.sleep(self.connection.latency)
+        self.connection.round_trips += 1
+        # חבילה מרובת הצהרות מחזירה תוצאה לכל הצהרה
+        self._results = operation.count(';\n') + 1
+        self.rowcount = 1
+
+    def nextset(self):
+        self._results -= 1
+        return self._results > 0
+
+    def fetchall(self):
+        return []
+
+    def fetchmany(self, size=1):
+        return []
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """חיבור מדומה - סופר round-trips ו-commits בלי שרת"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.round_trips = 0
+        self.commits = 0
+
+    def cursor(self, buffered=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.latency:
+            time.sleep(self.latency)
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def is_connected(self):
+        return True
+
+    def reconnect(self, attempts=1, delay=0):
+        pass
+
+    def close(self):
+        pass
+
+
+def _write_script(path, statements):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"USE {SOURCE_DB_NAME};\n")
+        for statement in statements:
+            f.write(statement)
+            f.write('\n')
+
+
+def _small_script_statements(index, rows):
+    table = f"`{SOURCE_DB_NAME}`.small_{index}"
+    yield (f"CREATE TABLE IF NOT EXISTS {table} (id INT PRIMARY KEY, name VARCHAR(64), "
+           "amount DECIMAL(10,2)) ENGINE=InnoDB;")
+    yield f"DELETE FROM {table};"
+    for row in range(rows):
+        yield f"INSERT INTO {table} (id, name, amount) VALUES ({row}, 'name-{row} -- not a comment', {row}.50);"
+
+
+def _dump_statements(index, rows):
+    table = f"dump_{index}"
+    yield f"DROP TABLE IF EXISTS {table};"
+    yield (f"CREATE TABLE {table} (id INT PRIMARY KEY, payload VARCHAR(255), "
+           "created DATETIME) ENGINE=InnoDB;")
+    yield f"/*!40000 ALTER TABLE {table} DISABLE KEYS */;"
+    for row in range(rows):
+        yield (f"INSERT INTO {table} VALUES ({row}, 'payload ''{row}'' with; semicolon and \\\\ backslash', "
+               f"'2024-01-01 00:00:00');")
+    yield f"/*!40000 ALTER TABLE {table} ENABLE KEYS */;"
+
+
+def _procedure_statements(index, procedures):
+    yield "DELIMITER $$"
+    for proc in range(procedures):
+        name = f"bench_proc_{index}_{proc}"
+        yield f"DROP PROCEDURE IF EXISTS {name}$$"
+        yield (
+            f"CREATE PROCEDURE {name}(IN p_count INT)\n"
+            "BEGIN\n"
+            "    DECLARE i INT DEFAULT 0;\n"
+            "    /* loop body; with a semicolon in a comment */\n"
+            "    WHILE i < p_count DO\n"
+            "        SET i = i + 1;\n"
+            "    END WHILE;\n"
+            "    SELECT i;\n"
+            "END$$"
+        )
+    yield "DELIMITER ;"
+
+
+def generate_script_tree(root, small_scripts=200, small_rows=20, dumps=2, dump_rows=50000,
+                         procedure_scripts=20, procedures_per_script=10):
+    """יוצר עץ סקריפטים סינתטי וקובץ סדר הרצה - מחזיר את נתיב קובץ הסדר
+
+    כמה סוגי עומס: הרבה סקריפטים קטנים, כמה dumps גדולים של INSERT-ים
+    בודדים וסקריפטים עם הרבה procedures (DELIMITER).
+    """
+    order = []
+    for index in range(small_scripts):
+        relative = f"schema/small_{index:05d}.sql"
+        _write_script(os.path.join(root, relative), _small_script_statements(index, small_rows))
+        order.append(relative)
+    for index in range(procedure_scripts):
+        relative = f"procedures/procs_{index:04d}.sql"
+        _write_script(os.path.join(root, relative), _procedure_statements(index, procedures_per_script))
+        order.append(relative)
+    for index in range(dumps):
+        relative = f"data/dump_{index:03d}.sql"
+        _write_script(os.path.join(root, relative), _dump_statements(index, dump_rows))
+        order.append(relative)
+
+    order_file_path = os.path.join(root, 'execution_order.txt')
+    with open(order_file_path, 'w', encoding='utf-8') as f:
+        for number, relative in enumerate(order, 1):
+            f.write(f"{number}. {relative}\n")
+    logger.info(f"Generated {len(order)} benchmark scripts under {root}")
+    return order_file_path
+
+
+def _timed(func, repeat):
+    """מריץ את func repeat פעמים ומחזיר את הזמן הטוב ביותר ואת התוצאה האחרונה"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _result(name, seconds, statements, size):
+    seconds = max(seconds, 1e-9)
+    return {
+        'case': name,
+        'seconds': round(seconds, 4),
+        'statements': statements,
+        'bytes': size,
+        'statements_per_sec': round(statements / seconds, 1),
+        'mb_per_sec': round(size / seconds / (1024 * 1024), 2),
+    }
+
+
+def run_benchmarks(script_root, order_file_path, connection, cases=BENCHMARK_CASES, repeat=3, options=None):
+    """מריץ את מקרי הבדיקה על עץ הסקריפטים ומחזיר רשימת תוצאות
+
+    connection - FakeConnection או חיבור אמיתי למסד הבדיקה
+    options    - דורס את EXECUTION_OPTIONS לביצוע (batch_statements וכו')
+    """
+    execution_order = main.parse_execution_order_file(order_file_path)
+    script_paths = [os.path.join(script_root, folder, filename) for folder, filename in execution_order]
+    total_bytes = sum(os.path.getsize(path) for path in script_paths)
+    parsed = [split_sql_statements(main.replace_db_name_in_script(path, BENCHMARK_DB_NAME)) for path in script_paths]
+    total_statements = sum(len(statements) for statements in parsed)
+    results = []
+
+    if 'order_file' in cases:
+        seconds, _ = _timed(lambda: main.parse_execution_order_file(order_file_path), repeat)
+        results.append(_result('order_file', seconds, len(execution_order), os.path.getsize(order_file_path)))
+
+    if 'replace_db_name' in cases:
+        seconds, _ = _timed(
+            lambda: [main.replace_db_name_in_script(path, BENCHMARK_DB_NAME) for path in script_paths], repeat
+        )
+        results.append(_result('replace_db_name', seconds, total_statements, total_bytes))
+
+    if 'split' in cases:
+        texts = [main.replace_db_name_in_script(path, BENCHMARK_DB_NAME) for path in script_paths]
+        seconds, _ = _timed(lambda: [split_sql_statements(text) for text in texts], repeat)
+        results.append(_result('split', seconds, total_statements, total_bytes))
+
+    if 'execute' in cases:
+        def execute_all():
+            cursor = connection.cursor()
+            try:
+                for script_path, statements in zip(script_paths, parsed):
+                    if not main.execute_script_statements(cursor, connection, script_path, statements, options):
+                        raise RuntimeError(f"Benchmark script failed: {script_path}")
+            finally:
+                cursor.close()
+        seconds, _ = _timed(execute_all, repeat)
+        results.append(_result('execute', seconds, total_statements, total_bytes))
+
+    return results
+
+
+def connect_local_mysql(host, user, password):
+    """מתחבר ל-mysqld מקומי ומכין את מסד הבדיקה, או מחזיר None אם אין שרת"""
+    config = main.build_connection_config(host, user, password)
+    try:
+        server_connection = mysql.connector.connect(**config)
+        try:
+            cursor = server_connection.cursor()
+            main.ensure_database(cursor, BENCHMARK_DB_NAME)
+            cursor.close()
+        finally:
+            server_connection.close()
+        return mysql.connector.connect(**config, database=BENCHMARK_DB_NAME)
+    except mysql.connector.Error as e:
+        logger.warning(f"No local MySQL server for the benchmark ({e})")
+        return None
+
+
+def load_baseline(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return {result['case']: result for result in json.load(f)['results']}
+
+
+def save_baseline(path, results, metadata):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'metadata': metadata, 'results': results}, f, indent=2)
+    logger.info(f"Benchmark baseline written to {path}")
+
+
+def compare_with_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """מוסיף לכל תוצאה את השינוי מול ה-baseline ומחזיר את המקרים שהאטו מעבר ל-tolerance"""
+    regressions = []
+    for result in results:
+        base = baseline.get(result['case'])
+        if base is None or not base['statements_per_sec']:
+            continue
+        change = result['statements_per_sec'] / base['statements_per_sec'] - 1
+        result['change'] = round(change, 4)
+        if change < -tolerance:
+            regressions.append(result['case'])
+    return regressions
+
+
+def format_results(results):
+    lines = [f"{'Case':<16}{'Seconds':>10}{'Statements':>12}{'Stmts/sec':>14}{'MB/sec':>10}{'vs base':>10}"]
+    for result in results:
+        change = f"{result['change']:+.1%}" if 'change' in result else '-'
+        lines.append(
+            f"{result['case']:<16}{result['seconds']:>10.3f}{result['statements']:>12}"
+            f"{result['statements_per_sec']:>14,.0f}{result['mb_per_sec']:>10.2f}{change:>10}"
+        )
+    return '\n'.join(lines)
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark order-file parsing, preprocessing, splitting and execution.")
+    parser.add_argument('--workdir', help="where to generate the synthetic scripts (default: a temporary folder)")
+    parser.add_argument('--keep', action='store_true', help="keep the generated scripts")
+    parser.add_argument('--cases', default=','.join(BENCHMARK_CASES),
+                        help=f"comma separated cases (default: {','.join(BENCHMARK_CASES)})")
+    parser.add_argument('--repeat', type=int, default=3, help="repetitions per case, the best one is reported")
+    parser.add_argument('--small-scripts', type=int, default=200)
+    parser.add_argument('--small-rows', type=int, default=20)
+    parser.add_argument('--dumps', type=int, default=2)
+    parser.add_argument('--dump-rows', type=int, default=50000)
+    parser.add_argument('--procedure-scripts', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="simulated round-trip latency of the fake connection in seconds")
+    parser.add_argument('--mysql', action='store_true',
+                        help="execute against a local mysqld (falls back to the fake connection if none is running)")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--user', default=DB_CONFIG['user'])
+    parser.add_argument('--password', default=os.environ.get('MYSQL_PWD', DB_CONFIG['password']))
+    parser.add_argument('--batch-statements', type=int, help="statements per round-trip during execution")
+    parser.add_argument('--commit-every', type=int, help="commit every N statements (0 = end of script)")
+    parser.add_argument('--baseline', help="compare against this baseline JSON file")
+    parser.add_argument('--save-baseline', help="store the results as a baseline JSON file")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown against the baseline before failing (default: 0.15)")
+    return parser
+
+
+def run(argv=None):
+    """מריץ את ה-benchmark - מחזיר 1 אם יש רגרסיה מול ה-baseline"""
+    args = build_arg_parser().parse_args(argv)
+    # הודעות ה-INFO לכל סקריפט מעוותות את המדידה
+    logging.getLogger().setLevel(logging.WARNING)
+
+    cases = [case.strip() for case in args.cases.split(',') if case.strip()]
+    unknown = set(cases) - set(BENCHMARK_CASES)
+    if unknown:
+        print(f"Unknown benchmark cases: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    options = {}
+    if args.batch_statements is not None:
+        options['batch_statements'] = args.batch_statements
+    if args.commit_every is not None:
+        options['commit_every_statements'] = args.commit_every
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='runner_bench_')
+    connection = None
+    try:
+        order_file_path = generate_script_tree(
+            workdir, args.small_scripts, args.small_rows, args.dumps, args.dump_rows, args.procedure_scripts
+        )
+        if args.mysql:
+            connection = connect_local_mysql(args.host, args.user, args.password)
+        target = 'mysql' if connection is not None else 'fake'
+        if connection is None:
+            connection = FakeConnection(args.latency)
+
+        results = run_benchmarks(workdir, order_file_path, connection, cases, args.repeat, options)
+    finally:
+        if connection is not None:
+            connection.close()
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    regressions = []
+    if args.baseline:
+        regressions = compare_with_baseline(results, load_baseline(args.baseline), args.tolerance)
+    print(f"Target: {target}" + (f" (latency {args.latency * 1000:.1f} ms)" if target == 'fake' else ''))
+    print(format_results(results))
+
+    if args.save_baseline:
+        metadata = {
+            'target': target,
+            'latency': args.latency,
+            'options': options,
+            'python': sys.version.split()[0],
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        save_baseline(args.save_baseline, results, metadata)
+    if regressions:
+        print(f"\033[91mRegression against baseline: {', '.join(regressions)}\033[0m")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(run())
@@ -0,0 +1,236 @@
+import logging
+import os
+import re
+import tempfile
+
+from sql_tokenizer import utf8_length
+
+
+logger = logging.getLogger(__name__)
+
+BULK_LOAD_MODES = ('extended', 'load_data')
+
+# INSERT/REPLACE של שורה בודדת: החלק שלפני ה-VALUES משמש כמפתח קיבוץ
+_INSERT_PREFIX_RE = re.compile(
+    r'(INSERT|REPLACE)\s+(IGNORE\s+)?(?:INTO\s+)?(`[^`]+`(?:\.`[^`]+`)?|[\w$.]+)\s*(\([^()]*\))?\s*VALUES?\s*',
+    re.IGNORECASE
+)
+
+# תווים מיוחדים בתוך רשימת ערכים - תו בריחה (יחד עם התו שאחריו), מרכאות וסוגריים
+_ROW_TOKEN_RE = re.compile(r"""\\.|['"()]""", re.DOTALL)
+
+# ערך ליטרלי בודד בשורה: מחרוזת, NULL, מספר או TRUE/FALSE - ואחריו פסיק או סוף
+_VALUE_RE = re.compile(
+    r"""\s*(?:'((?:[^'\\]|\\.|'')*)'|"((?:[^"\\]|\\.|"")*)"|(NULL)|(-?\d+(?:\.\d+)?)|(TRUE|FALSE))\s*(?:,|$)""",
+    re.IGNORECASE | re.DOTALL
+)
+
+_SQL_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a', '%': '\\%', '_': '\\_'}
+# מרכאה כפולה ('' או "") היא בריחה רק של המרכאה שפתחה את המחרוזת
+_SQL_ESCAPE_RES = {
+    "'": re.compile(r"\\(.)|''", re.DOTALL),
+    '"': re.compile(r'\\(.)|""', re.DOTALL),
+}
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def parse_single_row_insert(statement):
+    """מפרק INSERT של שורה אחת ל-(prefix, row) או None אם זו לא הצורה הזו
+
+    prefix הוא "INSERT INTO t (cols) VALUES" מנורמל (מפתח לקיבוץ) ו-row הוא "(...)".
+    """
+    match = _INSERT_PREFIX_RE.match(statement)
+    if match is None:
+        return None
+
+    row = statement[match.end():].rstrip()
+    if not row.startswith('(') or not row.endswith(')'):
+        return None
+
+    # וידוא שהסוגר האחרון סוגר את הסוגר הראשון (אחרת יש כמה שורות או ON DUPLICATE)
+    depth = 0
+    quote = None
+    for token in _ROW_TOKEN_RE.finditer(row):
+        char = token.group()
+        if quote is not None:
+            if char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0 and token.end() != len(row):
+                return None
+    if depth != 0 or quote is not None:
+        return None
+
+    prefix = ' '.join(statement[:match.end()].split())
+    return prefix, row
+
+
+def decode_sql_string(text, quote="'"):
+    """מפענח את תוכן מחרוזת SQL (בלי המרכאות) - quote היא המרכאה שפתחה אותה"""
+    def replace(match):
+        escaped = match.group(1)
+        if escaped is None:
+            return quote
+        return _SQL_ESCAPES.get(escaped, escaped)
+    return _SQL_ESCAPE_RES[quote].sub(replace, text)
+
+
+def parse_row_values(row):
+    """ממיר "(...)" לרשימת ערכים בפורמט LOAD DATA, או None אם יש ערך שאינו ליטרל"""
+    inner = row[1:-1]
+    values = []
+    pos = 0
+    while True:
+        match = _VALUE_RE.match(inner, pos)
+        if match is None or match.end() == pos:
+            return None
+        single, double, null, number, boolean = match.groups()
+        if single is not None:
+            values.append(decode_sql_string(single).translate(_TSV_ESCAPES))
+        elif double is not None:
+            values.append(decode_sql_string(double, '"').translate(_TSV_ESCAPES))
+        elif null is not None:
+            values.append('\\N')
+        elif number is not None:
+            values.append(number)
+        else:
+            values.append('1' if boolean.upper() == 'TRUE' else '0')
+        pos = match.end()
+        if pos >= len(inner):
+            return values
+
+
+def coalesce_inserts(statements, max_bytes):
+    """מאחד INSERT-ים רצופים של שורה אחת לאותה טבלה ל-INSERT מרובה שורות
+
+    גודל כל הצהרה מאוחדת חסום ב-max_bytes (מתחת ל-max_allowed_packet) - בבתים של UTF-8,
+    כמו שהיא נשלחת לשרת.
+    """
+    prefix = None
+    rows = []
+    size = 0
+
+    for statement in statements:
+        parsed = parse_single_row_insert(statement)
+        row_size = utf8_length(parsed[1]) + 1 if parsed is not None else 0
+        if rows and (parsed is None or parsed[0] != prefix or size + row_size > max_bytes):
+            yield _extended_insert(prefix, rows)
+            rows = []
+        if parsed is None:
+            yield statement
+            continue
+        if not rows:
+            prefix = parsed[0]
+            size = utf8_length(prefix)
+        rows.append(parsed[1])
+        size += row_size
+
+    if rows:
+        yield _extended_insert(prefix, rows)
+
+
+def _extended_insert(prefix, rows):
+    return f"{prefix} {','.join(rows)}"
+
+
+class _LoadDataRun:
+    """רצף INSERT-ים לאותה טבלה - נאסף בזיכרון עד min_rows ואז נכתב לקובץ זמני"""
+
+    def __init__(self, prefix, min_rows, max_bytes):
+        self.prefix = prefix
+        self.min_rows = min_rows
+        self.max_bytes = max_bytes
+        self.rows = []          # (row, values) עד שעוברים לקובץ
+        self.row_count = 0
+        self.data_file = None
+
+    def add(self, row, values):
+        self.row_count += 1
+        if self.data_file is None:
+            self.rows.append((row, values))
+            if len(self.rows) < self.min_rows:
+                return
+            self.data_file = tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', newline='\n', suffix='.tsv', prefix='bulk_', delete=False
+            )
+            for _, buffered in self.rows:
+                self.data_file.write('\t'.join(buffered) + '\n')
+            self.rows = []
+        else:
+            self.data_file.write('\t'.join(values) + '\n')
+
+    def finish(self):
+        """מחזיר את ההצהרות של הרצף; הקובץ הזמני נמחק אחרי שההצהרה בוצעה"""
+        if self.data_file is None:
+            yield from coalesce_inserts((self.prefix + ' ' + row for row, _ in self.rows), self.max_bytes)
+            return
+
+        self.data_file.close()
+        try:
+            logger.debug(f"Loading {self.row_count} rows through {self.data_file.name}")
+            yield _load_data_statement(self.prefix, self.data_file.name)
+        finally:
+            os.remove(self.data_file.name)
+
+    def discard(self):
+        if self.data_file is not None:
+            self.data_file.close()
+            os.remove(self.data_file.name)
+
+
+def _load_data_statement(prefix, path):
+    """בונה LOAD DATA LOCAL INFILE מתוך ה-prefix של ה-INSERT"""
+    match = _INSERT_PREFIX_RE.match(prefix)
+    verb, ignore, table, columns = match.group(1).upper(), match.group(2), match.group(3), match.group(4)
+    modifier = 'REPLACE ' if verb == 'REPLACE' else ('IGNORE ' if ignore else '')
+    path = path.replace('\\', '/').replace("'", "\\'")
+    return (
+        f"LOAD DATA LOCAL INFILE '{path}' {modifier}INTO TABLE {table} CHARACTER SET utf8mb4 "
+        f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' {columns or ''}"
+    ).rstrip()
+
+
+def load_data_inserts(statements, max_bytes, min_rows):
+    """כמו coalesce_inserts, אבל רצף של לפחות min_rows שורות ליטרליות נטען ב-LOAD DATA LOCAL INFILE
+
+    הערה: ב-LOAD DATA LOCAL שגיאות מפתח כפול הופכות לאזהרות (כמו INSERT IGNORE).
+    """
+    run = None
+    completed = False
+    try:
+        for statement in statements:
+            parsed = parse_single_row_insert(statement)
+            values = parse_row_values(parsed[1]) if parsed is not None else None
+
+            if run is not None and (values is None or parsed[0] != run.prefix):
+                finished, run = run, None
+                yield from finished.finish()
+            if values is None:
+                yield statement
+                continue
+            if run is None:
+                run = _LoadDataRun(parsed[0], min_rows, max_bytes)
+            run.add(parsed[1], values)
+
+        if run is not None:
+            finished, run = run, None
+            yield from finished.finish()
+        completed = True
+    finally:
+        if not completed and run is not None:
+            run.discard()
+
+
+def optimize_bulk_inserts(statements, mode, max_bytes, load_data_min_rows):
+    """שלב אופטימיזציה בין הפירוק לביצוע - מחזיר את זרם ההצהרות המותאם למצב"""
+    if mode == 'extended':
+        return coalesce_inserts(statements, max_bytes)
+    if mode == 'load_data':
+        return load_data_inserts(statements, max_bytes, load_data_min_rows)
+    raise ValueError(f"Unknown bulk load mode '{mode}' (expected one of: {', '.join(BULK_LOAD_MODES)})")
@@ -0,0 +1,177 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+
+from ledger import file_sha256
+from script_files import script_size
+
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_EXTENSION = '.sqlbundle'
+
+# גרסת הפורמט - bundle מגרסה אחרת נדחה במקום להתפרש לא נכון
+BUNDLE_FORMAT_VERSION = 1
+
+_MAGIC = b'SQLBNDL\x00'
+_HEADER = struct.Struct('<8sI')
+# סוף הקובץ: מיקום ואורך האינדקס (JSON) ושוב ה-magic
+_TRAILER = struct.Struct('<QQ8s')
+# כל הצהרה נשמרת כאורך (8 בתים) ואחריו הטקסט ב-UTF-8 - כמו במטמון הסקריפטים
+_LENGTH = struct.Struct('<Q')
+
+
+class BundleError(Exception):
+    """קובץ bundle פגום או מגרסה לא נתמכת"""
+
+
+def is_bundle_file(path):
+    return path.lower().endswith(BUNDLE_EXTENSION)
+
+
+def script_key(folder_name, filename):
+    return f"{folder_name}/{filename}"
+
+
+class BundleWriter:
+    """כותב bundle: הצהרות מפורקות של כל הסקריפטים ואחריהן אינדקס
+
+    הנתונים נכתבים בזרם (זיכרון חסום בגודל ההצהרה הגדולה ביותר); האינדקס
+    נכתב בסוף, כך שאין צורך לדעת את הגדלים מראש.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = f"{path}.{os.getpid()}.tmp"
+        self.file = open(self.temp_path, 'wb')
+        self.file.write(_HEADER.pack(_MAGIC, BUNDLE_FORMAT_VERSION))
+        self.scripts = {}
+
+    def add_script(self, folder_name, filename, script_path, statements):
+        """כותב את הצהרות הסקריפט ורושם באינדקס מיקום, מספר הצהרות ו-hash של המקור"""
+        offset = self.file.tell()
+        count = 0
+        for statement in statements:
+            data = statement.encode('utf-8')
+            self.file.write(_LENGTH.pack(len(data)))
+            self.file.write(data)
+            count += 1
+        self.scripts[script_key(folder_name, filename)] = {
+            'offset': offset,
+            'length': self.file.tell() - offset,
+            'statements': count,
+            'source_bytes': script_size(script_path),
+            'sha256': file_sha256(script_path),
+        }
+
+    def finish(self, metadata):
+        """כותב את האינדקס ומחליף את הקובץ הסופי בפעולה אטומית"""
+        index = dict(metadata, format_version=BUNDLE_FORMAT_VERSION, scripts=self.scripts,
+                     created=time.strftime('%Y-%m-%d %H:%M:%S'))
+        index_data = json.dumps(index, ensure_ascii=False).encode('utf-8')
+        index_offset = self.file.tell()
+        self.file.write(index_data)
+        self.file.write(_TRAILER.pack(index_offset, len(index_data), _MAGIC))
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+        logger.info(f"Bundle written to {self.path} ({len(self.scripts)} scripts, {index_offset} bytes of statements)")
+
+    def discard(self):
+        self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+class BundleStatements:
+    """ההצהרות של סקריפט אחד ב-bundle - נקראות מה-mmap בכל מעבר, בלי להחזיק אותן בזיכרון"""
+
+    def __init__(self, bundle, entry):
+        self.bundle = bundle
+        self.entry = entry
+
+    def __len__(self):
+        return self.entry['statements']
+
+    def __iter__(self):
+        data = self.bundle.data
+        pos = self.entry['offset']
+        header_size = _LENGTH.size
+        for _ in range(self.entry['statements']):
+            (length,) = _LENGTH.unpack_from(data, pos)
+            pos += header_size
+            yield data[pos:pos + length].decode('utf-8')
+            pos += length
+
+
+class ExecutionBundle:
+    """bundle פתוח לקריאה (memory-mapped)
+
+    stages / script_profiles / missing_scripts בפורמט של parse_execution_stages,
+    parse_profile_sections ו-scan_and_validate_scripts.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise BundleError(f"Bundle is empty: {path}")
+        try:
+            self.index = self._read_index()
+        except BundleError:
+            self.close()
+            raise
+
+        self.stages = [
+            [(group_name, [tuple(entry) for entry in scripts]) for group_name, scripts in stage]
+            for stage in self.index['stages']
+        ]
+        self.script_profiles = {
+            (folder_name, filename): profile for folder_name, filename, profile in self.index['script_profiles']
+        }
+        self.missing_scripts = [tuple(entry) for entry in self.index['missing_scripts']]
+        logger.info(f"Opened bundle {path}: {len(self.index['scripts'])} scripts, created {self.index['created']}")
+
+    def _read_index(self):
+        size = len(self.data)
+        if size < _HEADER.size + _TRAILER.size:
+            raise BundleError(f"Not a script bundle: {self.path}")
+        magic, version = _HEADER.unpack_from(self.data, 0)
+        index_offset, index_length, end_magic = _TRAILER.unpack_from(self.data, size - _TRAILER.size)
+        if magic != _MAGIC or end_magic != _MAGIC:
+            raise BundleError(f"Not a script bundle (or truncated): {self.path}")
+        if version != BUNDLE_FORMAT_VERSION:
+            raise BundleError(f"Unsupported bundle format version {version} in {self.path}")
+        return json.loads(self.data[index_offset:index_offset + index_length].decode('utf-8'))
+
+    def script_path(self, folder_name, filename):
+        """נתיב וירטואלי לסקריפט - יחסית ל-bundle, כך שמפתחות היומן זהים להרצה מתיקייה"""
+        return os.path.join(self.path, folder_name, filename)
+
+    def _entries(self):
+        for key, entry in self.index['scripts'].items():
+            folder_name, filename = key.rsplit('/', 1)
+            yield self.script_path(folder_name, filename), entry
+
+    def parsed_scripts(self):
+        """מילון נתיב -> הצהרות (נקראות מה-mmap בזמן ההרצה)"""
+        return {script_path: BundleStatements(self, entry) for script_path, entry in self._entries()}
+
+    def content_hashes(self):
+        return {script_path: entry['sha256'] for script_path, entry in self._entries()}
+
+    def script_hashes(self):
+        """מילון "folder/filename" -> SHA-256 של המקור (לחישוב hash של התוכנית)"""
+        return {key: entry['sha256'] for key, entry in self.index['scripts'].items()}
+
+    def script_sizes(self):
+        return {script_path: entry['source_bytes'] for script_path, entry in self._entries()}
+
+    def close(self):
+        self.data.close()
+        self._file.close()
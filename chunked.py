@@ -0,0 +1,238 @@
+import logging
+import re
+import time
+
+import mysql.connector
+
+
+logger = logging.getLogger(__name__)
+
+# הערת הפעלה לפני ההצהרה בסקריפט: /*@chunk size=5000 rows_per_sec=20000 max_lag=5 */
+_ANNOTATION_RE = re.compile(r'/\*@chunk\b(.*?)\*/\s*', re.IGNORECASE | re.DOTALL)
+_SETTING_RE = re.compile(r'(\w+)\s*=\s*(\S+)')
+
+_TABLE = r'(`[^`]+`(?:\.`[^`]+`)?|[\w$]+(?:\.[\w$]+)?)'
+_ALIAS = r'(?:\s+(?:AS\s+)?(?!SET\b|WHERE\b)[\w$]+)?'
+_UPDATE_RE = re.compile(
+    r'UPDATE\s+(?:LOW_PRIORITY\s+)?(?:IGNORE\s+)?' + _TABLE + _ALIAS + r'\s+SET\b', re.IGNORECASE
+)
+_DELETE_RE = re.compile(
+    r'DELETE\s+(?:LOW_PRIORITY\s+)?(?:QUICK\s+)?(?:IGNORE\s+)?FROM\s+' + _TABLE + _ALIAS + r'\s*(?=WHERE\b|ORDER\b|LIMIT\b|$)',
+    re.IGNORECASE
+)
+
+# מחרוזות, סוגריים ומילות מפתח ברמה העליונה של ההצהרה
+_CLAUSE_TOKEN_RE = re.compile(
+    r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`|[()]|\b(WHERE|ORDER\s+BY|LIMIT)\b""",
+    re.IGNORECASE | re.DOTALL
+)
+
+_INTEGER_TYPES = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint'}
+
+CHUNK_SETTINGS = ('size', 'rows_per_sec', 'max_lag', 'key')
+
+
+class ChunkError(ValueError):
+    """הצהרה מסומנת לחלוקה שאי אפשר לחלק (צורה או מפתח שאינם נתמכים)"""
+
+
+def is_chunked_statement(statement):
+    return _ANNOTATION_RE.match(statement) is not None
+
+
+def parse_chunk_annotation(statement, defaults):
+    """מפריד את הערת ה-@chunk מההצהרה ומחזיר (הגדרות, הצהרה)
+
+    defaults - CHUNKING מ-config; ערכים בהערה דורסים אותם להצהרה הזו.
+    """
+    match = _ANNOTATION_RE.match(statement)
+    settings = {name: defaults.get(name) for name in CHUNK_SETTINGS}
+    for name, value in _SETTING_RE.findall(match.group(1)):
+        name = name.lower()
+        if name not in CHUNK_SETTINGS:
+            raise ChunkError(f"Unknown @chunk setting '{name}' (expected: {', '.join(CHUNK_SETTINGS)})")
+        if name == 'key':
+            settings[name] = value.strip('`')
+        else:
+            try:
+                settings[name] = float(value) if name == 'max_lag' else int(value)
+            except ValueError:
+                raise ChunkError(f"Invalid @chunk setting {name}={value}")
+    if settings['size'] is None or settings['size'] < 1:
+        raise ChunkError("@chunk size must be a positive number of rows")
+    return settings, statement[match.end():]
+
+
+def split_chunkable_statement(statement):
+    """מפרק UPDATE / DELETE של טבלה אחת ל-(טבלה, ההצהרה עד ה-WHERE, תנאי ה-WHERE או None)"""
+    match = _UPDATE_RE.match(statement) or _DELETE_RE.match(statement)
+    if match is None:
+        raise ChunkError("@chunk supports single-table UPDATE ... SET ... and DELETE FROM ... statements only")
+
+    depth = 0
+    where_start = None
+    for token in _CLAUSE_TOKEN_RE.finditer(statement, match.end()):
+        text = token.group()
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+        elif token.group(1) and depth == 0:
+            keyword = token.group(1).upper()
+            if keyword != 'WHERE':
+                raise ChunkError(f"@chunk statements cannot use {' '.join(keyword.split())} - "
+                                 f"the chunks are ordered by the key")
+            if where_start is None:
+                where_start = token
+    if where_start is None:
+        return match.group(1), statement.rstrip(), None
+    return match.group(1), statement[:where_start.start()].rstrip(), statement[where_start.end():].strip()
+
+
+def _table_parts(cursor, table):
+    parts = [part.strip('`') for part in re.findall(r'`[^`]+`|[^.]+', table)]
+    if len(parts) == 2:
+        return parts[0], parts[1]
+    cursor.execute("SELECT DATABASE()")
+    return cursor.fetchone()[0], parts[0]
+
+
+def find_chunk_key(cursor, table, key=None):
+    """מחזיר את עמודת המפתח לחלוקה - מפתח ראשי של עמודה שלמה אחת, או key מההערה"""
+    schema, table_name = _table_parts(cursor, table)
+    if key is None:
+        cursor.execute(
+            "SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND CONSTRAINT_NAME = 'PRIMARY' "
+            "ORDER BY ORDINAL_POSITION",
+            (schema, table_name)
+        )
+        columns = [name for (name,) in cursor.fetchall()]
+        if len(columns) != 1:
+            raise ChunkError(f"Table {table} needs a single-column primary key for @chunk "
+                             f"(or name an indexed integer column with key=...)")
+        key = columns[0]
+    cursor.execute(
+        "SELECT DATA_TYPE FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s "
+        "AND COLUMN_NAME = %s",
+        (schema, table_name, key)
+    )
+    row = cursor.fetchone()
+    if row is None or row[0].lower() not in _INTEGER_TYPES:
+        raise ChunkError(f"@chunk key {table}.{key} must be an integer column")
+    return key
+
+
+class ReplicationLagMonitor:
+    """בודק את ה-lag של ה-replicas (SHOW REPLICA STATUS) - חיבור אחד לכל replica"""
+
+    def __init__(self, config, hosts):
+        self.connections = []
+        for host in hosts:
+            replica_config = {**config, 'host': host}
+            replica_config.pop('database', None)
+            self.connections.append((host, mysql.connector.connect(**replica_config)))
+
+    def max_lag(self):
+        """ה-lag הגבוה ביותר בשניות; None (לא ידוע) אם replica לא משכפל (ה-thread עצור)"""
+        lags = []
+        for host, connection in self.connections:
+            cursor = connection.cursor(dictionary=True)
+            try:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except mysql.connector.Error:
+                    # שרתים לפני 8.0.22
+                    cursor.execute("SHOW SLAVE STATUS")
+                row = cursor.fetchone() or {}
+            finally:
+                cursor.close()
+            lag = row.get('Seconds_Behind_Source', row.get('Seconds_Behind_Master'))
+            if lag is None:
+                logger.warning(f"Replica {host} is not replicating - lag unknown")
+                return None
+            lags.append(int(lag))
+        return max(lags, default=0)
+
+    def close(self):
+        for _, connection in self.connections:
+            connection.close()
+        self.connections = []
+
+
+def execute_chunked_statement(cursor, connection, statement, settings, lag_monitor=None, progress=None,
+                              label='', lag_check_interval=1.0, lag_wait_timeout=600.0):
+    """מבצע UPDATE / DELETE גדול בחלקים לפי טווחי מפתח, עם commit אחרי כל חלק
+
+    כל חלק מכסה עד size שורות של הטבלה (הגבול הבא נמצא בסריקת האינדקס), כך
+    שהנעילות ויומן ה-undo חסומים בגודל החלק. בין החלקים: האטה לקצב rows_per_sec
+    והמתנה כל עוד ה-lag של ה-replicas גבוה מ-max_lag או לא ידוע (replica שלא משכפל) -
+    אחרי lag_wait_timeout שניות של המתנה רצופה (0 = ללא הגבלה) ההצהרה נכשלת ב-ChunkError.
+    ביטול נבדק בין החלקים (החלקים שבוצעו כבר עברו commit). טווח המפתח נקבע בתחילת ההרצה.
+    מחזיר את מספר השורות שהושפעו.
+    """
+    table, head, where = split_chunkable_statement(statement)
+    key = find_chunk_key(cursor, table, settings['key'])
+    quoted_key = f"`{key}`"
+    cursor.execute(f"SELECT MIN({quoted_key}), MAX({quoted_key}) FROM {table}")
+    low, high = cursor.fetchone()
+    if low is None:
+        logger.info(f"{label}: {table} is empty - nothing to do")
+        return 0
+
+    first = low
+    condition = f"({where}) AND " if where else ''
+    size = settings['size']
+    started = time.perf_counter()
+    total_rows = 0
+    chunk = 0
+    logger.info(f"{label}: chunking on {table}.{key} {low}..{high}, {size} rows per chunk")
+
+    while True:
+        if progress is not None:
+            progress.check_cancelled()
+        cursor.execute(
+            f"SELECT {quoted_key} FROM {table} WHERE {quoted_key} >= {low} ORDER BY {quoted_key} "
+            f"LIMIT 1 OFFSET {size - 1}"
+        )
+        row = cursor.fetchone()
+        upper = min(row[0], high) if row is not None else high
+
+        cursor.execute(f"{head} WHERE {condition}{quoted_key} BETWEEN {low} AND {upper}")
+        rows = cursor.rowcount
+        connection.commit()
+        chunk += 1
+        total_rows += max(rows, 0)
+
+        elapsed = time.perf_counter() - started
+        fraction = (upper - first + 1) / (high - first + 1)
+        message = (f"{label}: chunk {chunk} {key} {low}..{upper}: {rows} rows, {fraction:.0%} of key range "
+                   f"({total_rows} total, {total_rows / elapsed if elapsed else 0:.0f} rows/s)")
+        logger.info(message)
+
+        if upper >= high:
+            break
+        low = upper + 1
+
+        if settings['rows_per_sec']:
+            ahead = total_rows / settings['rows_per_sec'] - (time.perf_counter() - started)
+            if ahead > 0:
+                time.sleep(ahead)
+        if settings['max_lag'] and lag_monitor is not None:
+            waiting_since = time.perf_counter()
+            while True:
+                lag = lag_monitor.max_lag()
+                if lag is not None and lag <= settings['max_lag']:
+                    break
+                lag_text = 'unknown' if lag is None else f"{lag}s"
+                waited = time.perf_counter() - waiting_since
+                if lag_wait_timeout and waited >= lag_wait_timeout:
+                    raise ChunkError(f"Replication lag still {lag_text} after waiting {waited:.0f}s - "
+                                     f"stopped before {key} {low} (earlier chunks are committed)")
+                logger.info(f"{label}: replication lag {lag_text} (max {settings['max_lag']}s) - waiting")
+                if progress is not None:
+                    progress.check_cancelled()
+                time.sleep(lag_check_interval)
+
+    logger.info(f"{label}: {total_rows} rows in {chunk} chunks, {time.perf_counter() - started:.1f}s")
+    return total_rows
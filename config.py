@@ -9,4 +9,100 @@ DB_CONFIG = {
 DB_CONFIG_S3={ 'host':'khn-qa-sql.c8vs08yqcrku.us-east-1.rds.amazonaws.com',              
                'user': 'admin',
                'password': 'Kupat!234',
-               'database': 'kupathairnew3'}
\ No newline at end of file
+               'database': 'kupathairnew3'}
+
+# הגדרות ביצוע ברירת מחדל (ניתן לדרוס בכל הרצה)
+EXECUTION_OPTIONS = {
+    'batch_statements': 1,           # כמה הצהרות לשלוח לשרת בכל round-trip
+    'batch_bytes': 1024 * 1024,      # גודל מקסימלי של חבילת הצהרות אחת
+    'commit_every_statements': 1,    # commit כל N הצהרות (0 = לפי בתים בלבד)
+    'commit_every_bytes': 0,         # commit כל N בתים (0 = לפי הצהרות בלבד)
+    'parallel_groups': 1,            # כמה קבוצות בלתי תלויות להריץ במקביל (חיבור לכל אחת)
+    'parallel_targets': 4,           # כמה יעדים להריץ במקביל במצב fan-out
+    'ledger': None,                  # יומן סקריפטים: None / 'incremental' / 'resume'
+    'script_cache': False,           # שימוש במטמון הסקריפטים המעובדים (SCRIPT_CACHE)
+    'bulk_load': None,               # איחוד INSERT-ים: None / 'extended' / 'load_data'
+    'bulk_insert_bytes': 4 * 1024 * 1024,  # גודל מקסימלי ל-INSERT מאוחד (חסום גם ב-max_allowed_packet)
+    'load_data_min_rows': 10000,     # מינימום שורות רצופות למעבר ל-LOAD DATA LOCAL INFILE
+    'session_profile': None,         # פרופיל משתני session להרצה כולה (SESSION_PROFILES)
+    'profile': False,                # מדידת זמן לכל הצהרה ודוח האיטיות ביותר בסוף
+    'profile_output': None,          # קובץ פרופיל .json / .csv (מפעיל גם את המדידה)
+    'profile_top': 20,               # כמה הצהרות / סקריפטים איטיים להציג בדוח
+    'preflight': False,              # פירוק ובדיקת כל הסקריפטים לפני שנוגעים במסד הנתונים
+    'reconnect_retries': 5,          # ניסיונות חיבור מחדש כשהחיבור לשרת אבד (0 = ללא)
+    'parameterize': False,           # רצפי הצהרות DML באותה צורה כהצהרה מוכנה (server-side prepared)
+    'parameterize_min_run': 3,       # מינימום הצהרות רצופות באותה צורה למעבר להצהרה מוכנה
+    'parameterize_max_run': 1000,    # מקסימום הצהרות ברצף אחד (הרצף נשמר בזיכרון עד הביצוע)
+    'prepared_cache_size': 32,       # כמה הצהרות מוכנות לשמור פתוחות לכל חיבור (LRU)
+    'template_database': None,       # מסד תבנית: נבנה פעם אחת לכל תוכנית ומשובט למסד היעד
+    'rebuild_template': False,       # בניית התבנית מחדש גם כשה-hash של התוכנית לא השתנה
+    'clone_workers': 4,              # כמה טבלאות להעתיק במקביל בשיבוט מהתבנית
+    'result_export': None,           # תוצאות SELECT / SHOW לקבצים: None / 'csv' / 'jsonl'
+    'result_export_dir': 'results',  # תיקיית הקבצים (תת-תיקייה לכל מסד יעד)
+    'metrics_file': None,            # קובץ מדדי Prometheus חיים (textfile collector של node_exporter)
+    'metrics_port': None,            # פורט HTTP מקומי למדדים חיים (/metrics)
+}
+
+# פרופילים של משתני session - מוחלים סביב ההרצה (או קטע @profile בקובץ הסדר)
+# והערכים המקוריים משוחזרים בסוף, גם כשההרצה נכשלת
+SESSION_PROFILES = {
+    'bulk-build': {
+        'foreign_key_checks': 0,
+        'unique_checks': 0,
+        'bulk_insert_buffer_size': 256 * 1024 * 1024,
+        'innodb_lock_wait_timeout': 600,
+    },
+    # כמו bulk-build וגם בלי כתיבה ל-binlog (דורש הרשאת SUPER / SYSTEM_VARIABLES_ADMIN)
+    'bulk-build-no-binlog': {
+        'foreign_key_checks': 0,
+        'unique_checks': 0,
+        'bulk_insert_buffer_size': 256 * 1024 * 1024,
+        'innodb_lock_wait_timeout': 600,
+        'sql_log_bin': 0,
+    },
+}
+
+# מטמון סקריפטים מעובדים ומפורקים להצהרות
+SCRIPT_CACHE = {
+    'directory': None,                   # None = תיקיית .script_cache ליד האפליקציה
+    'max_bytes': 2 * 1024 * 1024 * 1024, # גודל מקסימלי כולל - פינוי LRU מעבר לזה
+}
+
+# בדיקת pre-flight - פירוק מקבילי של כל הסקריפטים והערכת זמן ההרצה
+PREFLIGHT = {
+    'workers': None,                 # מספר תהליכים (None = מספר המעבדים)
+    'seconds_per_statement': 0.002,  # זמן round-trip משוער להצהרה (ניתן לכייל עם benchmark.py)
+    'megabytes_per_second': 10,      # קצב העברת נתונים משוער לשרת
+}
+
+# לוגים - 'sync' כותב לקובץ ולקונסול ב-thread הקורא, 'queue' מעביר את הכתיבה
+# והפרמוט ל-thread רקע (מומלץ להרצות עם מיליוני הצהרות)
+LOGGING = {
+    'mode': 'sync',                  # 'sync' / 'queue'
+    'format': 'text',                # 'text' / 'json' (קובץ הלוג בלבד)
+    'level': 'INFO',
+}
+
+# חיבורים - חיבור מחדש עם backoff מעריכי כשהחיבור אבד (failover, idle timeout)
+CONNECTION = {
+    'backoff_seconds': 1,                     # המתנה לפני הניסיון הראשון, מוכפלת בכל ניסיון
+    'max_backoff_seconds': 30,                # המתנה מקסימלית בין ניסיונות
+    'replay_buffer_bytes': 64 * 1024 * 1024,  # הצהרות שלא עברו commit שנשמרות לביצוע חוזר
+}
+
+# הצהרות UPDATE / DELETE גדולות בחלקים לפי טווחי מפתח - מסומנות בסקריפט ב-/*@chunk ... */
+CHUNKING = {
+    'size': 10000,               # שורות בכל חלק (ברירת מחדל ל-size= בהערה)
+    'rows_per_sec': 0,           # קצב מקסימלי בשורות לשנייה (0 = ללא האטה)
+    'max_lag': 0,                # המתנה בין חלקים כל עוד ה-lag של ה-replicas גבוה מזה (0 = לא נבדק)
+    'key': None,                 # None = המפתח הראשי של הטבלה
+    'replicas': [],              # hosts של ה-replicas לבדיקת lag (עם פרטי החיבור של ההרצה)
+    'lag_check_interval': 1.0,   # שניות בין בדיקות lag בזמן המתנה
+    'lag_wait_timeout': 600,     # שניות המתנה ל-lag (גבוה או לא ידוע) לפני שההצהרה נכשלת (0 = ללא הגבלה)
+}
+
+# מדדים חיים של ההרצה (metrics_file / metrics_port ב-EXECUTION_OPTIONS)
+METRICS = {
+    'host': '127.0.0.1',             # כתובת ההאזנה של נקודת ה-HTTP (0.0.0.0 = גישה מבחוץ)
+    'interval_seconds': 5,           # כל כמה שניות לכתוב מחדש את קובץ המדדים
+}
@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from session_profiles import apply_session_settings
+from sql_tokenizer import is_transaction_start, is_transaction_end, is_implicit_commit, utf8_length
+
+
+logger = logging.getLogger(__name__)
+
+# שגיאות שמשמען שהחיבור לשרת אבד (failover, idle timeout, ניתוק רשת)
+CONNECTION_LOST_ERRNOS = {
+    errorcode.CR_SERVER_GONE_ERROR,     # 2006
+    errorcode.CR_SERVER_LOST,           # 2013
+    errorcode.CR_CONN_HOST_ERROR,       # 2003
+    errorcode.CR_SERVER_LOST_EXTENDED,  # 2055
+    errorcode.ER_CON_COUNT_ERROR,       # 1040 - בזמן failover השרת החדש עוד לא מקבל חיבורים
+}
+
+
+def is_connection_lost(error):
+    return getattr(error, 'errno', None) in CONNECTION_LOST_ERRNOS
+
+
+class ConnectionManager:
+    """חיבורים להרצה אחת - חיבור משותף להכנה ולביצוע, חיבורים נוספים לפי הצורך
+    וחיבור מחדש עם backoff כשהחיבור אבד
+
+    משתני session שהוחלו על חיבור (פרופיל) נזכרים ומוחלים שוב אחרי חיבור מחדש.
+    """
+
+    def __init__(self, config, retries=5, backoff_seconds=1.0, max_backoff_seconds=30.0):
+        self.config = dict(config)
+        self.retries = retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.reconnects = 0
+        self._established = False     # האם כבר נפתח חיבור אחד לשרת בהצלחה
+        self._shared = None
+        self._connections = []
+        self._session_settings = {}   # id(connection) -> משתני session להחלה מחדש
+        self._lock = threading.Lock()
+
+    def _with_retry(self, description, action):
+        """מריץ action עם ניסיונות חוזרים ו-backoff מעריכי כשהשרת לא זמין"""
+        attempt = 0
+        while True:
+            try:
+                return action()
+            except mysql.connector.Error as e:
+                if not is_connection_lost(e) or attempt >= self.retries:
+                    raise
+                delay = min(self.backoff_seconds * (2 ** attempt), self.max_backoff_seconds)
+                attempt += 1
+                logger.warning(f"{description} failed ({e}) - retry {attempt}/{self.retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def connect(self):
+        """פותח חיבור חדש; החיבור נסגר ב-close()
+
+        ניסיונות חוזרים רק אחרי שכבר היה חיבור לשרת (failover באמצע הרצה) - החיבור
+        הראשון נכשל מיד, כך ש-host שגוי או שרת שלא זמין לא ממתינים לכל ה-backoff.
+        """
+        if self._established:
+            connection = self._with_retry("Connect", lambda: mysql.connector.connect(**self.config))
+        else:
+            connection = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._established = True
+            self._connections.append(connection)
+        return connection
+
+    def shared_connection(self):
+        """החיבור המשותף - נפתח פעם אחת ומשמש לבדיקת החיבור, להכנת המסד ולביצוע"""
+        if self._shared is None:
+            self._shared = self.connect()
+        return self._shared
+
+    def use_database(self, db_name):
+        """מעביר את החיבור המשותף למסד הנתונים; חיבורים חדשים וחיבורים מחדש ייפתחו עליו"""
+        self.config['database'] = db_name
+        if self._shared is not None:
+            self._shared.database = db_name
+
+    def remember_session_settings(self, connection, settings):
+        """משתני session שהוחלו על החיבור - יוחלו שוב אחרי חיבור מחדש (None = אין)"""
+        if settings:
+            self._session_settings[id(connection)] = settings
+        else:
+            self._session_settings.pop(id(connection), None)
+
+    def reconnect(self, connection):
+        """מחבר מחדש חיבור שאבד (אותו אובייקט) ומחזיר את מצב ה-session"""
+        logger.warning("Connection lost - reconnecting")
+
+        def attempt():
+            connection.reconnect(attempts=1)
+            if connection.database != self.config.get('database') and self.config.get('database'):
+                connection.database = self.config['database']
+
+        self._with_retry("Reconnect", attempt)
+        settings = self._session_settings.get(id(connection))
+        if settings:
+            apply_session_settings(connection, settings)
+        with self._lock:
+            self.reconnects += 1
+        logger.info("Reconnected to MySQL server")
+
+    def ensure_connected(self, connection):
+        """מוודא שהחיבור חי (ping) ומחבר מחדש אם נסגר, למשל אחרי idle timeout"""
+        if not connection.is_connected():
+            self.reconnect(connection)
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except mysql.connector.Error as e:
+                logger.debug("Error closing connection: %s", e)
+        self._shared = None
+
+
+class ReplayLog:
+    """ההצהרות שבוצעו מאז נקודת ה-commit האחרונה - מבוצעות שוב אחרי חיבור מחדש
+
+    השרת מבטל כל מה שלא עבר commit כשהחיבור נופל, לכן אחרי חיבור מחדש מבצעים
+    שוב את ההצהרות האלה וממשיכים מההצהרה שנכשלה. טרנזקציה מפורשת נשמרת מה-START
+    שלה; הצהרות עם commit מרומז (DDL) מאפסות את היומן. מעבר ל-max_bytes היומן
+    מוותר, והמשך אחרי ניתוק אפשרי רק מנקודת ה-commit הבאה.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.statements = []
+        self.size = 0
+        self.overflow = False
+
+    @property
+    def resumable(self):
+        return not self.overflow
+
+    def committed(self):
+        self.statements = []
+        self.size = 0
+        self.overflow = False
+
+    def executed(self, statements):
+        for statement in statements:
+            if is_transaction_start(statement):
+                # START TRANSACTION מבצע commit למה שלפניו ופותח טרנזקציה חדשה
+                self.committed()
+            elif is_transaction_end(statement) or is_implicit_commit(statement):
+                self.committed()
+                continue
+            if self.overflow:
+                continue
+            self.statements.append(statement)
+            self.size += utf8_length(statement)
+            if self.size > self.max_bytes:
+                logger.debug("Replay log over %d bytes - reconnect will not resume before the next commit", self.max_bytes)
+                self.statements = []
+                self.size = 0
+                self.overflow = True
@@ -0,0 +1,121 @@
+import hashlib
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+# טבלת היומן במסד היעד - שורה אחת לכל סקריפט עם תוצאת ההרצה האחרונה שלו
+LEDGER_TABLE = '_script_runner_ledger'
+
+LEDGER_MODES = ('incremental', 'resume')
+
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """מחשב SHA-256 של קובץ בקריאה בחלקים (זיכרון קבוע)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ScriptLedger:
+    """יומן סקריפטים שהורצו על מסד נתונים - מאפשר הרצה אינקרמנטלית והמשך אחרי כשל
+
+    המפתח של כל סקריפט הוא הנתיב היחסי לתיקיית הסקריפטים, כך שהיומן תקף
+    גם כשהסקריפטים נמצאים בתיקייה אחרת במחשב אחר.
+    """
+
+    def __init__(self, script_root):
+        self.script_root = script_root
+        self.entries = {}   # script_key -> (content_hash, status)
+        self.hashes = {}    # script_path -> content_hash
+
+    def script_key(self, script_path):
+        return os.path.relpath(script_path, self.script_root).replace('\\', '/')
+
+    def content_hash(self, script_path):
+        if script_path not in self.hashes:
+            self.hashes[script_path] = file_sha256(script_path)
+        return self.hashes[script_path]
+
+    def load(self, cursor):
+        """יוצר את טבלת היומן אם צריך וטוען את הרשומות הקיימות"""
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS `{LEDGER_TABLE}` ("
+            "script_path VARCHAR(512) NOT NULL PRIMARY KEY, "
+            "content_hash CHAR(64) NOT NULL, "
+            "status VARCHAR(16) NOT NULL, "
+            "duration_ms INT NOT NULL, "
+            "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+            ") CHARACTER SET utf8mb4"
+        )
+        cursor.execute(f"SELECT script_path, content_hash, status FROM `{LEDGER_TABLE}`")
+        self.entries = {key: (content_hash, status) for key, content_hash, status in cursor.fetchall()}
+        logger.info(f"Loaded {len(self.entries)} ledger entries")
+
+    def is_applied(self, script_path):
+        """האם הסקריפט הורץ בהצלחה בגרסתו הנוכחית"""
+        entry = self.entries.get(self.script_key(script_path))
+        return entry is not None and entry[1] == STATUS_SUCCESS and entry[0] == self.content_hash(script_path)
+
+    def is_changed(self, script_path):
+        """האם הסקריפט הורץ בהצלחה אבל התוכן שלו השתנה מאז"""
+        entry = self.entries.get(self.script_key(script_path))
+        return entry is not None and entry[1] == STATUS_SUCCESS and entry[0] != self.content_hash(script_path)
+
+    def filter_stages(self, stages, mode):
+        """מסנן את שלבי ההרצה לפי היומן
+
+        incremental - מדלג על כל סקריפט שהגרסה הנוכחית שלו כבר הצליחה
+        resume      - מדלג על כל הסקריפטים שלפני הסקריפט הראשון שנכשל / לא הורץ
+        סקריפטים שהשתנו אחרי שהורצו מסומנים ולא מורצים מחדש אוטומטית.
+        מחזיר (stages, skipped, changed).
+        """
+        ordered = [script_path for stage in stages for _, scripts in stage for _, script_path in scripts]
+        changed = [script_path for script_path in ordered if self.is_changed(script_path)]
+
+        if mode == 'resume':
+            skip = set()
+            for script_path in ordered:
+                if not self.is_applied(script_path) and script_path not in changed:
+                    break
+                skip.add(script_path)
+        else:
+            skip = {script_path for script_path in ordered if self.is_applied(script_path)}
+            skip.update(changed)
+
+        filtered = [
+            [(group_name, [entry for entry in scripts if entry[1] not in skip]) for group_name, scripts in stage]
+            for stage in stages
+        ]
+        skipped = [script_path for script_path in ordered if script_path in skip]
+
+        for script_path in changed:
+            logger.warning(f"Script changed after it was applied (not re-run): {self.script_key(script_path)}")
+        logger.info(f"Ledger ({mode}): {len(skipped)} scripts skipped, {len(changed)} changed")
+        return filtered, skipped, changed
+
+    def record(self, connection, script_path, success, duration):
+        """רושם את תוצאת ההרצה של סקריפט ביומן (commit נפרד)"""
+        key = self.script_key(script_path)
+        status = STATUS_SUCCESS if success else STATUS_FAILED
+        content_hash = self.content_hash(script_path)
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                f"INSERT INTO `{LEDGER_TABLE}` (script_path, content_hash, status, duration_ms) "
+                "VALUES (%s, %s, %s, %s) "
+                "ON DUPLICATE KEY UPDATE content_hash = VALUES(content_hash), "
+                "status = VALUES(status), duration_ms = VALUES(duration_ms)",
+                (key, content_hash, status, int(duration * 1000))
+            )
+            connection.commit()
+        finally:
+            cursor.close()
+        self.entries[key] = (content_hash, status)
@@ -0,0 +1,69 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+
+
+LOG_MODES = ('sync', 'queue')
+LOG_FORMATS = ('text', 'json')
+
+# שדות סטנדרטיים של LogRecord - כל השאר (extra=...) נכנס לפלט ה-JSON כפי שהוא
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """שורת JSON לכל רשומה - לקליטה במערכות לוגים (ELK, Loki וכו')"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler שלא מפרמט את ההודעה ב-thread הקורא
+
+    ה-QueueHandler הרגיל מרכיב את ההודעה (msg % args) לפני ההכנסה לתור; כאן
+    ההרכבה נדחית ל-thread של ה-listener. רק חריגות מומרות לטקסט מיד, כי
+    ה-traceback לא תקף אחרי שה-thread ממשיך.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class QueueLogging:
+    """מצב לוגים אסינכרוני - ה-threads של ההרצה רק מכניסים רשומות לתור,
+    ו-thread רקע אחד כותב לקובץ ולקונסול"""
+
+    def __init__(self, handlers):
+        self.queue = queue.SimpleQueue()
+        self.handler = DeferredQueueHandler(self.queue)
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        # ריקון התור לפני יציאה מהתהליך
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            atexit.unregister(self.stop)
@@ -2,59 +2,214 @@ import logging
 import sys
 import os
 import mysql.connector
-from config import DB_CONFIG
-import tkinter as tk
-from tkinter import messagebox
+from config import (
+    DB_CONFIG, EXECUTION_OPTIONS, SCRIPT_CACHE, SESSION_PROFILES, PREFLIGHT, LOGGING, CONNECTION, CHUNKING, METRICS
+)
 import re
+import json
+import argparse
+import time
+import queue
+import threading
+import signal
+import multiprocessing
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from logging_support import JsonFormatter, QueueLogging, LOG_MODES, LOG_FORMATS
+from reporters import ConsoleReporter, TkReporter, QueueReporter
+from ledger import file_sha256, ScriptLedger, LEDGER_MODES
+from script_cache import get_script_cache
+from bulk_load import optimize_bulk_inserts, BULK_LOAD_MODES
+from session_profiles import apply_session_settings, restore_session_settings
+from profiler import RunProfiler
+from progress import RunProgress, RunCancelled, format_eta
+from bundle import BundleWriter, BundleStatements, ExecutionBundle, BundleError, is_bundle_file, script_key, BUNDLE_EXTENSION
+from connection_manager import ConnectionManager, ReplayLog, is_connection_lost
+from prepared_statements import PreparedRun, PreparedStatementCache, group_statement_runs
+from template_db import compute_plan_hash, read_template_hash, mark_template, clone_database
+from script_files import (
+    SCRIPT_EXTENSIONS, DECOMPRESSION_ERRORS, MissingDecompressorError, is_script_file, open_script
+)
+from metrics import MetricsExporter
+from result_export import ResultExporter, RESULT_EXPORT_FORMATS, drain_result
+from chunked import (
+    ChunkError, ReplicationLagMonitor, is_chunked_statement, parse_chunk_annotation, execute_chunked_statement
+)
+from preflight import (
+    build_script_index, index_contains, has_glob_magic, preflight_scripts, estimate_duration, format_preflight_report
+)
+from sql_tokenizer import (
+    iter_sql_statements, split_sql_statements, utf8_length,
+    is_transaction_start, is_transaction_end, is_standalone_statement
+)
 
 
-# הגדרת לוגים לקובץ
-def setup_logging():
-    # יצירת שם קובץ לוג ליד ה-EXE
+def get_app_dir():
+    """תיקיית האפליקציה - ליד ה-EXE או ליד הסקריפט"""
     if getattr(sys, 'frozen', False):
         # אם רץ כ-EXE
-        log_dir = os.path.dirname(sys.executable)
-    else:
-        # אם רץ כ-Python script
-        log_dir = os.path.dirname(os.path.abspath(__file__))
+        return os.path.dirname(sys.executable)
+    # אם רץ כ-Python script
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+# מצב הלוגים האסינכרוני הפעיל (אם יש) - נעצר כשמגדירים את הלוגים מחדש
+_queue_logging = None
+
+
+# הגדרת לוגים לקובץ
+def setup_logging(mode=None, log_format=None, level=None):
+    """מגדיר את הלוגים לפי LOGGING מ-config (הפרמטרים דורסים אותו)
+
+    mode='queue' - רק הכנסה לתור ב-thread הקורא, הכתיבה והפרמוט ב-thread רקע
+    log_format='json' - קובץ הלוג נכתב כשורת JSON לכל רשומה (הקונסול נשאר טקסט)
+    ניתן לקרוא שוב (למשל מה-CLI) - ההגדרה הקודמת מוחלפת.
+    """
+    global _queue_logging
+    mode = mode or LOGGING['mode']
+    log_format = log_format or LOGGING['format']
+    level = level or LOGGING['level']
+    
+    # יצירת שם קובץ לוג ליד ה-EXE
+    log_file = os.path.join(get_app_dir(), 'mysql_runner.log')
+    text_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
     
-    log_file = os.path.join(log_dir, 'mysql_runner.log')
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter() if log_format == 'json' else text_formatter)
+    console_handler = logging.StreamHandler(sys.stdout)  # גם לקונסול אם קיים
+    console_handler.setFormatter(text_formatter)
+    handlers = [file_handler, console_handler]
+    
+    if _queue_logging is not None:
+        _queue_logging.stop()
+        _queue_logging = None
+    if mode == 'queue':
+        _queue_logging = QueueLogging(handlers)
+        handlers = [_queue_logging.handler]
     
     # הגדרת לוגר
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)  # גם לקונסול אם קיים
-        ]
-    )
+    logging.basicConfig(level=level, handlers=handlers, force=True)
 
 # הפעלת הלוגר
 setup_logging()
 logger = logging.getLogger(__name__)
 
+# ערוץ הדיווח למשתמש - קונסול כברירת מחדל, חלונות Tk כשרץ הממשק הגרפי
+reporter = ConsoleReporter()
 
-def parse_execution_order_file(order_file_path):
-    """קורא את קובץ סדר ההרצה ומחזיר רשימה מסודרת של קבצים
+
+def set_reporter(new_reporter):
+    """מחליף את ערוץ הדיווח (למשל TkReporter בממשק הגרפי)"""
+    global reporter
+    reporter = new_reporter
+
+
+# הצהרות תלות נתמכות בקובץ סדר ההרצה
+ORDER_FILE_DIRECTIVES = ('group', 'group-by-folder', 'barrier', 'profile')
+
+# הכללת קובץ סדר אחר: "include other_order.txt" או "@include other_order.txt"
+_INCLUDE_RE = re.compile(r'@?include\s+(.+)$', re.IGNORECASE)
+
+
+def _parse_order_line(line, line_num):
+    """מפרק שורת סקריפט מקובץ סדר ההרצה ל-(תיקייה, קובץ), או None אם אינה תקינה"""
+    # בדיקה שהשורה מסתיימת ב-.sql (או .sql.gz / .sql.zst / .sql.xz)
+    if not is_script_file(line):
+        logger.warning(f"Line {line_num}: '{line}' does not end with {' / '.join(SCRIPT_EXTENSIONS)} - skipping")
+        return None
     
-    תומך בפורמט 2 בלבד - נתיבים פשוטים:
-    1. folder1/script1.sql
-    2. folder1/script2.sql
-    3. folder2/script3.sql
+    # הסרת מספור בתחילת השורה אם קיים
+    clean_line = line
     
-    או בלי מספור:
-    folder1/script1.sql
-    folder1/script2.sql
-    folder2/script3.sql
+    # זיהוי מספור: "1. ", "2. ", וכו'
+    if '. ' in line:
+        parts = line.split('. ', 1)
+        if len(parts) == 2 and parts[0].strip().isdigit():
+            clean_line = parts[1]
+    
+    # זיהוי מספור עם Tab: "1	"
+    elif '\t' in line:
+        parts = line.split('\t', 1)
+        if len(parts) == 2 and parts[0].strip().isdigit():
+            clean_line = parts[1]
+    
+    # זיהוי מספור עם רווח: "1 "
+    elif ' ' in line:
+        parts = line.split(' ', 1)
+        if len(parts) == 2 and parts[0].strip().isdigit():
+            clean_line = parts[1]
+    
+    clean_line = clean_line.strip()
+    
+    # חלוקה לתיקייה וקובץ לפי נתיב
+    if '/' in clean_line or '\\' in clean_line:
+        # נתיב מלא - המרה לפורמט אחיד; התיקייה היא כל הנתיב היחסי (תיקיות מקוננות)
+        path_parts = clean_line.replace('\\', '/').split('/')
+        if len(path_parts) >= 2:
+            folder_name = '/'.join(path_parts[:-1])
+            filename = path_parts[-1]     # שם הקובץ
+        else:
+            # אם אין תיקייה בנתיב
+            folder_name = 'scripts'
+            filename = clean_line
+    else:
+        # רק שם קובץ בלי נתיב - נשתמש בתיקייה ברירת מחדל
+        folder_name = 'scripts'
+        filename = clean_line
+    
+    # וידוא שהקובץ הוא סקריפט SQL (רגיל או דחוס)
+    if is_script_file(filename):
+        logger.debug("Line %d: Added [%s] %s", line_num, folder_name, filename)
+        return folder_name, filename
+    
+    logger.warning(f"Line {line_num}: '{filename}' is not a SQL file - skipping")
+    return None
+
+
+def _order_folder_candidates(folder_name):
+    """התיקיות לבדיקה עבור רשומה: הנתיב המלא ואז בלי התיקיות העליונות, אחת-אחת
+
+    קובץ בלי תיקייה (תיקיית ברירת המחדל scripts) נבדק בסוף גם בשורש הסקריפטים.
+    """
+    parts = folder_name.split('/')
+    candidates = ['/'.join(parts[start:]) for start in range(len(parts))]
+    if parts[-1] == 'scripts':
+        candidates.append('.')
+    return candidates
+
+
+def _resolve_order_entry(script_index, folder_name, filename):
+    """מתאים רשומה מקובץ הסדר לקובץ באינדקס
+
+    נתיב שכולל גם תיקיות מעל שורש הסקריפטים (למשל scripts/schema/a.sql או נתיב
+    מלא) מקוצר מההתחלה עד שנמצא קובץ קיים. רשומה שלא נמצאה נשארת כפי שנכתבה,
+    ונתיב מלא שלא נמצא מצביע על התיקייה האחרונה בלבד (כמו בעבר).
+    """
+    for candidate in _order_folder_candidates(folder_name):
+        if index_contains(script_index, candidate, filename):
+            return candidate, filename
+    if os.path.isabs(folder_name) or os.path.splitdrive(folder_name)[0]:
+        return folder_name.replace('\\', '/').rstrip('/').split('/')[-1], filename
+    return folder_name, filename
+
+
+def _iter_order_file(order_file_path, script_index=None, _including=()):
+    """עובר על קובץ סדר ההרצה ומחזיר ('script', (תיקייה, קובץ)) או ('directive', (שם, ארגומנט))
+
+    script_index - ScriptIndex של תיקיית הסקריפטים; איתו רשומות glob (schema/*.sql,
+    data/**/*.sql) מורחבות לקבצים הקיימים במיון טבעי ונתיבים מקוננים מותאמים לעץ.
+    שורת include מכלילה קובץ סדר אחר (יחסית לקובץ הנוכחי) במקומה.
     """
     logger.info(f"Parsing execution order file: {order_file_path}")
-    execution_order = []
     
     if not os.path.exists(order_file_path):
         logger.error(f"Order file not found: {order_file_path}")
         raise FileNotFoundError(f"Order file not found: {order_file_path}")
     
+    real_path = os.path.realpath(order_file_path)
+    if real_path in _including:
+        raise ValueError(f"Order file includes itself: {' -> '.join(_including + (real_path,))}")
+    
     with open(order_file_path, 'r', encoding='utf-8') as f:
         lines = f.readlines()
     
@@ -65,74 +220,152 @@ def parse_execution_order_file(order_file_path):
         if not line or line.startswith('#') or line.startswith('//'):
             continue
         
-        # בדיקה שהשורה מסתיימת ב-.sql
-        if not line.endswith('.sql'):
-            logger.warning(f"Line {line_num}: '{line}' does not end with .sql - skipping")
+        include = _INCLUDE_RE.match(line)
+        if include and not is_script_file(line):
+            include_path = os.path.join(os.path.dirname(order_file_path), include.group(1).strip())
+            yield from _iter_order_file(include_path, script_index, _including + (real_path,))
             continue
         
-        # הסרת מספור בתחילת השורה אם קיים
-        clean_line = line
-        
-        # זיהוי מספור: "1. ", "2. ", וכו'
-        if '. ' in line:
-            parts = line.split('. ', 1)
-            if len(parts) == 2 and parts[0].strip().isdigit():
-                clean_line = parts[1]
-        
-        # זיהוי מספור עם Tab: "1	"
-        elif '\t' in line:
-            parts = line.split('\t', 1)
-            if len(parts) == 2 and parts[0].strip().isdigit():
-                clean_line = parts[1]
-        
-        # זיהוי מספור עם רווח: "1 "
-        elif ' ' in line:
-            parts = line.split(' ', 1)
-            if len(parts) == 2 and parts[0].strip().isdigit():
-                clean_line = parts[1]
-        
-        clean_line = clean_line.strip()
-        
-        # חלוקה לתיקייה וקובץ לפי נתיב
-        if '/' in clean_line or '\\' in clean_line:
-            # נתיב מלא - המרה לפורמט אחיד
-            path_parts = clean_line.replace('\\', '/').split('/')
-            if len(path_parts) >= 2:
-                folder_name = path_parts[-2]  # התיקייה האחרונה בנתיב
-                filename = path_parts[-1]     # שם הקובץ
-            else:
-                # אם אין תיקייה בנתיב
-                folder_name = 'scripts'
-                filename = clean_line
-        else:
-            # רק שם קובץ בלי נתיב - נשתמש בתיקייה ברירת מחדל
-            folder_name = 'scripts'
-            filename = clean_line
+        # הצהרות: @group <name>, @group-by-folder, @barrier, @profile <name>
+        if line.startswith('@'):
+            parts = line[1:].split(None, 1)
+            directive = parts[0].lower() if parts else ''
+            argument = parts[1].strip() if len(parts) == 2 else ''
+            if directive not in ORDER_FILE_DIRECTIVES:
+                logger.warning(f"Line {line_num}: unknown directive '{line}' - skipping")
+                continue
+            yield 'directive', (directive, argument)
+            continue
         
-        # וידוא שהקובץ מסתיים ב-.sql
-        if filename.endswith('.sql'):
-            execution_order.append((folder_name, filename))
-            logger.debug(f"Line {line_num}: Added [{folder_name}] {filename}")
+        entry = _parse_order_line(line, line_num)
+        if entry is None:
+            continue
+        if script_index is None:
+            if has_glob_magic(line):
+                logger.warning(f"Line {line_num}: pattern '{line}' needs the script folder - skipping")
+                continue
+            yield 'script', entry
+        elif index_contains(script_index, *entry) or not has_glob_magic(entry[0] + entry[1]):
+            yield 'script', _resolve_order_entry(script_index, *entry)
         else:
-            logger.warning(f"Line {line_num}: '{filename}' is not a SQL file - skipping")
+            # כמו בנתיב רגיל - תיקיות מעל שורש הסקריפטים מקוצרות עד שיש התאמה
+            for folder_name in _order_folder_candidates(entry[0]):
+                matches = script_index.glob(f"{folder_name}/{entry[1]}")
+                if matches:
+                    break
+            if not matches:
+                logger.warning(f"Line {line_num}: pattern '{entry[0]}/{entry[1]}' matches no scripts")
+            logger.debug("Line %d: pattern matched %d scripts", line_num, len(matches))
+            for folder_name, filename in matches:
+                yield 'script', (folder_name or '.', filename)
+
+
+def parse_execution_order_file(order_file_path, script_index=None):
+    """קורא את קובץ סדר ההרצה ומחזיר רשימה מסודרת של קבצים
+    
+    תומך בפורמט 2 בלבד - נתיבים פשוטים:
+    1. folder1/script1.sql
+    2. folder1/script2.sql
+    3. folder2/script3.sql
+    
+    או בלי מספור:
+    folder1/script1.sql
+    folder1/script2.sql
+    folder2/script3.sql
+    
+    הצהרות תלות (@group וכו') מדולגות - ראה parse_execution_stages
+    תבניות glob ושורות include - ראה _iter_order_file (תבניות דורשות script_index)
+    """
+    execution_order = [item for kind, item in _iter_order_file(order_file_path, script_index) if kind == 'script']
     
     logger.info(f"Parsed {len(execution_order)} scripts from order file")
     return execution_order
 
 
-def scan_and_validate_scripts(root_folder, execution_order):
-    """בודק שכל הקבצים מהרשימה קיימים בתיקיות"""
+def parse_execution_stages(order_file_path, script_index=None):
+    """קורא את קובץ סדר ההרצה כולל הצהרות תלות ומחזיר רשימת שלבים
+    
+    @group <name>      - הסקריפטים הבאים שייכים לקבוצה בשם זה
+    @group-by-folder   - כל תיקייה היא קבוצה נפרדת (עד ה-@barrier הבא)
+    @barrier           - השלב הבא מתחיל רק אחרי שכל הקבוצות שלפניו הסתיימו
+    
+    קבוצות באותו שלב בלתי תלויות וניתן להריץ אותן במקביל; בתוך קבוצה נשמר
+    הסדר שבקובץ. קובץ ללא הצהרות הוא שלב אחד עם קבוצה אחת (הרצה סדרתית).
+    מחזיר: [[(group_name, [(folder, filename), ...]), ...], ...]
+    """
+    stages = []
+    groups = {}
+    group_name = 'main'
+    by_folder = False
+    
+    for kind, item in _iter_order_file(order_file_path, script_index):
+        if kind == 'script':
+            name = item[0] if by_folder else group_name
+            groups.setdefault(name, []).append(item)
+            continue
+        
+        directive, argument = item
+        if directive == 'barrier':
+            if groups:
+                stages.append(list(groups.items()))
+            groups = {}
+            group_name = 'main'
+            by_folder = False
+        elif directive == 'group-by-folder':
+            by_folder = True
+        elif directive == 'group':
+            group_name = argument or 'main'
+            by_folder = False
+    
+    if groups:
+        stages.append(list(groups.items()))
+    
+    total = sum(len(scripts) for stage in stages for _, scripts in stage)
+    logger.info(f"Parsed {total} scripts in {len(stages)} stages from order file")
+    return stages
+
+
+def parse_profile_sections(order_file_path, script_index=None):
+    """מחזיר את פרופילי ה-session של קטעים מסומנים בקובץ סדר ההרצה
+
+    @profile <name>    - הסקריפטים הבאים רצים עם פרופיל ה-session הזה
+    @profile none      - הסקריפטים הבאים רצים בלי פרופיל
+    @profile default   - חזרה לפרופיל של ההרצה (session_profile)
+    מחזיר מילון (folder, filename) -> שם פרופיל או None, רק לסקריפטים שבתוך קטע מסומן.
+    """
+    script_profiles = {}
+    section = 'default'
+    
+    for kind, item in _iter_order_file(order_file_path, script_index):
+        if kind == 'directive':
+            directive, argument = item
+            if directive == 'profile':
+                section = argument or 'default'
+        elif section != 'default':
+            script_profiles[item] = None if section == 'none' else section
+    
+    return script_profiles
+
+
+def scan_and_validate_scripts(root_folder, execution_order, script_index=None):
+    """בודק שכל הקבצים מהרשימה קיימים בתיקיות
+
+    תיקיית הסקריפטים נסרקת פעם אחת לאינדקס (או script_index שכבר נבנה),
+    במקום בדיקת קיום לכל קובץ.
+    """
     logger.info(f"Scanning and validating scripts in: {root_folder}")
     found_scripts = []
     missing_scripts = []
+    if script_index is None:
+        script_index = build_script_index(root_folder)
     
     for folder_name, filename in execution_order:
         folder_path = os.path.join(root_folder, folder_name)
         script_path = os.path.join(folder_path, filename)
         
-        if os.path.exists(script_path):
+        if index_contains(script_index, folder_name, filename):
             found_scripts.append((folder_name, script_path))
-            logger.debug(f"Found script: [{folder_name}] {filename}")
+            logger.debug("Found script: [%s] %s", folder_name, filename)
         else:
             missing_scripts.append((folder_name, filename))
             logger.warning(f"Missing script: [{folder_name}] {filename}")
@@ -146,8 +379,9 @@ def display_execution_plan(execution_order, found_scripts, missing_scripts):
     logger.info(f"Displaying execution plan - {len(execution_order)} scripts total")
     print(f"\n=== Execution Plan - {len(execution_order)} scripts total ===")
     
+    missing = set(missing_scripts)
     for i, (folder_name, filename) in enumerate(execution_order, 1):
-        status = "✅" if (folder_name, filename) not in [(f, fn) for f, fn in missing_scripts] else "❌"
+        status = "✅" if (folder_name, filename) not in missing else "❌"
         message = f"{i:3d}. [{folder_name}] {filename} {status}"
         print(message)
         logger.info(message)
@@ -160,7 +394,7 @@ def display_execution_plan(execution_order, found_scripts, missing_scripts):
             print(message)
             logger.warning(message)
     
-    # הודעת messagebox
+    # הודעת סיכום למשתמש
     summary_message = f"Execution Plan:\n{len(found_scripts)} scripts found\n{len(missing_scripts)} scripts missing\n\n"
     
     if missing_scripts:
@@ -170,89 +404,417 @@ def display_execution_plan(execution_order, found_scripts, missing_scripts):
         if len(missing_scripts) > 5:
             summary_message += f"... and {len(missing_scripts) - 5} more"
     
-    messagebox.showinfo("Execution Plan", summary_message)
+    reporter.info("Execution Plan", summary_message)
+
 
+def iter_statement_batches(statements, batch_statements=1, batch_bytes=0):
+    """מקבץ הצהרות לחבילות לשליחה ב-round-trip אחד
 
-def execute_script_statements(cursor, connection, script_path, script_content):
-    """מבצע את כל ההצהרות SQL בסקריפט אחד"""
-    logger.debug(f"Executing statements from: {script_path}")
+    מחזיר זוגות (מספר ההצהרה הראשונה, רשימת הצהרות). פקודות טרנזקציה והצהרות
+    עם גוף מורכב (procedure/trigger וכו') נשלחות תמיד בחבילה משלהן.
+    PreparedRun (רצף הצהרות מוכנות) הוא חבילה בפני עצמו.
+    batch_bytes נמדד בבתים של UTF-8 כפי שהחבילה נשלחת (כולל המפרידים).
+    """
+    batch = []
+    batch_size = 0
+    first_index = 1
+    i = 0
     
-    # בדיקה אם הסקריפט מכיל טרנזקציה מפורשת
-    content_upper = script_content.upper().strip()
-    has_explicit_transaction = (
-        'START TRANSACTION' in content_upper or 
-        'BEGIN' in content_upper
-    ) and ('COMMIT' in content_upper or 'ROLLBACK' in content_upper)
+    for statement in statements:
+        i += 1
+        if isinstance(statement, PreparedRun):
+            if batch:
+                yield first_index, batch
+                batch = []
+                batch_size = 0
+            yield i, statement
+            i += len(statement) - 1
+            continue
+        
+        standalone = (
+            is_transaction_start(statement) or
+            is_transaction_end(statement) or
+            is_standalone_statement(statement)
+        )
+        # החבילה נשלחת כהצהרות מחוברות ב-";\n"
+        statement_size = utf8_length(statement) + 2 if batch_bytes else 0
+        if batch and (standalone or (batch_bytes and batch_size + statement_size > batch_bytes)):
+            yield first_index, batch
+            batch = []
+            batch_size = 0
+        
+        if not batch:
+            first_index = i
+        batch.append(statement)
+        batch_size += statement_size
+        
+        if standalone or len(batch) >= batch_statements:
+            yield first_index, batch
+            batch = []
+            batch_size = 0
+    
+    if batch:
+        yield first_index, batch
+
+
+def execute_statement_batch(cursor, batch, timings=None, prepared=None, results=None, first_index=0):
+    """שולח חבילת הצהרות לשרת ב-round-trip אחד
+
+    מחזיר את מספר ההצהרות שהסתיימו בהצלחה ואת השגיאה שעצרה את החבילה (או None).
+    השרת מפסיק לבצע חבילה בהצהרה הראשונה שנכשלת, כך שמספר התוצאות שנקראו
+    מזהה את ההצהרה הבעייתית.
+    timings - אם ניתנה רשימה, מתווסף אליה (שניות, שורות, אזהרות) לכל הצהרה שהסתיימה.
+    בחבילה, הזמן של כל הצהרה הוא הפרש הזמנים בין התוצאות שהשרת מחזיר.
+    prepared - PreparedStatementCache; PreparedRun מבוצע דרכו כהצהרה מוכנה
+    (ואם השרת לא מקבל את התבנית - כחבילת טקסט רגילה)
+    results - ResultExporter לכתיבת תוצאות SELECT / SHOW לקבצים; first_index הוא
+    אינדקס ההצהרה הראשונה בחבילה (לשם הקובץ). בלי exporter התוצאות נקראות ונזרקות.
+    """
+    if prepared is not None and isinstance(batch, PreparedRun):
+        result = prepared.execute_run(batch, timings)
+        if result is not None:
+            return result
     
-    if has_explicit_transaction:
-        # אם יש טרנזקציה מפורשת, נריץ את כל הסקריפט כמקשה אחת
-        logger.debug("Script contains explicit transaction - executing as single block")
+    completed = 0
+    started = time.perf_counter()
+    try:
+        if len(batch) == 1:
+            cursor.execute(batch[0])
+            if cursor.with_rows:
+                drain_result(cursor, results, first_index)
+            if timings is not None:
+                timings.append((time.perf_counter() - started, cursor.rowcount, cursor.warning_count))
+            return 1, None
+        
+        cursor.execute(';\n'.join(batch))
+        while True:
+            if cursor.with_rows:
+                drain_result(cursor, results, first_index + completed)
+            completed += 1
+            if timings is not None:
+                now = time.perf_counter()
+                timings.append((now - started, cursor.rowcount, cursor.warning_count))
+                started = now
+            if not cursor.nextset():
+                break
+    except mysql.connector.Error as e:
+        return completed, e
+    return completed, None
+
+
+def execute_chunked_batch(cursor, connection, statement, label, connection_manager=None, progress=None,
+                          timings=None):
+    """מבצע הצהרה מסומנת ב-/*@chunk ... */ בחלקים (ראה chunked.py)
+
+    מחזיר (completed, error) כמו execute_statement_batch. כל חלק עובר commit
+    בנפרד, כך שאחרי שגיאה החלקים שהסתיימו נשארים.
+    """
+    started = time.perf_counter()
+    lag_monitor = None
+    try:
+        settings, statement = parse_chunk_annotation(statement, CHUNKING)
+        if settings['max_lag'] and CHUNKING['replicas']:
+            if connection_manager is None:
+                logger.warning(f"{label}: no connection settings for the replicas - replication lag not checked")
+            else:
+                lag_monitor = ReplicationLagMonitor(connection_manager.config, CHUNKING['replicas'])
+        rows = execute_chunked_statement(
+            cursor, connection, statement, settings, lag_monitor, progress, label, CHUNKING['lag_check_interval'],
+            CHUNKING['lag_wait_timeout']
+        )
+    except (mysql.connector.Error, ChunkError) as e:
+        return 0, e
+    finally:
+        if lag_monitor is not None:
+            lag_monitor.close()
+    if timings is not None:
+        timings.append((time.perf_counter() - started, rows, 0))
+    return 1, None
+
+
+def resume_after_connection_loss(connection_manager, connection, cursor, replay):
+    """מחבר מחדש ומבצע שוב את ההצהרות שלא עברו commit לפני הניתוק
+
+    ניתוק נוסף בזמן ההמשך מנוסה שוב (עד retries של המנהל); כל שגיאה אחרת נזרקת.
+    """
+    for attempt in range(connection_manager.retries + 1):
+        try:
+            connection_manager.reconnect(connection)
+            if replay.statements:
+                logger.info(f"Replaying {len(replay.statements)} uncommitted statements after reconnect")
+            for statement in replay.statements:
+                _, error = execute_statement_batch(cursor, [statement])
+                if error is not None:
+                    raise error
+            return
+        except mysql.connector.Error as e:
+            if not is_connection_lost(e) or attempt == connection_manager.retries:
+                raise
+
+
+def execute_script_statements(cursor, connection, script_path, statements, options=None, profiler=None,
+                              progress=None, connection_manager=None, prepared=None, results=None):
+    """מבצע את כל ההצהרות SQL בסקריפט אחד
+
+    statements יכול להיות טקסט הסקריפט או כל iterable של הצהרות (למשל generator
+    מ-iter_script_statements) - ההצהרות נצרכות אחת-אחת בלי לטעון את כל הקובץ.
+    options דורס את EXECUTION_OPTIONS מ-config (גודל חבילה ותדירות commit).
+    profiler - RunProfiler לרישום זמן, שורות, אזהרות ובתים של כל הצהרה
+    progress - RunProgress לדיווח התקדמות; ביטול נבדק לפני כל חבילה וזורק RunCancelled
+    connection_manager - ConnectionManager; כשהחיבור נופל מתחברים מחדש, מבצעים שוב את
+        מה שלא עבר commit וממשיכים מההצהרה שנכשלה (או מתחילת הטרנזקציה המפורשת)
+    prepared - PreparedStatementCache לביצוע רצפי PreparedRun (ראה group_statement_runs)
+    results - ResultExporter לתוצאות SELECT / SHOW (ראה execute_statement_batch)
+    """
+    logger.debug("Executing statements from: %s", script_path)
+    options = {**EXECUTION_OPTIONS, **(options or {})}
+    commit_every = options['commit_every_statements']
+    commit_every_bytes = options['commit_every_bytes']
+    
+    if isinstance(statements, str):
+        statements = split_sql_statements(statements)
+    
+    # בתוך טרנזקציה מפורשת (START TRANSACTION ... COMMIT) לא מבצעים commit
+    # ובמקרה של שגיאה מבטלים את כל הטרנזקציה
+    in_transaction = False
+    executed = 0
+    uncommitted = 0
+    uncommitted_bytes = 0
+    replay = ReplayLog(CONNECTION['replay_buffer_bytes']) if connection_manager is not None else None
+    
+    def can_resume(error):
+        return replay is not None and replay.resumable and is_connection_lost(error)
+    
+    def resume():
+        resume_after_connection_loss(connection_manager, connection, cursor, replay)
+        if prepared is not None:
+            prepared.reset()
+    
+    def commit():
         try:
-            # ביטול auto-commit זמני
-            connection.autocommit = False
-            
-            # חלוקת הסקריפט להצהרות ופעולה על כל אחת בנפרד
-            statements = [stmt.strip() for stmt in script_content.split(';') if stmt.strip()]
-            
-            for statement in statements:
-                if statement.strip():
-                    cursor.execute(statement)
-            
-            # commit ידני
             connection.commit()
-            logger.info(f"Successfully executed script with explicit transaction from {script_path}")
-            return True
         except mysql.connector.Error as e:
-            error_msg = f"Error executing script with explicit transaction in {script_path}:\nError: {e}"
+            if not can_resume(e):
+                raise
+            resume()
+            connection.commit()
+        if replay is not None:
+            replay.committed()
+    
+    def record_batch(first_index, batch, completed, timings):
+        if profiler is not None:
+            for offset, (seconds, rows, warnings) in enumerate(timings):
+                profiler.record_statement(script_path, first_index + offset, batch[offset], seconds, rows, warnings)
+        if progress is not None:
+            progress.add_statements(script_path, completed,
+                                   sum(utf8_length(statement) for statement in batch[:completed]))
+    
+    batches = iter_statement_batches(
+        statements, max(1, options['batch_statements']), options['batch_bytes']
+    )
+    for first_index, batch in batches:
+        if progress is not None and progress.cancelled:
+            # עצירה נקייה בגבול הצהרה - כמו בשגיאה: שומרים את מה שבוצע, או מבטלים טרנזקציה פתוחה
+            if in_transaction:
+                connection.rollback()
+            else:
+                commit()
+            logger.warning(f"Execution cancelled before statement {first_index} in {script_path}")
+            raise RunCancelled(f"Execution cancelled before statement {first_index} in {script_path}")
+        
+        logger.debug("Executing statements %d-%d: %.50s...", first_index, first_index + len(batch) - 1, batch[0])
+        timings = [] if profiler is not None else None
+        chunked = is_chunked_statement(batch[0])
+        if chunked and in_transaction:
+            completed, error = 0, ChunkError("@chunk statements commit after every chunk - "
+                                             "they cannot run inside an explicit transaction")
+        elif chunked:
+            # הצהרה בחלקים מבצעת commit משלה - מה שלפניה נשמר קודם
+            commit()
+            uncommitted = 0
+            uncommitted_bytes = 0
+            label = f"{os.path.basename(script_path)} statement {first_index}"
+            completed, error = execute_chunked_batch(cursor, connection, batch[0], label, connection_manager,
+                                                     progress, timings)
+        else:
+            completed, error = execute_statement_batch(cursor, batch, timings, prepared, results, first_index)
+        record_batch(first_index, batch, completed, timings)
+        
+        resumes = 0
+        # חלקים שעברו commit לא מבוצעים שוב - הצהרה בחלקים לא ממשיכה אחרי ניתוק
+        while error is not None and not chunked and can_resume(error) and resumes < connection_manager.retries:
+            # מה שהסתיים בחבילה לפני הניתוק לא עבר commit ואבד גם הוא - נכנס ליומן ההמשך
+            replay.executed(batch[:completed])
+            executed += completed
+            first_index += completed
+            batch = batch[completed:]
+            completed = 0
+            if not replay.resumable:
+                break
+            resumes += 1
+            logger.warning(f"Connection lost at statement {first_index} in {script_path}: {error}")
+            resume()
+            timings = [] if profiler is not None else None
+            completed, error = execute_statement_batch(cursor, batch, timings, results=results,
+                                                       first_index=first_index)
+            record_batch(first_index, batch, completed, timings)
+        
+        executed += completed
+        if replay is not None:
+            replay.executed(batch[:completed])
+        
+        if error is not None:
+            statement = batch[completed]
+            if in_transaction:
+                error_msg = f"Error executing script with explicit transaction in {script_path}:\nStatement {first_index + completed}: {statement}\nError: {error}"
+                connection.rollback()
+            else:
+                error_msg = f"Error executing statement {first_index + completed} in {script_path}:\n{statement}\nError: {error}"
+                # ההצהרות שהצליחו לפני השגיאה נשמרות, כמו בהרצה הצהרה-הצהרה
+                commit()
             logger.error(error_msg)
-            messagebox.showerror("Error", error_msg)
+            reporter.error("Error", error_msg)
             print(f"\033[91m{error_msg}\033[0m")
-            connection.rollback()
             return False
-        finally:
-            # החזרת auto-commit למצב הרגיל
-            connection.autocommit = True
-    else:
-        # אם אין טרנזקציה מפורשת, נריץ לפי הצהרות נפרדות
-        logger.debug("Script has no explicit transaction - executing statement by statement")
-        statements = [stmt.strip() for stmt in script_content.split(';') if stmt.strip()]
         
-        for i, statement in enumerate(statements, 1):
-            try:
-                logger.debug(f"Executing statement {i}/{len(statements)}: {statement[:50]}...")
-                cursor.execute(statement)
-                connection.commit()
-            except mysql.connector.Error as e:
-                error_msg = f"Error executing statement in {script_path}:\n{statement}\nError: {e}"
-                logger.error(error_msg)
-                messagebox.showerror("Error", error_msg)
-                print(f"\033[91m{error_msg}\033[0m")
-                connection.rollback()
-                return False
+        if chunked:
+            if replay is not None:
+                replay.committed()
+            continue
         
-        logger.info(f"Successfully executed {len(statements)} statements from {script_path}")
-        return True
+        # פקודות טרנזקציה מגיעות תמיד בחבילה נפרדת
+        if is_transaction_start(batch[0]):
+            logger.debug("Script opens explicit transaction")
+            in_transaction = True
+            continue
+        if in_transaction:
+            if is_transaction_end(batch[0]):
+                in_transaction = False
+            continue
+        
+        uncommitted += len(batch)
+        uncommitted_bytes += sum(utf8_length(statement) for statement in batch)
+        if ((commit_every and uncommitted >= commit_every) or
+                (commit_every_bytes and uncommitted_bytes >= commit_every_bytes)):
+            commit()
+            uncommitted = 0
+            uncommitted_bytes = 0
+    
+    if in_transaction or uncommitted:
+        # טרנזקציה שלא נסגרה בסקריפט או הצהרות שטרם בוצע להן commit
+        commit()
+    
+    logger.info("Successfully executed %d statements from %s", executed, script_path)
+    return True
 
 
-def process_single_script(cursor, connection, script_path, db_name):
-    """מעבד סקריפט יחיד"""
+def _iter_file_statements(script_path, db_name):
+    """קורא סקריפט כזרם במעבר יחיד ומחזיר את ההצהרות שלו (עם החלפת שם מסד הנתונים אם ניתן)
+
+    סקריפט דחוס נפרס תוך כדי הקריאה, ישר לפירוק ולביצוע.
+    """
+    with open_script(script_path) as script_file:
+        lines = iter_db_name_replaced_lines(script_file, db_name) if db_name else script_file
+        yield from iter_sql_statements(lines)
+
+
+def open_script_cache():
+    """מחזיר את מטמון הסקריפטים המעובדים לפי SCRIPT_CACHE מ-config"""
+    directory = SCRIPT_CACHE['directory'] or os.path.join(get_app_dir(), '.script_cache')
+    return get_script_cache(directory, SCRIPT_CACHE['max_bytes'])
+
+
+def iter_script_statements(script_path, db_name=None, use_cache=False):
+    """מחזיר את הצהרות הסקריפט אחרי החלפת שם מסד הנתונים
+
+    db_name=None מחזיר את ההצהרות כמו שהן (לתוכנית משותפת לכמה יעדים).
+    use_cache - קריאה ממטמון ההצהרות המעובדות על הדיסק, ומילוי שלו בהחטאה.
+    """
+    if use_cache:
+        cache = open_script_cache()
+        yield from cache.iter_statements(
+            script_path, db_name, lambda: _iter_file_statements(script_path, db_name)
+        )
+    else:
+        yield from _iter_file_statements(script_path, db_name)
+
+
+def retarget_statements(statements, db_name):
+    """מתאים הצהרות מפורקות מראש למסד נתונים יעד (שם מסד הנתונים ופקודות USE)"""
+    use_command = f"USE `{db_name}`"
+    
+    for statement in statements:
+        if statement[:4].upper() == 'USE ':
+            yield use_command
+        else:
+            yield statement.replace('kupathairnew', db_name)
+
+
+def process_single_script(cursor, connection, script_path, db_name, options=None, parsed_statements=None,
+                          profiler=None, progress=None, connection_manager=None, script_root=None):
+    """מעבד סקריפט יחיד
+
+    parsed_statements - הצהרות של תוכנית משותפת (bundle), במקום קריאת הקובץ
+    profiler - RunProfiler לרישום זמני ההצהרות (אופציונלי)
+    progress - RunProgress לדיווח התקדמות וביטול (אופציונלי)
+    connection_manager - ConnectionManager לחיבור מחדש כשהחיבור נופל (אופציונלי)
+    script_root - תיקיית הסקריפטים (שמות קבצי התוצאות נגזרים מהנתיב היחסי אליה)
+    """
+    options = {**EXECUTION_OPTIONS, **(options or {})}
     script_name = os.path.basename(script_path)
     logger.info(f"Processing script: {script_name}")
     
-    if not os.path.exists(script_path):
+    if parsed_statements is not None:
+        statements = retarget_statements(parsed_statements, db_name)
+    elif not os.path.exists(script_path):
         logger.error(f"Script {script_path} not found. Skipping.")
         print(f"Script {script_path} not found. Skipping.")
         return False
-
-    with open(script_path, 'r', encoding='utf-8') as script_file:
-        script_content = script_file.read()
-
-    # החלפת שם מסד הנתונים בסקריפט
-    script_content = replace_db_name_in_script(script_path, db_name)
+    else:
+        # קריאה, החלפת שם מסד הנתונים וביצוע - הכל בזרם אחד
+        statements = iter_script_statements(script_path, db_name, options['script_cache'])
     
-    # ביצוע הסקריפט
-    success = execute_script_statements(cursor, connection, script_path, script_content)
+    # שלב טעינה מרוכזת - איחוד INSERT-ים של שורה אחת (או LOAD DATA) לפני הביצוע
+    if options['bulk_load']:
+        statements = optimize_bulk_inserts(
+            statements, options['bulk_load'], options['bulk_insert_bytes'], options['load_data_min_rows']
+        )
+    # רצפי הצהרות באותה צורה (UPDATE ... WHERE id = N) - כהצהרה מוכנה עם פרמטרים
+    prepared = None
+    if options['parameterize']:
+        statements = group_statement_runs(
+            statements, options['parameterize_min_run'], options['parameterize_max_run'], options['batch_bytes']
+        )
+        prepared = PreparedStatementCache(connection, options['prepared_cache_size'])
+    # תוצאות SELECT / SHOW לקבצים - תיקייה לכל מסד יעד, קובץ לכל הצהרה
+    results = None
+    if options['result_export']:
+        results = ResultExporter(os.path.join(options['result_export_dir'], db_name or 'default'),
+                                 options['result_export'], script_path, script_root)
+    try:
+        success = execute_script_statements(cursor, connection, script_path, statements, options, profiler,
+                                            progress, connection_manager, prepared, results)
+    except DECOMPRESSION_ERRORS as e:
+        # קובץ דחוס קטוע או פגום מתגלה רק כשהזרם מגיע למקום הפגום
+        connection.rollback()
+        error_msg = f"Compressed script {script_path} is corrupt or truncated: {e}"
+        logger.error(error_msg)
+        reporter.error("Error", error_msg)
+        print(f"\033[91m{error_msg}\033[0m")
+        success = False
+    except MissingDecompressorError as e:
+        # הקובץ נפתח רק כשהזרם מתחיל - שום הצהרה שלו לא בוצעה
+        connection.rollback()
+        logger.error(str(e))
+        reporter.error("Error", str(e))
+        print(f"\033[91m{e}\033[0m")
+        success = False
+    finally:
+        if prepared is not None:
+            prepared.close()
     
+    if results is not None and results.files:
+        logger.info(f"Exported {results.files} result sets of {script_name} to {results.directory}")
     if success:
         logger.info(f"Executed {script_name} successfully")
         print(f"\033[92mExecuted {script_name} successfully.\033[0m")
@@ -263,94 +825,479 @@ def process_single_script(cursor, connection, script_path, db_name):
     return success
 
 
-def test_server_connection(config):
-    """בודק את החיבור לשרת MySQL"""
+def prepare_bulk_load_options(connection, execution_options):
+    """מגביל את גודל ה-INSERT המאוחד ל-max_allowed_packet של השרת"""
+    options = dict(execution_options or {})
+    mode = options.get('bulk_load', EXECUTION_OPTIONS['bulk_load'])
+    if not mode:
+        return options
+    if mode not in BULK_LOAD_MODES:
+        raise ValueError(f"Unknown bulk load mode '{mode}' (expected one of: {', '.join(BULK_LOAD_MODES)})")
+    
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT @@max_allowed_packet")
+        (max_packet,) = cursor.fetchone()
+    finally:
+        cursor.close()
+    
+    limit = options.get('bulk_insert_bytes', EXECUTION_OPTIONS['bulk_insert_bytes'])
+    options['bulk_insert_bytes'] = min(limit, int(max_packet) - 1024)
+    logger.info(f"Bulk load mode '{mode}': extended INSERTs up to {options['bulk_insert_bytes']} bytes")
+    return options
+
+
+def test_server_connection(config, connection_manager=None):
+    """בודק את החיבור לשרת MySQL
+
+    connection_manager - אם ניתן, החיבור שנפתח נשאר פתוח ומשמש את ההרצה עצמה
+    """
     logger.info("Testing MySQL server connection")
     try:
-        connection = mysql.connector.connect(**config)
-        connection.close()
+        if connection_manager is not None:
+            connection_manager.shared_connection()
+        else:
+            connection = mysql.connector.connect(**config)
+            connection.close()
         logger.info("MySQL server connection successful")
-        messagebox.showinfo("Connection Test", "Successfully connected to MySQL server!")
+        reporter.info("Connection Test", "Successfully connected to MySQL server!")
         return True
     except mysql.connector.Error as e:
         error_msg = f"Failed to connect to MySQL server: {e}"
         logger.error(error_msg)
-        messagebox.showerror("Connection Error", error_msg)
+        reporter.error("Connection Error", error_msg)
+        return False
+
+
+def ensure_database(cursor, db_name):
+    """יוצר את מסד הנתונים אם הוא לא קיים; מחזיר True אם נוצר עכשיו"""
+    # בדיקה אם מסד הנתונים קיים
+    cursor.execute("SHOW DATABASES")
+    databases = [db[0] for db in cursor.fetchall()]
+    
+    if db_name in databases:
+        logger.info(f"Database '{db_name}' already exists")
         return False
+    
+    # יצירת מסד הנתונים
+    logger.info(f"Creating database '{db_name}'")
+    cursor.execute(f"CREATE DATABASE `{db_name}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    logger.info(f"Database '{db_name}' created successfully")
+    return True
 
 
-def create_database_if_not_exists(config, db_name):
-    """מתחבר לשרת MySQL ויוצר את מסד הנתונים אם הוא לא קיים"""
+def create_database_if_not_exists(config, db_name, connection=None):
+    """מתחבר לשרת MySQL ויוצר את מסד הנתונים אם הוא לא קיים
+
+    connection - חיבור קיים לשימוש (לא נסגר), במקום חיבור חדש לפי config
+    """
     logger.info(f"Checking if database '{db_name}' exists")
     
     # התחברות לשרת ללא מסד נתונים ספציפי
-    server_connection = mysql.connector.connect(**config)
+    server_connection = connection or mysql.connector.connect(**config)
     cursor = server_connection.cursor()
     
     try:
-        # בדיקה אם מסד הנתונים קיים
-        cursor.execute("SHOW DATABASES")
-        databases = [db[0] for db in cursor.fetchall()]
-        
-        if db_name in databases:
-            logger.info(f"Database '{db_name}' already exists")
-            messagebox.showinfo("Database Status", f"Database '{db_name}' already exists.")
+        if ensure_database(cursor, db_name):
+            reporter.info("Database Created", f"Database '{db_name}' created successfully.")
         else:
-            # יצירת מסד הנתונים
-            logger.info(f"Creating database '{db_name}'")
-            cursor.execute(f"CREATE DATABASE `{db_name}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
-            logger.info(f"Database '{db_name}' created successfully")
-            messagebox.showinfo("Database Created", f"Database '{db_name}' created successfully.")
+            reporter.info("Database Status", f"Database '{db_name}' already exists.")
             
     except mysql.connector.Error as e:
         error_msg = f"Error creating database '{db_name}': {e}"
         logger.error(error_msg)
-        messagebox.showerror("Database Error", error_msg)
+        reporter.error("Database Error", error_msg)
         raise
     finally:
         cursor.close()
-        server_connection.close()
+        if connection is None:
+            server_connection.close()
+
+
+def run_script_group(connection, group_name, scripts, db_name, options=None, run_context=None):
+    """מריץ קבוצת סקריפטים לפי הסדר על חיבור אחד ומחזיר את תוצאות הקבוצה
+
+    run_context - מצב משותף להרצה:
+        parsed_scripts - מילון נתיב -> הצהרות של תוכנית משותפת (ראה build_execution_plan)
+        ledger         - ScriptLedger לרישום תוצאת כל סקריפט
+        script_profiles - מילון (folder, filename) -> פרופיל session לקטעים מסומנים
+        profiler       - RunProfiler לרישום זמני הסקריפטים וההצהרות
+        progress       - RunProgress לדיווח התקדמות וביטול
+        connection_manager - ConnectionManager לשמירת החיבור בחיים ולחיבור מחדש
+        script_root    - תיקיית הסקריפטים (או ה-bundle) של ההרצה
+    """
+    options = {**EXECUTION_OPTIONS, **(options or {})}
+    run_context = run_context or {}
+    parsed_scripts = run_context.get('parsed_scripts')
+    ledger = run_context.get('ledger')
+    script_profiles = run_context.get('script_profiles') or {}
+    profiler = run_context.get('profiler')
+    progress = run_context.get('progress')
+    connection_manager = run_context.get('connection_manager')
+    script_root = run_context.get('script_root')
+    started = time.perf_counter()
+    successful_scripts = []
+    failed_scripts = []
+    # cursor לא-buffered - תוצאות SELECT נקראות מהשרת בחלקים ולא נטענות לזיכרון במלואן
+    cursor = connection.cursor(buffered=False)
+    
+    # פרופיל ה-session הפעיל על החיבור והערכים המקוריים לשחזור
+    active_profile = None
+    saved_settings = None
+    
+    try:
+        for i, (folder_name, script_path) in enumerate(scripts, 1):
+            script_name = os.path.basename(script_path)
+            if progress is not None:
+                progress.check_cancelled()
+            if connection_manager is not None:
+                # החיבור יכול להיסגר בין סקריפטים (idle timeout / failover)
+                connection_manager.ensure_connected(connection)
+            
+            profile = script_profiles.get((folder_name, script_name), options['session_profile'])
+            if profile != active_profile:
+                if saved_settings is not None:
+                    restore_session_settings(connection, saved_settings)
+                    saved_settings = None
+                if profile:
+                    logger.info(f"[{group_name}] Applying session profile '{profile}'")
+                    saved_settings = apply_session_settings(connection, SESSION_PROFILES[profile])
+                active_profile = profile
+                if connection_manager is not None:
+                    connection_manager.remember_session_settings(connection, SESSION_PROFILES.get(profile))
+            
+            logger.info(f"[{group_name}] Executing {i}/{len(scripts)}: [{folder_name}] {script_name}")
+            print(f"[{group_name}] Executing {i}/{len(scripts)}: [{folder_name}] {script_name}")
+            
+            parsed_statements = parsed_scripts.get(script_path) if parsed_scripts else None
+            script_started = time.perf_counter()
+            if progress is not None:
+                progress.start_script(script_path)
+            success = process_single_script(cursor, connection, script_path, db_name, options,
+                                            parsed_statements, profiler, progress, connection_manager, script_root)
+            script_duration = time.perf_counter() - script_started
+            if progress is not None:
+                progress.finish_script(script_path, success)
+            if profiler is not None:
+                profiler.record_script(script_path, script_duration, success)
+            if ledger is not None:
+                ledger.record(connection, script_path, success, script_duration)
+            if success:
+                successful_scripts.append(script_name)
+            else:
+                failed_scripts.append(script_name)
+    finally:
+        # שחזור משתני ה-session גם כשההרצה נכשלה
+        if saved_settings is not None:
+            restore_session_settings(connection, saved_settings)
+            if connection_manager is not None:
+                connection_manager.remember_session_settings(connection, None)
+        cursor.close()
+    
+    return {
+        'group': group_name,
+        'successful': successful_scripts,
+        'failed': failed_scripts,
+        'duration': time.perf_counter() - started,
+    }
+
+
+def _run_pooled_group(connection_pool, group_name, scripts, db_name, options, run_context):
+    """לוקח חיבור מהמאגר, מריץ את הקבוצה ומחזיר את החיבור למאגר"""
+    connection = connection_pool.get()
+    try:
+        return run_script_group(connection, group_name, scripts, db_name, options, run_context)
+    finally:
+        connection_pool.put(connection)
+
+
+def run_preflight(script_root, order_file_path, confirm=True):
+    """בדיקת pre-flight לפני שנוגעים במסד הנתונים
+
+    סורק את תיקיית הסקריפטים, מפרק את כל הסקריפטים במקביל ומדווח על מספר
+    ההצהרות, הגודל, בעיות תחביר וזמן הרצה משוער.
+    confirm - כשיש בעיות, שואל את המשתמש אם להמשיך
+    מחזיר מילון סיכום, או None אם המשתמש בחר לעצור.
+    """
+    logger.info(f"Running pre-flight check for: {order_file_path}")
+    started = time.perf_counter()
+    script_index = build_script_index(script_root)
+    execution_order = parse_execution_order_file(order_file_path, script_index)
+    found_scripts, missing_scripts = scan_and_validate_scripts(script_root, execution_order, script_index)
+    
+    results = preflight_scripts([script_path for _, script_path in found_scripts], PREFLIGHT['workers'])
+    estimated_seconds = estimate_duration(
+        results, PREFLIGHT['seconds_per_statement'], PREFLIGHT['megabytes_per_second']
+    )
+    problem_count = sum(len(result['problems']) for result in results)
+    
+    report = format_preflight_report(results, missing_scripts, estimated_seconds)
+    print(f"\n=== Pre-flight Check ===\n{report}")
+    logger.info(f"Pre-flight check finished in {time.perf_counter() - started:.2f}s:\n{report}")
+    
+    summary = {
+        'found': len(found_scripts),
+        'missing': len(missing_scripts),
+        'statements': sum(result['statements'] for result in results),
+        'bytes': sum(result['bytes'] for result in results),
+        'problems': problem_count,
+        'estimated_seconds': estimated_seconds,
+    }
+    if problem_count and confirm:
+        if not reporter.confirm("Pre-flight Problems",
+                                f"{problem_count} problems found in the scripts.\nContinue anyway?"):
+            logger.info("User chose to cancel due to pre-flight problems")
+            return None
+    elif not problem_count:
+        reporter.info("Pre-flight Check", report)
+    return summary
+
+
+def resolve_stage_scripts(script_root, stages, missing_scripts):
+    """ממיר את שלבי ההרצה לנתיבים מלאים ומשמיט סקריפטים חסרים"""
+    missing = set(missing_scripts)
+    return [
+        [
+            (group_name, [
+                (folder_name, os.path.join(script_root, folder_name, filename))
+                for folder_name, filename in scripts
+                if (folder_name, filename) not in missing
+            ])
+            for group_name, scripts in stage
+        ]
+        for stage in stages
+    ]
+
+
+def create_profiler(execution_options):
+    """יוצר RunProfiler אם ההרצה מבקשת פרופיל (profile / profile_output), אחרת None"""
+    options = {**EXECUTION_OPTIONS, **(execution_options or {})}
+    if not (options['profile'] or options['profile_output']):
+        return None
+    return RunProfiler(options['profile_output'], options['profile_top'])
+
+
+def check_session_profiles(execution_options, script_profiles):
+    """מוודא שכל פרופילי ה-session (של ההרצה ושל הקטעים המסומנים) מוגדרים ב-SESSION_PROFILES"""
+    names = set(script_profiles.values())
+    names.add((execution_options or {}).get('session_profile', EXECUTION_OPTIONS['session_profile']))
+    unknown = sorted(name for name in names if name and name not in SESSION_PROFILES)
+    if unknown:
+        raise ValueError(f"Unknown session profile(s): {', '.join(unknown)} (defined: {', '.join(SESSION_PROFILES)})")
+
+
+def apply_script_ledger(connection, script_root, stages, mode, content_hashes=None):
+    """טוען את יומן הסקריפטים של מסד היעד ומסנן את שלבי ההרצה לפי מצב היומן
+
+    content_hashes - hash-ים ידועים מראש (מ-bundle) במקום קריאת הקבצים
+    מחזיר (ledger, stages, skipped, changed) - ראה ScriptLedger.filter_stages
+    """
+    if mode not in LEDGER_MODES:
+        raise ValueError(f"Unknown ledger mode '{mode}' (expected one of: {', '.join(LEDGER_MODES)})")
+    
+    ledger = ScriptLedger(script_root)
+    if content_hashes:
+        ledger.hashes.update(content_hashes)
+    cursor = connection.cursor()
+    try:
+        ledger.load(cursor)
+        connection.commit()
+    finally:
+        cursor.close()
+    
+    stages, skipped_scripts, changed_scripts = ledger.filter_stages(stages, mode)
+    return ledger, stages, skipped_scripts, changed_scripts
 
 
-def run_scripts_by_order(config, db_name, script_root, order_file_path):
-    """פונקציה ראשית להרצת סקריפטים לפי סדר מקובץ"""
+def run_execution_stages(connection, config_with_db, stages, db_name, options=None, run_context=None):
+    """מריץ את שלבי ההרצה לפי הסדר; קבוצות באותו שלב רצות במקביל
+
+    המקביליות חסומה ב-parallel_groups מתוך האפשרויות. החיבור הראשי הוא חלק
+    ממאגר החיבורים, חיבורים נוספים נפתחים לפי הצורך ונסגרים בסוף ההרצה.
+    מחזיר רשימת תוצאות לכל קבוצה (כולל מספר השלב).
+    """
+    options = {**EXECUTION_OPTIONS, **(options or {})}
+    widest_stage = max(len(stage) for stage in stages)
+    pool_size = max(1, min(options['parallel_groups'], widest_stage))
+    group_results = []
+    
+    if pool_size == 1:
+        # הרצה סדרתית על החיבור הראשי
+        for stage_num, stage in enumerate(stages, 1):
+            for group_name, scripts in stage:
+                result = run_script_group(connection, group_name, scripts, db_name, options, run_context)
+                result['stage'] = stage_num
+                group_results.append(result)
+        return group_results
+    
+    connection_pool = queue.Queue()
+    connection_pool.put(connection)
+    extra_connections = []
+    connection_manager = (run_context or {}).get('connection_manager')
+    
+    try:
+        for _ in range(pool_size - 1):
+            if connection_manager is not None:
+                extra_connection = connection_manager.connect()
+            else:
+                extra_connection = mysql.connector.connect(**config_with_db)
+            extra_connections.append(extra_connection)
+            connection_pool.put(extra_connection)
+        logger.info(f"Running independent groups on a pool of {pool_size} connections")
+        
+        with ThreadPoolExecutor(max_workers=pool_size) as executor:
+            for stage_num, stage in enumerate(stages, 1):
+                logger.info(f"Starting stage {stage_num}/{len(stages)} with {len(stage)} groups")
+                print(f"\n--- Stage {stage_num}/{len(stages)}: {len(stage)} groups ---")
+                
+                futures = [
+                    executor.submit(_run_pooled_group, connection_pool, group_name, scripts, db_name, options, run_context)
+                    for group_name, scripts in stage
+                ]
+                # מחכים לכל הקבוצות בשלב לפני שממשיכים לשלב הבא
+                for future in futures:
+                    result = future.result()
+                    result['stage'] = stage_num
+                    group_results.append(result)
+    finally:
+        for extra_connection in extra_connections:
+            extra_connection.close()
+    
+    return group_results
+
+
+def create_connection_manager(config, execution_options=None):
+    """ConnectionManager להרצה - עם הרשאת LOCAL INFILE כשמצב הטעינה הוא load_data"""
+    options = {**EXECUTION_OPTIONS, **(execution_options or {})}
+    run_config = config.copy()
+    if options['bulk_load'] == 'load_data':
+        run_config['allow_local_infile'] = True
+    return ConnectionManager(run_config, options['reconnect_retries'],
+                             CONNECTION['backoff_seconds'], CONNECTION['max_backoff_seconds'])
+
+
+def run_scripts_by_order(config, db_name, script_root, order_file_path, execution_options=None, progress=None,
+                         connection_manager=None):
+    """פונקציה ראשית להרצת סקריפטים לפי סדר מקובץ
+
+    execution_options - דריסה של EXECUTION_OPTIONS עבור ההרצה הנוכחית
+    progress - RunProgress לדיווח התקדמות וביטול (RunCancelled נזרק הלאה)
+    connection_manager - ConnectionManager קיים (למשל אחרי test_server_connection) - החיבור
+                         המשותף שלו משמש את ההרצה והקורא אחראי לסגור אותו
+    מחזיר מילון סיכום, או None אם לא הורץ דבר (אין סקריפטים / המשתמש ביטל)
+    
+    עם metrics_file / metrics_port ההתקדמות מתפרסמת כמדדי Prometheus לאורך ההרצה,
+    ו-snapshot סופי עם סטטוס ההרצה נכתב בסיום (ראה metrics.py).
+    """
     logger.info("Starting script execution by order")
     logger.info(f"Database: {db_name}, Script root: {script_root}, Order file: {order_file_path}")
+    if execution_options:
+        logger.info(f"Execution options: {execution_options}")
+    
+    # bundle מהודר במקום קובץ סדר ותיקיית סקריפטים - הנתיבים יחסיים ל-bundle
+    bundle = None
+    if is_bundle_file(order_file_path):
+        bundle = ExecutionBundle(order_file_path)
+        script_root = order_file_path
     
-    # בדיקה/יצירת מסד הנתונים
-    create_database_if_not_exists(config, db_name)
+    owns_connections = connection_manager is None
+    if owns_connections:
+        connection_manager = create_connection_manager(config, execution_options)
     
-    # התחברות למסד הנתונים הספציפי
-    config_with_db = config.copy()
-    config_with_db['database'] = db_name
+    # מדדים חיים - המונים נלקחים מ-RunProgress, לכן נוצר אחד גם כשהקורא לא העביר
+    options = {**EXECUTION_OPTIONS, **(execution_options or {})}
+    metrics = None
+    if options['metrics_file'] or options['metrics_port'] is not None:
+        if progress is None:
+            progress = RunProgress()
+        metrics = MetricsExporter(progress, options['metrics_file'], options['metrics_port'], METRICS['host'],
+                                  METRICS['interval_seconds'], {'database': db_name})
+    summary = None
+    status = 'error'
     
-    connection = mysql.connector.connect(**config_with_db)
+    try:
+        template_name = options['template_database']
+        if template_name and template_name != db_name:
+            summary = run_from_template(config, db_name, template_name, script_root, order_file_path,
+                                        execution_options, progress, connection_manager)
+        else:
+            summary = _run_scripts_by_order(config, db_name, script_root, order_file_path, execution_options,
+                                            progress, bundle, connection_manager)
+        if summary is None:
+            status = 'cancelled'
+        elif summary['failed']:
+            status = 'failed'
+        else:
+            status = 'ok'
+        return summary
+    except RunCancelled:
+        status = 'cancelled'
+        raise
+    finally:
+        if metrics is not None:
+            metrics.finish(status, {**(summary or {}), 'reconnects': connection_manager.reconnects})
+        if owns_connections:
+            connection_manager.close()
+            logger.info("Database connections closed")
+        if bundle is not None:
+            bundle.close()
+
+
+def _run_scripts_by_order(config, db_name, script_root, order_file_path, execution_options, progress, bundle,
+                          connection_manager):
+    """גוף ההרצה של run_scripts_by_order - bundle הוא ExecutionBundle פתוח או None"""
+    # בדיקת pre-flight - לפני כל פעולה על מסד הנתונים (ל-bundle הבדיקה רצה לפני ההידור)
+    if bundle is None and (execution_options or {}).get('preflight', EXECUTION_OPTIONS['preflight']):
+        if run_preflight(script_root, order_file_path) is None:
+            return
+    
+    # בדיקה/יצירת מסד הנתונים ומעבר אליו - על אותו חיבור שמשמש את ההרצה
+    connection = connection_manager.shared_connection()
+    create_database_if_not_exists(config, db_name, connection)
+    connection_manager.use_database(db_name)
+    config_with_db = connection_manager.config
     logger.info(f"Connected to database '{db_name}' successfully")
-    messagebox.showinfo("Success", f"Connected to database '{db_name}' successfully.")
-   
-    cursor = connection.cursor()
+    reporter.info("Success", f"Connected to database '{db_name}' successfully.")
 
     try:
-        # קריאת סדר ההרצה מקובץ
+        execution_options = prepare_bulk_load_options(connection, execution_options)
+        
+        # קריאת סדר ההרצה מקובץ, או מ-bundle מהודר (ההצהרות כבר מפורקות)
         logger.info(f"Reading execution order from: {order_file_path}")
         print(f"Reading execution order from: {order_file_path}")
-        execution_order = parse_execution_order_file(order_file_path)
+        if bundle is not None:
+            stages = bundle.stages
+            script_profiles = bundle.script_profiles
+        else:
+            script_index = build_script_index(script_root)
+            stages = parse_execution_stages(order_file_path, script_index)
+            script_profiles = parse_profile_sections(order_file_path, script_index)
+        execution_order = [entry for stage in stages for _, scripts in stage for entry in scripts]
+        check_session_profiles(execution_options, script_profiles)
         
         if not execution_order:
             logger.warning("No scripts found in the order file")
-            messagebox.showinfo("No Scripts", "No scripts found in the order file.")
+            reporter.info("No Scripts", "No scripts found in the order file.")
             return
         
         # בדיקת קיום הקבצים
-        found_scripts, missing_scripts = scan_and_validate_scripts(script_root, execution_order)
+        if bundle is not None:
+            missing_scripts = bundle.missing_scripts
+            missing = set(missing_scripts)
+            found_scripts = [
+                (folder_name, bundle.script_path(folder_name, filename))
+                for folder_name, filename in execution_order if (folder_name, filename) not in missing
+            ]
+        else:
+            found_scripts, missing_scripts = scan_and_validate_scripts(script_root, execution_order, script_index)
         
         # הצגת תוכנית ההרצה
         display_execution_plan(execution_order, found_scripts, missing_scripts)
         
         if missing_scripts:
             logger.warning(f"Found {len(missing_scripts)} missing scripts")
-            response = messagebox.askyesno("Missing Scripts", 
-                                         f"{len(missing_scripts)} scripts are missing.\nContinue with available scripts?")
+            response = reporter.confirm("Missing Scripts",
+                                        f"{len(missing_scripts)} scripts are missing.\nContinue with available scripts?")
             if not response:
                 logger.info("User chose to cancel due to missing scripts")
                 return
@@ -358,20 +1305,46 @@ def run_scripts_by_order(config, db_name, script_root, order_file_path):
         logger.info("Starting script execution")
         print("\n=== Starting Script Execution ===")
         
-        # הרצת הסקריפטים לפי הסדר
-        successful_scripts = []
-        failed_scripts = []
+        # הרצת הסקריפטים לפי הסדר - קבוצות בלתי תלויות במקביל
+        stages = resolve_stage_scripts(script_root, stages, missing_scripts)
+        run_context = {'script_profiles': script_profiles, 'script_root': script_root}
+        if bundle is not None:
+            run_context['parsed_scripts'] = bundle.parsed_scripts()
+        profiler = create_profiler(execution_options)
+        if profiler is not None:
+            run_context['profiler'] = profiler
+        if progress is not None:
+            run_context['progress'] = progress
+        run_context['connection_manager'] = connection_manager
+        skipped_scripts = []
+        changed_scripts = []
         
-        for i, (folder_name, script_path) in enumerate(found_scripts, 1):
-            script_name = os.path.basename(script_path)
-            logger.info(f"Executing {i}/{len(found_scripts)}: [{folder_name}] {script_name}")
-            print(f"Executing {i}/{len(found_scripts)}: [{folder_name}] {script_name}")
-            
-            success = process_single_script(cursor, connection, script_path, db_name)
-            if success:
-                successful_scripts.append(script_name)
-            else:
-                failed_scripts.append(script_name)
+        # יומן סקריפטים - דילוג על סקריפטים שכבר הורצו / המשך מהכשל האחרון
+        ledger_mode = (execution_options or {}).get('ledger', EXECUTION_OPTIONS['ledger'])
+        if ledger_mode:
+            ledger, stages, skipped_scripts, changed_scripts = apply_script_ledger(
+                connection, script_root, stages, ledger_mode, bundle.content_hashes() if bundle else None
+            )
+            run_context['ledger'] = ledger
+            print(f"Ledger ({ledger_mode}): {len(skipped_scripts)} scripts skipped, "
+                  f"{len(changed_scripts)} changed since they were applied")
+            for script_path in changed_scripts:
+                print(f"\033[93m   Changed after apply: {ledger.script_key(script_path)}\033[0m")
+        
+        if progress is not None:
+            progress.add_scripts(
+                (script_path for stage in stages for _, scripts in stage for _, script_path in scripts),
+                bundle.script_sizes() if bundle else None
+            )
+        
+        try:
+            group_results = run_execution_stages(connection, config_with_db, stages, db_name, execution_options, run_context)
+        finally:
+            if profiler is not None:
+                profiler.close()
+        
+        successful_scripts = [name for result in group_results for name in result['successful']]
+        failed_scripts = [name for result in group_results for name in result['failed']]
         
         # סיכום ההרצה
         logger.info("Execution Summary:")
@@ -380,6 +1353,9 @@ def run_scripts_by_order(config, db_name, script_root, order_file_path):
         logger.info(f"Scripts missing: {len(missing_scripts)}")
         logger.info(f"Scripts executed successfully: {len(successful_scripts)}")
         logger.info(f"Scripts failed: {len(failed_scripts)}")
+        if ledger_mode:
+            logger.info(f"Scripts skipped by ledger: {len(skipped_scripts)}")
+            logger.info(f"Scripts changed since applied: {len(changed_scripts)}")
         
         print(f"\n=== Execution Summary ===")
         print(f"Total scripts in order: {len(execution_order)}")
@@ -387,6 +1363,23 @@ def run_scripts_by_order(config, db_name, script_root, order_file_path):
         print(f"Scripts missing: {len(missing_scripts)}")
         print(f"Scripts executed successfully: {len(successful_scripts)}")
         print(f"Scripts failed: {len(failed_scripts)}")
+        if ledger_mode:
+            print(f"Scripts skipped by ledger: {len(skipped_scripts)}")
+            print(f"Scripts changed since applied: {len(changed_scripts)}")
+        
+        if profiler is not None:
+            report = profiler.format_report()
+            print(f"\n=== Execution Profile ===\n{report}")
+            logger.info(f"Execution profile:\n{report}")
+        
+        if len(group_results) > 1:
+            print("\n=== Group Results ===")
+            for result in group_results:
+                message = (f"Stage {result['stage']} [{result['group']}]: "
+                           f"{len(result['successful'])} successful, {len(result['failed'])} failed, "
+                           f"{result['duration']:.1f}s")
+                print(message)
+                logger.info(message)
         
         summary_message = f"Execution completed!\n\n"
         summary_message += f"📋 Total in order: {len(execution_order)}\n"
@@ -394,44 +1387,437 @@ def run_scripts_by_order(config, db_name, script_root, order_file_path):
         summary_message += f"❌ Missing: {len(missing_scripts)}\n"
         summary_message += f"✅ Successful: {len(successful_scripts)}\n"
         summary_message += f"⚠️ Failed: {len(failed_scripts)}"
+        if ledger_mode:
+            summary_message += f"\n⏭️ Skipped (ledger): {len(skipped_scripts)}"
+            summary_message += f"\n✏️ Changed since applied: {len(changed_scripts)}"
         
-        messagebox.showinfo("Execution Summary", summary_message)
+        reporter.info("Execution Summary", summary_message)
         logger.info("Script execution completed successfully")
+        if connection_manager.reconnects:
+            logger.info(f"Reconnected {connection_manager.reconnects} times during the run")
+        
+        return {
+            'total': len(execution_order),
+            'found': len(found_scripts),
+            'missing': len(missing_scripts),
+            'successful': len(successful_scripts),
+            'failed': len(failed_scripts),
+            'skipped': len(skipped_scripts),
+            'changed': len(changed_scripts),
+            'groups': group_results,
+        }
                        
+    except RunCancelled:
+        logger.warning("Script execution cancelled")
+        raise
     except Exception as e:
         logger.error(f"Error during script execution: {e}")
         raise
+
+
+def compute_execution_plan_hash(script_root, order_file_path):
+    """hash של תוכנית ההרצה - קובץ הסדר (או bundle) ותוכן כל הסקריפטים"""
+    if is_bundle_file(order_file_path):
+        bundle = ExecutionBundle(order_file_path)
+        try:
+            script_hashes = bundle.script_hashes()
+            script_hashes.update({script_key(*entry): None for entry in bundle.missing_scripts})
+            return compute_plan_hash(bundle.stages, bundle.script_profiles, script_hashes)
+        finally:
+            bundle.close()
+    
+    script_index = build_script_index(script_root)
+    stages = parse_execution_stages(order_file_path, script_index)
+    execution_order = [entry for stage in stages for _, scripts in stage for entry in scripts]
+    found_scripts, missing_scripts = scan_and_validate_scripts(script_root, execution_order, script_index)
+    script_hashes = {script_key(*entry): None for entry in missing_scripts}
+    for folder_name, script_path in found_scripts:
+        script_hashes[script_key(folder_name, os.path.basename(script_path))] = file_sha256(script_path)
+    return compute_plan_hash(stages, parse_profile_sections(order_file_path, script_index), script_hashes)
+
+
+def run_from_template(config, db_name, template_name, script_root, order_file_path, execution_options,
+                      progress, connection_manager):
+    """יוצר את db_name כשיבוט של מסד תבנית, במקום הרצת כל הסקריפטים
+
+    התבנית נבנית (הרצה רגילה של הסקריפטים עליה) רק כשה-hash של התוכנית השתנה
+    מאז הבנייה האחרונה, או כש-rebuild_template מופעל. תבנית שההרצה עליה נכשלה
+    לא מסומנת, ולכן לא משמשת לשיבוט ותיבנה מחדש בפעם הבאה.
+    """
+    options = {**EXECUTION_OPTIONS, **(execution_options or {})}
+    plan_hash = compute_execution_plan_hash(script_root, order_file_path)
+    connection = connection_manager.shared_connection()
+    cursor = connection.cursor()
+    try:
+        template_hash = read_template_hash(cursor, template_name)
     finally:
         cursor.close()
-        connection.close()
-        logger.info("Database connection closed")
+    
+    summary = {
+        'total': 0, 'found': 0, 'missing': 0, 'successful': 0, 'failed': 0, 'skipped': 0, 'changed': 0,
+        'groups': [], 'template': template_name, 'template_built': False,
+    }
+    if template_hash != plan_hash or options['rebuild_template']:
+        reason = "rebuild requested" if template_hash == plan_hash else (
+            "not built yet" if template_hash is None else "execution plan changed")
+        logger.info(f"Building template database '{template_name}' ({reason}, plan {plan_hash[:12]})")
+        print(f"\n=== Building template database '{template_name}' ({reason}) ===")
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{template_name}`")
+        finally:
+            cursor.close()
+        
+        # התבנית נבנית על חיבורים משלה - החיבור המשותף נשאר על השרת ליצירת היעד;
+        # המדדים מתפרסמים מההרצה החיצונית (אותו RunProgress)
+        build_options = {**options, 'template_database': None, 'metrics_file': None, 'metrics_port': None}
+        build_summary = run_scripts_by_order(config, template_name, script_root, order_file_path, build_options,
+                                             progress)
+        if build_summary is None:
+            return None
+        summary.update(build_summary, template=template_name, template_built=True)
+        if build_summary['failed']:
+            logger.error(f"Template '{template_name}' build had {build_summary['failed']} failed scripts - "
+                         f"not cloning '{db_name}'")
+            reporter.error("Template Build Failed",
+                           f"{build_summary['failed']} scripts failed while building template '{template_name}'.\n"
+                           f"Database '{db_name}' was not created.")
+            return summary
+        mark_template(connection, template_name, plan_hash)
+    else:
+        logger.info(f"Template database '{template_name}' is up to date (plan {plan_hash[:12]})")
+    
+    print(f"\n=== Cloning '{template_name}' into '{db_name}' ===")
+    clone = clone_database(connection_manager, template_name, db_name, options['clone_workers'], progress)
+    summary['clone'] = clone
+    message = (f"Database '{db_name}' cloned from template '{template_name}': {clone['tables']} tables, "
+               f"{clone['rows']} rows, {clone['views']} views in {clone['duration']:.1f}s")
+    print(message)
+    reporter.info("Template Clone", message)
+    return summary
 
 
-def replace_db_name_in_script(script_path, db_name):
-    """מחליף את שם מסד הנתונים בסקריפט ומתאים פקודות USE"""
-    with open(script_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+def build_execution_plan(script_root, order_file_path, use_cache=False):
+    """קורא ומפרק את קובץ הסדר ואת כל הסקריפטים פעם אחת
+
+    התוכנית אינה תלויה במסד היעד - שם מסד הנתונים מוחלף בזמן ההרצה
+    (retarget_statements), כך שאותה תוכנית משמשת את כל היעדים.
+    ההצהרות המפורקות נכתבות ל-bundle זמני (ולא נשמרות בזיכרון), וכל יעד קורא
+    אותן מה-mmap שלו. order_file_path יכול להיות גם bundle מהודר (ראה
+    compile_execution_bundle). בסוף יש לקרוא ל-close_execution_plan.
+    """
+    if is_bundle_file(order_file_path):
+        return load_bundle_plan(order_file_path)
+    
+    logger.info(f"Building execution plan from: {order_file_path}")
+    script_index = build_script_index(script_root)
+    stages = parse_execution_stages(order_file_path, script_index)
+    execution_order = [entry for stage in stages for _, scripts in stage for entry in scripts]
+    script_profiles = parse_profile_sections(order_file_path, script_index)
+    found_scripts, missing_scripts = scan_and_validate_scripts(script_root, execution_order, script_index)
+    
+    spool_file, spool_path = tempfile.mkstemp(suffix=BUNDLE_EXTENSION, prefix='plan_')
+    os.close(spool_file)
+    writer = BundleWriter(spool_path)
+    try:
+        keys = _write_bundle_scripts(writer, found_scripts, use_cache)
+        writer.finish({
+            'order_file': os.path.basename(order_file_path),
+            'stages': stages,
+            'script_profiles': [],
+            'missing_scripts': missing_scripts,
+        })
+        bundle = ExecutionBundle(spool_path)
+    except BaseException:
+        writer.discard()
+        os.remove(spool_path)
+        raise
+    
+    # המפתחות הם הנתיבים האמיתיים - היומן וההתקדמות זהים להרצה רגילה מהתיקייה
+    parsed_scripts = {
+        script_path: BundleStatements(bundle, bundle.index['scripts'][key]) for script_path, key in keys.items()
+    }
+    statement_count = sum(len(statements) for statements in parsed_scripts.values())
+    logger.info(f"Execution plan ready: {len(parsed_scripts)} scripts, {statement_count} statements")
+    
+    return {
+        'execution_order': execution_order,
+        'found_scripts': found_scripts,
+        'missing_scripts': missing_scripts,
+        'script_root': script_root,
+        'stages': resolve_stage_scripts(script_root, stages, missing_scripts),
+        'parsed_scripts': parsed_scripts,
+        'script_profiles': script_profiles,
+        'bundle': bundle,
+        'spool_path': spool_path,
+    }
+
+
+def close_execution_plan(plan):
+    """סוגר את ה-bundle של התוכנית ומוחק את ה-bundle הזמני (אם נבנה כזה)"""
+    if plan.get('bundle') is not None:
+        plan['bundle'].close()
+    if plan.get('spool_path'):
+        os.remove(plan['spool_path'])
+
+
+def _write_bundle_scripts(writer, found_scripts, use_cache):
+    """מפרק כל סקריפט פעם אחת לתוך ה-bundle; מחזיר מילון נתיב -> מפתח ב-bundle"""
+    keys = {}
+    for folder_name, script_path in found_scripts:
+        if script_path in keys:
+            continue
+        filename = os.path.basename(script_path)
+        keys[script_path] = script_key(folder_name, filename)
+        statements = iter_script_statements(script_path, use_cache=use_cache)
+        writer.add_script(folder_name, filename, script_path, statements)
+    return keys
+
+
+def load_bundle_plan(bundle_path):
+    """פותח bundle מהודר ומחזיר תוכנית בפורמט של build_execution_plan"""
+    bundle = ExecutionBundle(bundle_path)
+    stages = bundle.stages
+    execution_order = [entry for stage in stages for _, scripts in stage for entry in scripts]
+    missing = set(bundle.missing_scripts)
+    found_scripts = [
+        (folder_name, bundle.script_path(folder_name, filename))
+        for folder_name, filename in execution_order if (folder_name, filename) not in missing
+    ]
+    
+    return {
+        'execution_order': execution_order,
+        'found_scripts': found_scripts,
+        'missing_scripts': bundle.missing_scripts,
+        'script_root': bundle_path,
+        'stages': resolve_stage_scripts(bundle_path, stages, bundle.missing_scripts),
+        'parsed_scripts': bundle.parsed_scripts(),
+        'script_profiles': bundle.script_profiles,
+        'content_hashes': bundle.content_hashes(),
+        'script_sizes': bundle.script_sizes(),
+        'bundle': bundle,
+    }
+
+
+def compile_execution_bundle(script_root, order_file_path, bundle_path, use_cache=False):
+    """מהדר קובץ סדר ותיקיית סקריפטים לקובץ bundle אחד
+
+    ה-bundle מכיל את ההצהרות המפורקות (לפני החלפת שם מסד הנתונים), hash של כל
+    סקריפט ואת מבנה השלבים והפרופילים - ההרצה ממנו לא קוראת ולא מפרקת שום סקריפט.
+    מחזיר מילון סיכום.
+    """
+    logger.info(f"Compiling bundle {bundle_path} from: {order_file_path}")
+    started = time.perf_counter()
+    script_index = build_script_index(script_root)
+    stages = parse_execution_stages(order_file_path, script_index)
+    execution_order = [entry for stage in stages for _, scripts in stage for entry in scripts]
+    script_profiles = parse_profile_sections(order_file_path, script_index)
+    found_scripts, missing_scripts = scan_and_validate_scripts(script_root, execution_order, script_index)
+    
+    writer = BundleWriter(bundle_path)
+    try:
+        _write_bundle_scripts(writer, found_scripts, use_cache)
+        writer.finish({
+            'order_file': os.path.basename(order_file_path),
+            'stages': stages,
+            'script_profiles': [[folder_name, filename, profile]
+                                for (folder_name, filename), profile in script_profiles.items()],
+            'missing_scripts': missing_scripts,
+        })
+    except BaseException:
+        writer.discard()
+        raise
+    
+    summary = {
+        'scripts': len(writer.scripts),
+        'missing': len(missing_scripts),
+        'statements': sum(entry['statements'] for entry in writer.scripts.values()),
+        'bytes': os.path.getsize(bundle_path),
+        'duration': time.perf_counter() - started,
+    }
+    message = (f"Compiled {summary['scripts']} scripts ({summary['statements']} statements, "
+               f"{summary['missing']} missing) into {bundle_path} in {summary['duration']:.1f}s")
+    logger.info(message)
+    print(message)
+    return summary
+
+
+def parse_fan_out_targets(targets_text, default_host):
+    """מפרק רשימת יעדים בפורמט "host/database" (מופרדים בפסיק או בשורה חדשה)
+
+    יעד בלי host ("database") משתמש ב-default_host.
+    """
+    targets = []
+    for item in re.split(r'[,\n]', targets_text):
+        item = item.strip()
+        if not item:
+            continue
+        if '/' in item:
+            host, database = item.split('/', 1)
+            targets.append((host.strip() or default_host, database.strip()))
+        else:
+            targets.append((default_host, item))
+    return targets
+
+
+def run_plan_on_target(config, target, plan, execution_options=None, progress=None):
+    """מריץ תוכנית מוכנה על יעד יחיד (host, database) ומחזיר את תוצאת היעד"""
+    host, db_name = target
+    started = time.perf_counter()
+    result = {
+        'host': host,
+        'database': db_name,
+        'status': 'ok',
+        'successful': 0,
+        'failed': 0,
+        'missing': len(plan['missing_scripts']),
+        'skipped': 0,
+        'duration': 0.0,
+    }
+    
+    target_config = config.copy()
+    target_config['host'] = host
+    connection_manager = create_connection_manager(target_config, execution_options)
+    
+    try:
+        # חיבור אחד ליעד - יצירת המסד וההרצה עצמה
+        connection = connection_manager.shared_connection()
+        try:
+            cursor = connection.cursor()
+            ensure_database(cursor, db_name)
+            cursor.close()
+            connection_manager.use_database(db_name)
+            config_with_db = connection_manager.config
+            
+            execution_options = prepare_bulk_load_options(connection, execution_options)
+            stages = plan['stages']
+            run_context = {'parsed_scripts': plan['parsed_scripts'], 'script_profiles': plan['script_profiles'],
+                           'script_root': plan['script_root'], 'connection_manager': connection_manager}
+            profile_output = (execution_options or {}).get('profile_output')
+            if profile_output:
+                # קובץ פרופיל נפרד לכל יעד
+                base, extension = os.path.splitext(profile_output)
+                execution_options = {**execution_options, 'profile_output': f"{base}_{host}_{db_name}{extension}"}
+            profiler = create_profiler(execution_options)
+            if profiler is not None:
+                run_context['profiler'] = profiler
+            if progress is not None:
+                run_context['progress'] = progress
+            ledger_mode = (execution_options or {}).get('ledger', EXECUTION_OPTIONS['ledger'])
+            if ledger_mode:
+                run_context['ledger'], stages, skipped_scripts, _ = apply_script_ledger(
+                    connection, plan['script_root'], stages, ledger_mode, plan.get('content_hashes')
+                )
+                result['skipped'] = len(skipped_scripts)
+            if progress is not None:
+                progress.add_scripts(
+                    (script_path for stage in stages for _, scripts in stage for _, script_path in scripts),
+                    plan.get('script_sizes')
+                )
+            
+            try:
+                group_results = run_execution_stages(
+                    connection, config_with_db, stages, db_name, execution_options, run_context
+                )
+            finally:
+                if profiler is not None:
+                    profiler.close()
+        finally:
+            connection_manager.close()
+        
+        result['successful'] = sum(len(group['successful']) for group in group_results)
+        result['failed'] = sum(len(group['failed']) for group in group_results)
+        if result['failed']:
+            result['status'] = 'failed'
+    except RunCancelled:
+        logger.warning(f"Target {host}/{db_name} cancelled")
+        result['status'] = 'cancelled'
+    except mysql.connector.Error as e:
+        logger.error(f"Target {host}/{db_name} failed: {e}")
+        result['status'] = f"error: {e}"
+    except Exception as e:
+        # שגיאה ביעד אחד (קובץ, פענוח, @chunk) לא עוצרת את שאר היעדים ואת טבלת הסיכום
+        logger.exception(f"Target {host}/{db_name} failed")
+        result['status'] = f"error: {e}"
+    
+    result['duration'] = time.perf_counter() - started
+    return result
+
+
+def format_fan_out_matrix(results):
+    """בונה טבלת סיכום טקסטואלית - שורה לכל יעד"""
+    headers = ('Host', 'Database', 'Status', 'OK', 'Failed', 'Missing', 'Skipped', 'Time (s)')
+    rows = [
+        (r['host'], r['database'], r['status'], str(r['successful']), str(r['failed']),
+         str(r['missing']), str(r['skipped']), f"{r['duration']:.1f}")
+        for r in results
+    ]
+    widths = [max(len(row[col]) for row in rows + [headers]) for col in range(len(headers))]
+    
+    lines = ['  '.join(cell.ljust(width) for cell, width in zip(headers, widths)).rstrip()]
+    lines.append('  '.join('-' * width for width in widths))
+    for row in rows:
+        lines.append('  '.join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip())
+    return '\n'.join(lines)
+
+
+def run_fan_out(config, targets, script_root, order_file_path, execution_options=None, progress=None):
+    """מריץ את אותה תוכנית על כמה יעדים (host, database) במקביל
+
+    הסקריפטים מפורקים פעם אחת בלבד; מספר היעדים שרצים במקביל חסום
+    ב-parallel_targets מתוך האפשרויות. מחזיר רשימת תוצאות לפי סדר היעדים.
+    progress - RunProgress משותף לכל היעדים (יעד שבוטל מסומן 'cancelled')
+    """
+    options = {**EXECUTION_OPTIONS, **(execution_options or {})}
+    logger.info(f"Starting fan-out to {len(targets)} targets")
     
-    # החלפת שם מסד הנתונים הישן בחדש
-    content = content.replace('kupathairnew', db_name)
+    if (options['preflight'] and not is_bundle_file(order_file_path)
+            and run_preflight(script_root, order_file_path) is None):
+        return []
+    
+    plan = build_execution_plan(script_root, order_file_path, options['script_cache'])
+    try:
+        check_session_profiles(options, plan['script_profiles'])
+        if not plan['execution_order']:
+            logger.warning("No scripts found in the order file")
+            return []
+        
+        max_workers = max(1, min(options['parallel_targets'], len(targets)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(run_plan_on_target, config, target, plan, options, progress)
+                for target in targets
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        close_execution_plan(plan)
     
-    # עיבוד פקודות USE - החלפה במקום הסרה
-    lines = content.split('\n')
-    filtered_lines = []
+    matrix = format_fan_out_matrix(results)
+    print(f"\n=== Fan-Out Summary ({len(targets)} targets) ===")
+    print(matrix)
+    logger.info(f"Fan-out summary:\n{matrix}")
+    return results
+
+
+def iter_db_name_replaced_lines(lines, db_name):
+    """מחליף את שם מסד הנתונים ומתאים פקודות USE - שורה אחר שורה"""
+    use_command = f"USE `{db_name}`;"
     
     for line in lines:
-        line_stripped = line.strip()
         # החלפת פקודות USE במקום הסרתן
-        if line_stripped.upper().startswith('USE '):
-            # החלפת שם מסד הנתונים בפקודת USE
-            new_use_command = f"USE `{db_name}`;"
-            filtered_lines.append(new_use_command)
-            logger.debug(f"Replaced USE command with: {new_use_command}")
+        if line.lstrip()[:4].upper() == 'USE ':
+            yield use_command + '\n' if line.endswith('\n') else use_command
         else:
-            filtered_lines.append(line)
+            # החלפת שם מסד הנתונים הישן בחדש
+            yield line.replace('kupathairnew', db_name)
+
+
+def replace_db_name_in_script(script_path, db_name):
+    """מחליף את שם מסד הנתונים בסקריפט ומתאים פקודות USE"""
+    with open_script(script_path) as f:
+        filtered_content = ''.join(iter_db_name_replaced_lines(f, db_name))
     
-    filtered_content = '\n'.join(filtered_lines)
-    logger.debug(f"Script processed: replaced USE commands, replaced db name with '{db_name}'")
+    logger.debug("Script processed: replaced USE commands, replaced db name with '%s'", db_name)
     return filtered_content
 
 
@@ -441,6 +1827,11 @@ def create_database_connection_config():
     user = user_entry.get() or DB_CONFIG['user']
     password = password_entry.get() or DB_CONFIG['password']
     
+    return build_connection_config(host, user, password)
+
+
+def build_connection_config(host, user, password):
+    """בונה קונפיגורציית חיבור לשרת (בלי מסד נתונים ספציפי)"""
     return {
         'host': host,
         'user': user,
@@ -458,40 +1849,226 @@ def get_user_inputs():
     return database, script_root_folder, order_file_path
 
 
+def _entry_int(entry, label, default, minimum):
+    """מספר שלם משדה בממשק (ריק = ברירת המחדל); ValueError עם הודעה למשתמש אם אינו תקין"""
+    text = entry.get().strip()
+    if not text:
+        return default
+    try:
+        value = int(text)
+    except ValueError:
+        raise ValueError(f"{label} must be a whole number (got '{text}').")
+    if value < minimum:
+        raise ValueError(f"{label} must be at least {minimum} (got {value}).")
+    return value
+
+
+def get_execution_options():
+    """מחזיר את הגדרות הביצוע מהממשק (חבילות ותדירות commit)
+
+    מעלה ValueError עם הודעה למשתמש כשאחד השדות המספריים אינו תקין.
+    """
+    return {
+        'batch_statements': _entry_int(batch_size_entry, "Statements per Round-Trip",
+                                       EXECUTION_OPTIONS['batch_statements'], 1),
+        'commit_every_statements': _entry_int(commit_every_entry, "Commit Every N Statements",
+                                              EXECUTION_OPTIONS['commit_every_statements'], 0),
+        'parallel_groups': _entry_int(parallel_groups_entry, "Parallel Groups",
+                                      EXECUTION_OPTIONS['parallel_groups'], 1),
+        'ledger': ledger_mode_var.get() if ledger_mode_var.get() in LEDGER_MODES else None,
+        'script_cache': bool(script_cache_var.get()),
+        'bulk_load': bulk_load_var.get() if bulk_load_var.get() in BULK_LOAD_MODES else None,
+        'session_profile': session_profile_var.get() if session_profile_var.get() in SESSION_PROFILES else None,
+        'profile_output': profile_output_entry.get().strip() or None,
+        'preflight': bool(preflight_var.get()),
+        'parameterize': bool(parameterize_var.get()),
+        'template_database': template_db_entry.get().strip() or None,
+        'result_export': result_export_var.get() if result_export_var.get() in RESULT_EXPORT_FORMATS else None,
+    }
+
+
+# הרצה ברקע - ה-thread של ההרצה שולח אירועים (הודעות, אישורים, התקדמות) דרך התור
+# והממשק קורא אותו ב-root.after, כך שהחלון לא קופא גם בהרצה של עשרות דקות
+worker_events = queue.Queue()
+active_progress = None
+
+
+def start_background_run(description, work):
+    """מריץ את work(progress) ב-thread רקע
+
+    work מחזיר (כותרת, הודעה) להצגה בסיום, או None. כל הדיווח למשתמש
+    בזמן ההרצה עובר דרך QueueReporter אל ה-thread של הממשק.
+    """
+    import tkinter as tk
+    global active_progress
+    
+    progress = RunProgress(listener=lambda snapshot: worker_events.put(('progress', snapshot)))
+    active_progress = progress
+    for button in (run_button, fan_out_button, test_connection_button):
+        button.config(state=tk.DISABLED)
+    cancel_button.config(state=tk.NORMAL)
+    progress_bar['value'] = 0
+    progress_label.config(text=f"{description}...")
+    set_reporter(QueueReporter(worker_events))
+    
+    def worker():
+        try:
+            worker_events.put(('done', work(progress)))
+        except RunCancelled:
+            worker_events.put(('cancelled', None))
+        except Exception as e:
+            logger.error(f"Error occurred: {e}")
+            worker_events.put(('failed', e))
+    
+    threading.Thread(target=worker, name='script-runner', daemon=True).start()
+    logger.info(f"{description} started in the background")
+
+
+def finish_background_run(kind, payload):
+    """מחזיר את הממשק למצב רגיל בסיום ההרצה ומציג את התוצאה"""
+    import tkinter as tk
+    global active_progress
+    
+    active_progress = None
+    set_reporter(TkReporter())
+    for button in (run_button, fan_out_button, test_connection_button):
+        button.config(state=tk.NORMAL)
+    cancel_button.config(state=tk.DISABLED)
+    logger.info("Run button re-enabled")
+    
+    if kind == 'cancelled':
+        progress_label.config(text="Cancelled")
+        reporter.info("Cancelled", "Execution was cancelled. Completed statements were committed.")
+    elif kind == 'failed':
+        progress_label.config(text="Failed")
+        reporter.error("Error", f"An error occurred: {payload}")
+    elif payload:
+        reporter.info(*payload)
+
+
+def update_progress_display(snapshot):
+    """מעדכן את פס ההתקדמות, הקצב וה-ETA"""
+    progress_bar['value'] = snapshot['fraction'] * 100
+    text = (f"Scripts {snapshot['scripts_done']}/{snapshot['scripts_total']} "
+            f"({snapshot['scripts_failed']} failed) | "
+            f"{snapshot['statements_per_sec']:,.0f} stmts/s | ETA {format_eta(snapshot['eta'])}")
+    if snapshot['cancelled']:
+        text += " | cancelling..."
+    if snapshot['current_scripts']:
+        text += f"\n{', '.join(snapshot['current_scripts'])}"
+    progress_label.config(text=text)
+
+
+def poll_worker_events():
+    """קורא את אירועי ה-thread של ההרצה (נקרא כל 100ms מלולאת Tk)"""
+    from tkinter import messagebox
+    
+    latest_progress = None
+    try:
+        while True:
+            event = worker_events.get_nowait()
+            kind = event[0]
+            if kind == 'progress':
+                latest_progress = event[1]
+            elif kind == 'info':
+                messagebox.showinfo(event[1], event[2])
+            elif kind == 'error':
+                messagebox.showerror(event[1], event[2])
+            elif kind == 'confirm':
+                event[3](messagebox.askyesno(event[1], event[2]))
+            else:
+                if latest_progress is not None:
+                    update_progress_display(latest_progress)
+                    latest_progress = None
+                finish_background_run(kind, event[1])
+    except queue.Empty:
+        pass
+    
+    if latest_progress is not None:
+        update_progress_display(latest_progress)
+    root.after(100, poll_worker_events)
+
+
+def on_cancel_button_click():
+    """מבקש לעצור את ההרצה בגבול ההצהרה הבאה"""
+    import tkinter as tk
+    
+    if active_progress is not None:
+        active_progress.cancel()
+        cancel_button.config(state=tk.DISABLED)
+
+
 def on_run_button_click():
     """פונקציה שמופעלת כשלוחצים על כפתור ההרצה"""
     logger.info("Run button clicked")
-    run_button.config(state=tk.DISABLED)
     
+    # קריאת הקלט מהממשק ב-thread הראשי - Tk אינו thread-safe
+    config = create_database_connection_config()
+    database, script_root_folder, order_file_path = get_user_inputs()
     try:
-        config = create_database_connection_config()
-        database, script_root_folder, order_file_path = get_user_inputs()
-        
-        logger.info(f"User inputs - Database: {database}, Script root: {script_root_folder}, Order file: {order_file_path}")
-        
-        if not order_file_path:
-            logger.error("No execution order file path specified")
-            messagebox.showerror("Error", "Please specify the execution order file path.")
-            return
-        
-        # בדיקת חיבור לשרת תחילה
-        if not test_server_connection(config):
-            logger.error("Failed to connect to MySQL server")
-            return
-        
-        run_scripts_by_order(config, database, script_root_folder, order_file_path)
+        execution_options = get_execution_options()
+    except ValueError as e:
+        logger.error(f"Invalid execution option: {e}")
+        reporter.error("Invalid Option", str(e))
+        return
+    
+    logger.info(f"User inputs - Database: {database}, Script root: {script_root_folder}, Order file: {order_file_path}")
+    
+    if not order_file_path:
+        logger.error("No execution order file path specified")
+        reporter.error("Error", "Please specify the execution order file path.")
+        return
+    
+    def work(progress):
+        # בדיקת חיבור לשרת תחילה - החיבור שנפתח בבדיקה משמש את ההרצה
+        connection_manager = create_connection_manager(config, execution_options)
+        try:
+            if not test_server_connection(config, connection_manager):
+                logger.error("Failed to connect to MySQL server")
+                return None
+            
+            run_scripts_by_order(config, database, script_root_folder, order_file_path, execution_options, progress,
+                                 connection_manager)
+        finally:
+            connection_manager.close()
         logger.info(f"Scripts execution completed successfully for database '{database}'")
-        messagebox.showinfo("Success", f"Scripts execution completed for database '{database}'.")
-    except Exception as e:
-        logger.error(f"Error occurred: {e}")
-        messagebox.showerror("Error", f"An error occurred: {e}")
-    finally:
-        run_button.config(state=tk.NORMAL)
-        logger.info("Run button re-enabled")
+        return "Success", f"Scripts execution completed for database '{database}'."
+    
+    start_background_run("Running scripts", work)
+
+
+def on_fan_out_button_click():
+    """מריץ את סדר ההרצה על כל היעדים שברשימה (fan-out)"""
+    logger.info("Fan-out button clicked")
+    
+    config = create_database_connection_config()
+    _, script_root_folder, order_file_path = get_user_inputs()
+    targets = parse_fan_out_targets(fan_out_targets_entry.get(), config['host'])
+    try:
+        execution_options = get_execution_options()
+    except ValueError as e:
+        logger.error(f"Invalid execution option: {e}")
+        reporter.error("Invalid Option", str(e))
+        return
+    
+    if not order_file_path:
+        reporter.error("Error", "Please specify the execution order file path.")
+        return
+    if not targets:
+        reporter.error("Error", "Please specify at least one fan-out target (host/database).")
+        return
+    
+    def work(progress):
+        results = run_fan_out(config, targets, script_root_folder, order_file_path, execution_options, progress)
+        return "Fan-Out Summary", format_fan_out_matrix(results) if results else "No scripts found in the order file."
+    
+    start_background_run("Running fan-out", work)
 
 
 def on_test_connection_click():
     """פונקציה לבדיקת חיבור לשרת"""
+    import tkinter as tk
+    
     logger.info("Test connection button clicked")
     test_connection_button.config(state=tk.DISABLED)
     
@@ -500,61 +2077,361 @@ def on_test_connection_click():
         test_server_connection(config)
     except Exception as e:
         logger.error(f"Error testing connection: {e}")
-        messagebox.showerror("Error", f"Error testing connection: {e}")
+        reporter.error("Error", f"Error testing connection: {e}")
     finally:
         test_connection_button.config(state=tk.NORMAL)
 
 
 def create_gui():
     """יוצר את הממשק הגרפי"""
-    global root, host_entry, user_entry, password_entry, db_name_entry, script_root_entry, order_file_entry, run_button, test_connection_button
+    import tkinter as tk
+    from tkinter import ttk
+    
+    global root, host_entry, user_entry, password_entry, db_name_entry, script_root_entry, order_file_entry, batch_size_entry, commit_every_entry, parallel_groups_entry, ledger_mode_var, script_cache_var, bulk_load_var, session_profile_var, profile_output_entry, preflight_var, parameterize_var, template_db_entry, result_export_var, fan_out_targets_entry, run_button, fan_out_button, test_connection_button, cancel_button, progress_bar, progress_label
     
     root = tk.Tk()
+    set_reporter(TkReporter())
     root.title("MySQL Script Runner - Order Based")
-    root.geometry("600x550")
+    root.geometry("600x800")
+
+    # הכפתורים וההתקדמות בתחתית החלון - תמיד גלויים; השדות מעליהם בתוך אזור גלילה
+    actions = tk.Frame(root)
+    actions.pack(side=tk.BOTTOM, fill=tk.X, pady=5)
+    canvas = tk.Canvas(root, highlightthickness=0)
+    scrollbar = tk.Scrollbar(root, orient=tk.VERTICAL, command=canvas.yview)
+    canvas.configure(yscrollcommand=scrollbar.set)
+    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+    canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+    form = tk.Frame(canvas)
+    form_window = canvas.create_window((0, 0), window=form, anchor='n')
+    form.bind('<Configure>', lambda event: canvas.configure(scrollregion=canvas.bbox('all')))
+    canvas.bind('<Configure>', lambda event: canvas.coords(form_window, event.width // 2, 0))
+
+    def on_mouse_wheel(event):
+        if event.num == 4 or event.delta > 0:
+            canvas.yview_scroll(-1, 'units')
+        else:
+            canvas.yview_scroll(1, 'units')
+
+    for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+        canvas.bind_all(sequence, on_mouse_wheel)
 
-    tk.Label(root, text="Enter Host:").pack(pady=5)
-    host_entry = tk.Entry(root, width=50)
+    tk.Label(form, text="Enter Host:").pack(pady=5)
+    host_entry = tk.Entry(form, width=50)
     host_entry.insert(0, DB_CONFIG['host'])
     host_entry.pack(pady=5)
 
-    tk.Label(root, text="Enter User:").pack(pady=5)
-    user_entry = tk.Entry(root, width=50)
+    tk.Label(form, text="Enter User:").pack(pady=5)
+    user_entry = tk.Entry(form, width=50)
     user_entry.insert(0, DB_CONFIG['user'])
     user_entry.pack(pady=5)
 
-    tk.Label(root, text="Enter Password:").pack(pady=5)
-    password_entry = tk.Entry(root, width=50, show="*")
+    tk.Label(form, text="Enter Password:").pack(pady=5)
+    password_entry = tk.Entry(form, width=50, show="*")
     password_entry.insert(0, DB_CONFIG['password'])
     password_entry.pack(pady=5)
 
     # כפתור לבדיקת חיבור
-    test_connection_button = tk.Button(root, text="Test Connection", command=on_test_connection_click, bg="lightblue", font=("Arial", 10))
+    test_connection_button = tk.Button(form, text="Test Connection", command=on_test_connection_click, bg="lightblue", font=("Arial", 10))
     test_connection_button.pack(pady=5)
 
-    tk.Label(root, text="Enter Database Name:").pack(pady=5)
-    db_name_entry = tk.Entry(root, width=50)
+    tk.Label(form, text="Enter Database Name:").pack(pady=5)
+    db_name_entry = tk.Entry(form, width=50)
     db_name_entry.insert(0, DB_CONFIG['database'])
     db_name_entry.pack(pady=5)
 
-    tk.Label(root, text="Enter Script Root Path:").pack(pady=5)
-    script_root_entry = tk.Entry(root, width=50)
+    tk.Label(form, text="Enter Script Root Path:").pack(pady=5)
+    script_root_entry = tk.Entry(form, width=50)
     script_root_entry.insert(0, 'scripts')
     script_root_entry.pack(pady=5)
 
     # שדה חדש לקובץ סדר ההרצה
-    tk.Label(root, text="Enter Execution Order File Path:").pack(pady=5)
-    order_file_entry = tk.Entry(root, width=50)
+    tk.Label(form, text="Enter Execution Order File Path:").pack(pady=5)
+    order_file_entry = tk.Entry(form, width=50)
     order_file_entry.insert(0, 'files.txt')
     order_file_entry.pack(pady=5)
 
-    run_button = tk.Button(root, text="Run Scripts by Order", command=on_run_button_click, bg="lightgreen", font=("Arial", 12))
-    run_button.pack(pady=15)
+    # הגדרות ביצוע - כמה הצהרות בכל round-trip וכל כמה הצהרות לבצע commit
+    tk.Label(form, text="Statements per Round-Trip:").pack(pady=5)
+    batch_size_entry = tk.Entry(form, width=50)
+    batch_size_entry.insert(0, str(EXECUTION_OPTIONS['batch_statements']))
+    batch_size_entry.pack(pady=5)
+
+    tk.Label(form, text="Commit Every N Statements (0 = end of script):").pack(pady=5)
+    commit_every_entry = tk.Entry(form, width=50)
+    commit_every_entry.insert(0, str(EXECUTION_OPTIONS['commit_every_statements']))
+    commit_every_entry.pack(pady=5)
+
+    tk.Label(form, text="Parallel Groups (see @group / @barrier in order file):").pack(pady=5)
+    parallel_groups_entry = tk.Entry(form, width=50)
+    parallel_groups_entry.insert(0, str(EXECUTION_OPTIONS['parallel_groups']))
+    parallel_groups_entry.pack(pady=5)
+
+    # יומן סקריפטים - הרצה אינקרמנטלית או המשך מהכשל האחרון
+    tk.Label(form, text="Ledger Mode:").pack(pady=5)
+    ledger_mode_var = tk.StringVar(root, value=EXECUTION_OPTIONS['ledger'] or 'off')
+    tk.OptionMenu(form, ledger_mode_var, 'off', *LEDGER_MODES).pack(pady=5)
+
+    script_cache_var = tk.BooleanVar(root, value=EXECUTION_OPTIONS['script_cache'])
+    tk.Checkbutton(form, text="Use preprocessed script cache", variable=script_cache_var).pack(pady=5)
+
+    # טעינה מרוכזת של INSERT-ים
+    tk.Label(form, text="Bulk Load:").pack(pady=5)
+    bulk_load_var = tk.StringVar(root, value=EXECUTION_OPTIONS['bulk_load'] or 'off')
+    tk.OptionMenu(form, bulk_load_var, 'off', *BULK_LOAD_MODES).pack(pady=5)
+
+    # פרופיל משתני session להרצה (ראה SESSION_PROFILES ב-config)
+    tk.Label(form, text="Session Profile:").pack(pady=5)
+    session_profile_var = tk.StringVar(root, value=EXECUTION_OPTIONS['session_profile'] or 'off')
+    tk.OptionMenu(form, session_profile_var, 'off', *SESSION_PROFILES).pack(pady=5)
+
+    # פרופיל זמני ריצה - ריק = בלי פרופיל
+    tk.Label(form, text="Profile Output File (.json / .csv, optional):").pack(pady=5)
+    profile_output_entry = tk.Entry(form, width=50)
+    profile_output_entry.pack(pady=5)
+
+    preflight_var = tk.BooleanVar(root, value=EXECUTION_OPTIONS['preflight'])
+    tk.Checkbutton(form, text="Pre-flight check (parse all scripts before running)", variable=preflight_var).pack(pady=5)
+    
+    parameterize_var = tk.BooleanVar(root, value=EXECUTION_OPTIONS['parameterize'])
+    tk.Checkbutton(form, text="Run repeated statement shapes as prepared statements",
+                   variable=parameterize_var).pack(pady=5)
+    
+    tk.Label(form, text="Template database (optional, clone instead of running scripts):").pack(pady=5)
+    template_db_entry = tk.Entry(form, width=50)
+    template_db_entry.pack(pady=5)
+
+    # תוצאות SELECT / SHOW מהסקריפטים לקבצים (תיקיית result_export_dir)
+    tk.Label(form, text="Export SELECT Results:").pack(pady=5)
+    result_export_var = tk.StringVar(root, value=EXECUTION_OPTIONS['result_export'] or 'off')
+    tk.OptionMenu(form, result_export_var, 'off', *RESULT_EXPORT_FORMATS).pack(pady=5)
+
+    # fan-out - אותו סדר הרצה על כמה מסדי נתונים / שרתים
+    tk.Label(form, text="Fan-Out Targets (host/database, comma separated):").pack(pady=5)
+    fan_out_targets_entry = tk.Entry(form, width=50)
+    fan_out_targets_entry.pack(pady=5)
+
+    buttons = tk.Frame(actions)
+    buttons.pack(pady=5)
+    run_button = tk.Button(buttons, text="Run Scripts by Order", command=on_run_button_click, bg="lightgreen", font=("Arial", 12))
+    run_button.pack(side=tk.LEFT, padx=5)
+    fan_out_button = tk.Button(buttons, text="Run on All Targets", command=on_fan_out_button_click, bg="khaki", font=("Arial", 10))
+    fan_out_button.pack(side=tk.LEFT, padx=5)
+
+    # התקדמות ההרצה (רצה ב-thread רקע) וביטול בגבול ההצהרה הבאה
+    progress_bar = ttk.Progressbar(actions, length=450, maximum=100, mode='determinate')
+    progress_bar.pack(pady=5)
+    progress_label = tk.Label(actions, text="Idle", justify=tk.CENTER)
+    progress_label.pack(pady=5)
+    cancel_button = tk.Button(actions, text="Cancel", command=on_cancel_button_click, state=tk.DISABLED, font=("Arial", 10))
+    cancel_button.pack(pady=5)
+
+    root.after(100, poll_worker_events)
   
 
 
-def main():
-    """פונקציה ראשית של התוכנית"""
+# קודי יציאה של מצב ה-CLI
+EXIT_OK = 0
+EXIT_SCRIPT_FAILURES = 1
+EXIT_USAGE_ERROR = 2
+EXIT_CONNECTION_ERROR = 3
+EXIT_CANCELLED = 4
+
+
+def build_arg_parser():
+    """בונה את מפרק הארגומנטים של מצב ה-CLI"""
+    parser = argparse.ArgumentParser(
+        description="Run MySQL scripts by an execution order file without a GUI."
+    )
+    parser.add_argument('--config', help="JSON file with any of the options below (command-line flags override it)")
+    parser.add_argument('--host', help=f"MySQL host (default: {DB_CONFIG['host']})")
+    parser.add_argument('--user', help=f"MySQL user (default: {DB_CONFIG['user']})")
+    parser.add_argument('--password', help="MySQL password (default: $MYSQL_PWD or config.py)")
+    parser.add_argument('--database', help=f"target database (default: {DB_CONFIG['database']})")
+    parser.add_argument('--script-root', help="root folder of the scripts (default: scripts)")
+    parser.add_argument('--order-file', help="execution order file (required)")
+    parser.add_argument('--batch-statements', type=int, help="statements per round-trip")
+    parser.add_argument('--commit-every', type=int, help="commit every N statements (0 = end of script)")
+    parser.add_argument('--parallel-groups', type=int, help="independent order-file groups to run concurrently")
+    parser.add_argument('--ledger', choices=LEDGER_MODES,
+                        help="skip scripts already applied (incremental) or continue from the last failure (resume)")
+    parser.add_argument('--script-cache', action='store_true', default=None,
+                        help="reuse preprocessed, pre-tokenized scripts from the on-disk cache")
+    parser.add_argument('--bulk-load', choices=BULK_LOAD_MODES,
+                        help="merge single-row INSERTs into extended INSERTs, or stream them through LOAD DATA LOCAL INFILE")
+    parser.add_argument('--session-profile', help="session settings profile from SESSION_PROFILES in config.py (e.g. bulk-build)")
+    parser.add_argument('--profile', action='store_true', default=None,
+                        help="time every statement and print the slowest statements and scripts at the end")
+    parser.add_argument('--profile-output', help="write the execution profile to a .json or .csv file")
+    parser.add_argument('--profile-top', type=int, help="how many slowest statements/scripts to report")
+    parser.add_argument('--preflight', action='store_true', default=None,
+                        help="parse and check all scripts before touching the database")
+    parser.add_argument('--parameterize', action='store_true', default=None,
+                        help="execute runs of same-shape statements as server-side prepared statements")
+    parser.add_argument('--prepared-cache-size', type=int,
+                        help="prepared statements kept open per connection (LRU)")
+    parser.add_argument('--template', metavar='TEMPLATE_DB',
+                        help="build TEMPLATE_DB once per execution plan and create --database as a clone of it")
+    parser.add_argument('--rebuild-template', action='store_true', default=None,
+                        help="rebuild the template database even if the execution plan did not change")
+    parser.add_argument('--clone-workers', type=int, help="tables copied in parallel when cloning the template")
+    parser.add_argument('--export-results', choices=RESULT_EXPORT_FORMATS,
+                        help="write SELECT/SHOW results from the scripts to one file per statement")
+    parser.add_argument('--export-dir', help="directory for exported results (default: results)")
+    parser.add_argument('--metrics-file', help="write live Prometheus metrics to this file (node_exporter textfile)")
+    parser.add_argument('--metrics-port', type=int, help="serve live Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument('--reconnect-retries', type=int,
+                        help="reconnect attempts (exponential backoff) when the server connection is lost")
+    parser.add_argument('--preflight-only', action='store_true', default=None,
+                        help="only run the pre-flight check (no database connection)")
+    parser.add_argument('--compile-bundle', metavar='BUNDLE',
+                        help="compile the order file and scripts into a .sqlbundle file and exit "
+                             "(run it later with --order-file BUNDLE)")
+    parser.add_argument('--targets', help="fan-out targets: host/database, comma separated")
+    parser.add_argument('--parallel-targets', type=int, help="fan-out targets to run concurrently")
+    parser.add_argument('--log-mode', choices=LOG_MODES,
+                        help="queue = write logs from a background thread (default from LOGGING in config.py)")
+    parser.add_argument('--log-format', choices=LOG_FORMATS, help="format of mysql_runner.log")
+    parser.add_argument('--log-level', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'), help="minimum log level")
+    parser.add_argument('--yes', action='store_true', default=None,
+                        help="continue when scripts are missing instead of stopping")
+    return parser
+
+
+def load_cli_options(argv):
+    """מפרק את ארגומנטי ה-CLI וממזג אותם עם קובץ הקונפיגורציה (אם ניתן)"""
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    
+    options = {}
+    if args.config:
+        try:
+            with open(args.config, 'r', encoding='utf-8') as f:
+                options.update(json.load(f))
+        except (OSError, ValueError) as e:
+            parser.error(f"cannot read config file {args.config}: {e}")
+    
+    options.update({key: value for key, value in vars(args).items() if value is not None and key != 'config'})
+    
+    options.setdefault('host', DB_CONFIG['host'])
+    options.setdefault('user', DB_CONFIG['user'])
+    options.setdefault('password', os.environ.get('MYSQL_PWD', DB_CONFIG['password']))
+    options.setdefault('database', DB_CONFIG['database'])
+    options.setdefault('script_root', 'scripts')
+    options.setdefault('yes', False)
+    
+    if not options.get('order_file'):
+        parser.error("--order-file is required")
+    return options
+
+
+def run_cli(argv):
+    """הרצה לא אינטראקטיבית (CI / שרתים ללא תצוגה) - מחזיר קוד יציאה"""
+    options = load_cli_options(argv)
+    set_reporter(ConsoleReporter(assume_yes=options['yes']))
+    if options.get('log_mode') or options.get('log_format') or options.get('log_level'):
+        setup_logging(options.get('log_mode'), options.get('log_format'), options.get('log_level'))
+    
+    config = build_connection_config(options['host'], options['user'], options['password'])
+    execution_options = {
+        key: options[cli_key]
+        for key, cli_key in (
+            ('batch_statements', 'batch_statements'),
+            ('commit_every_statements', 'commit_every'),
+            ('parallel_groups', 'parallel_groups'),
+            ('parallel_targets', 'parallel_targets'),
+            ('ledger', 'ledger'),
+            ('script_cache', 'script_cache'),
+            ('bulk_load', 'bulk_load'),
+            ('session_profile', 'session_profile'),
+            ('profile', 'profile'),
+            ('profile_output', 'profile_output'),
+            ('profile_top', 'profile_top'),
+            ('preflight', 'preflight'),
+            ('reconnect_retries', 'reconnect_retries'),
+            ('parameterize', 'parameterize'),
+            ('prepared_cache_size', 'prepared_cache_size'),
+            ('template_database', 'template'),
+            ('rebuild_template', 'rebuild_template'),
+            ('clone_workers', 'clone_workers'),
+            ('result_export', 'export_results'),
+            ('result_export_dir', 'export_dir'),
+            ('metrics_file', 'metrics_file'),
+            ('metrics_port', 'metrics_port'),
+        )
+        if options.get(cli_key) is not None
+    }
+    logger.info(f"CLI run - Host: {options['host']}, Database: {options['database']}, Order file: {options['order_file']}")
+    
+    try:
+        if options.get('compile_bundle'):
+            if options.get('preflight'):
+                summary = run_preflight(options['script_root'], options['order_file'], confirm=False)
+                if summary['problems']:
+                    return EXIT_SCRIPT_FAILURES
+            compile_execution_bundle(options['script_root'], options['order_file'], options['compile_bundle'],
+                                     options.get('script_cache', EXECUTION_OPTIONS['script_cache']))
+            return EXIT_OK
+        
+        if options.get('preflight_only'):
+            summary = run_preflight(options['script_root'], options['order_file'], confirm=False)
+            if summary['problems'] or summary['missing']:
+                return EXIT_SCRIPT_FAILURES
+            return EXIT_OK
+        
+        # Ctrl+C ראשון עוצר בגבול ההצהרה הבאה, שני עוצר מיד
+        progress = RunProgress()
+        
+        def on_interrupt(signum, frame):
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            print("\nCancelling at the next statement boundary (Ctrl+C again to abort)...")
+            progress.cancel()
+        
+        signal.signal(signal.SIGINT, on_interrupt)
+        
+        if options.get('targets'):
+            targets = parse_fan_out_targets(options['targets'], options['host'])
+            results = run_fan_out(config, targets, options['script_root'], options['order_file'],
+                                  execution_options, progress)
+            if progress.cancelled:
+                return EXIT_CANCELLED
+            if any(result['status'] != 'ok' for result in results):
+                return EXIT_SCRIPT_FAILURES
+            return EXIT_OK
+        
+        connection_manager = create_connection_manager(config, execution_options)
+        try:
+            if not test_server_connection(config, connection_manager):
+                return EXIT_CONNECTION_ERROR
+            
+            summary = run_scripts_by_order(config, options['database'], options['script_root'],
+                                           options['order_file'], execution_options, progress, connection_manager)
+        finally:
+            connection_manager.close()
+    except RunCancelled:
+        return EXIT_CANCELLED
+    except (FileNotFoundError, ValueError, BundleError) as e:
+        # קובץ/בחירה לא תקינים (פרופיל, מצב, פורמט, include מעגלי) - שגיאת שימוש ולא traceback
+        logger.error(str(e))
+        return EXIT_USAGE_ERROR
+    except mysql.connector.Error as e:
+        logger.error(f"Database error: {e}")
+        return EXIT_CONNECTION_ERROR
+    
+    if summary is None:
+        return EXIT_CANCELLED
+    if summary['failed']:
+        return EXIT_SCRIPT_FAILURES
+    return EXIT_OK
+
+
+def main(argv=None):
+    """פונקציה ראשית של התוכנית - עם ארגומנטים רץ כ-CLI, בלי ארגומנטים פותח את הממשק הגרפי"""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv:
+        sys.exit(run_cli(argv))
+    
     logger.info("Starting MySQL Script Runner application")
     try:
         create_gui()
@@ -566,4 +2443,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # נדרש ל-process pool של בדיקת ה-pre-flight כשרצים כ-EXE
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
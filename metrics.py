@@ -0,0 +1,180 @@
+import logging
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = 'mysql_runner'
+
+# (שם, סוג, תיאור, מפתח ב-snapshot של RunProgress) - הסיומת _total שמורה ל-counters
+_PROGRESS_METRICS = (
+    ('scripts_scheduled', 'gauge', 'Scripts scheduled in this run', 'scripts_total'),
+    ('scripts_done', 'counter', 'Scripts finished (successful or failed)', 'scripts_done'),
+    ('scripts_failed', 'counter', 'Scripts that failed', 'scripts_failed'),
+    ('statements_done', 'counter', 'Statements executed', 'statements_done'),
+    ('bytes_done', 'counter', 'Script bytes executed', 'bytes_done'),
+    ('bytes_scheduled', 'gauge', 'Script bytes scheduled in this run', 'bytes_total'),
+    ('statements_per_second', 'gauge', 'Average statements per second since the run started', 'statements_per_sec'),
+    ('bytes_per_second', 'gauge', 'Average script bytes per second since the run started', 'bytes_per_sec'),
+    ('progress_ratio', 'gauge', 'Fraction of script bytes executed (0-1)', 'fraction'),
+    ('elapsed_seconds', 'gauge', 'Seconds since the run started', 'elapsed'),
+    ('eta_seconds', 'gauge', 'Estimated seconds until the run finishes (NaN if unknown)', 'eta'),
+)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in sorted(labels.items())) + '}'
+
+
+def _value_text(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def format_metrics(snapshot, labels=None, final=None):
+    """מחזיר את ה-snapshot בפורמט הטקסט של Prometheus
+
+    labels - labels קבועים לכל המדדים (למשל database)
+    final - מילון סיכום בסוף ההרצה (status ומספרים נוספים), או None בזמן ההרצה
+    """
+    lines = []
+
+    def add(name, metric_type, description, value, extra_labels=None):
+        full_name = f"{METRICS_PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {description}")
+        lines.append(f"# TYPE {full_name} {metric_type}")
+        lines.append(f"{full_name}{_label_text({**(labels or {}), **(extra_labels or {})})} {_value_text(value)}")
+
+    for name, metric_type, description, key in _PROGRESS_METRICS:
+        add(name, metric_type, description, snapshot[key])
+    add('cancelled', 'gauge', 'Whether cancellation was requested', snapshot['cancelled'])
+
+    full_name = f"{METRICS_PREFIX}_current_script"
+    lines.append(f"# HELP {full_name} Scripts executing right now (value is always 1)")
+    lines.append(f"# TYPE {full_name} gauge")
+    for script in snapshot['current_scripts']:
+        lines.append(f"{full_name}{_label_text({**(labels or {}), 'script': script})} 1")
+
+    add('run_finished', 'gauge', 'Whether the run has finished', final is not None)
+    if final is not None:
+        add('run_success', 'gauge', 'Whether the run finished without failed scripts or errors',
+            final['status'] == 'ok')
+        add('run_status', 'gauge', 'Final status of the run (ok / failed / cancelled / error)', 1,
+            {'status': final['status']})
+        if final.get('missing') is not None:
+            add('scripts_missing', 'gauge', 'Scripts in the order file that were not found', final['missing'])
+        if final.get('skipped') is not None:
+            add('scripts_skipped', 'gauge', 'Scripts skipped by the ledger', final['skipped'])
+        if final.get('reconnects') is not None:
+            add('reconnects', 'counter', 'Reconnects after a lost connection', final['reconnects'])
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """מפרסם את ההתקדמות של הרצה כמדדי Prometheus - קובץ טקסט (ל-textfile collector
+    של node_exporter) ו/או נקודת HTTP מקומית (/metrics)
+
+    הקובץ נכתב מחדש כל interval שניות מ-thread רקע (בהחלפה אטומית, כך שה-collector
+    לא קורא קובץ חלקי); ה-HTTP מחזיר snapshot עדכני בכל בקשה. בסוף ההרצה finish()
+    כותב snapshot סופי עם סטטוס ההרצה - הקובץ נשאר עם הערכים הסופיים.
+    """
+
+    def __init__(self, progress, textfile=None, port=None, host='127.0.0.1', interval=5.0, labels=None):
+        self.progress = progress
+        self.textfile = textfile
+        self.interval = interval
+        self.labels = labels or {}
+        self.final = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._writer = None
+        self._server = None
+
+        if port is not None:
+            self._server = ThreadingHTTPServer((host, port), self._handler_class())
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+            logger.info(f"Serving run metrics on http://{host}:{self._server.server_address[1]}/metrics")
+        if textfile:
+            self.write_textfile()
+            self._writer = threading.Thread(target=self._write_loop, name='metrics-textfile', daemon=True)
+            self._writer.start()
+            logger.info(f"Writing run metrics to {textfile} every {interval}s")
+
+    @property
+    def port(self):
+        return self._server.server_address[1] if self._server is not None else None
+
+    def render(self):
+        with self._lock:
+            return format_metrics(self.progress.snapshot(), self.labels, self.final)
+
+    def write_textfile(self):
+        text = self.render()
+        temp_path = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(temp_path, self.textfile)
+        except OSError as e:
+            logger.warning(f"Could not write metrics file {self.textfile}: {e}")
+
+    def _write_loop(self):
+        while not self._stop_event.wait(self.interval):
+            self.write_textfile()
+
+    def _handler_class(self):
+        exporter = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("Metrics request: " + format, *args)
+
+        return MetricsHandler
+
+    def finish(self, status, summary=None):
+        """כותב את ה-snapshot הסופי (status: ok / failed / cancelled / error) ועוצר את ה-exporter"""
+        summary = summary or {}
+        with self._lock:
+            self.final = {'status': status, **{key: summary.get(key) for key in ('missing', 'skipped', 'reconnects')}}
+        self.close()
+        if self.textfile:
+            self.write_textfile()
+        snapshot = self.progress.snapshot()
+        logger.info(f"Final run metrics: status {status}, {snapshot['scripts_done']}/{snapshot['scripts_total']} "
+                    f"scripts ({snapshot['scripts_failed']} failed), {snapshot['statements_done']} statements, "
+                    f"{snapshot['statements_per_sec']:.1f} statements/s, {snapshot['elapsed']:.1f}s")
+
+    def close(self):
+        self._stop_event.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,242 @@
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from script_files import open_script, script_size, DECOMPRESSION_ERRORS
+from sql_tokenizer import iter_sql_statements
+
+
+logger = logging.getLogger(__name__)
+
+# מתחת לכמות הזו של סקריפטים עלות הקמת התהליכים גדולה מהחיסכון
+_MIN_PARALLEL_SCRIPTS = 8
+
+# מילות פתיחה מוכרות של הצהרות - הצהרה שמתחילה אחרת היא כנראה שארית של שגיאת תחביר
+_STATEMENT_START_RE = re.compile(
+    r'(\(|/\*[!+@]|ALTER|ANALYZE|BEGIN|BINLOG|CACHE|CALL|CHANGE|CHECK|CHECKSUM|CLONE|COMMIT|CREATE|DEALLOCATE|'
+    r'DECLARE|DELETE|DESC|DESCRIBE|DO|DROP|EXECUTE|EXPLAIN|FLUSH|GET|GRANT|HANDLER|HELP|IMPORT|INSERT|INSTALL|'
+    r'KILL|LOAD|LOCK|OPTIMIZE|PREPARE|PURGE|RELEASE|RENAME|REPAIR|REPLACE|RESET|RESIGNAL|RESTART|REVOKE|'
+    r'ROLLBACK|SAVEPOINT|SELECT|SET|SHOW|SHUTDOWN|SIGNAL|START|STOP|TABLE|TRUNCATE|UNINSTALL|UNLOCK|UPDATE|'
+    r'USE|VALUES|WITH|XA)\b',
+    re.IGNORECASE
+)
+
+# מחרוזות ושמות במרכאות - מוסרים לפני ספירת סוגריים
+_QUOTED_RE = re.compile(r"""'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|`[^`]*`""", re.DOTALL)
+
+_QUOTE_NAMES = {"'": 'string literal', '"': 'double-quoted string', '`': 'quoted identifier'}
+
+
+# תווים מיוחדים של תבנית glob
+_GLOB_MAGIC_RE = re.compile(r'[*?[]')
+
+# במערכות קבצים שאינן רגישות לאותיות (Windows) גם התבניות אינן רגישות
+_GLOB_FLAGS = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+
+
+def natural_sort_key(name):
+    """מפתח מיון "טבעי" - script_2 לפני script_10"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+
+def has_glob_magic(pattern):
+    return _GLOB_MAGIC_RE.search(pattern) is not None
+
+
+def _glob_regex(pattern):
+    """ממיר תבנית glob (עם ** לכל עומק תיקיות) לביטוי רגולרי על נתיב יחסי עם /"""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            parts.append('(?:/.*)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            chars = pattern[i + 1:end]
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            parts.append('[' + chars.replace('\\', '\\\\') + ']')
+            i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile(''.join(parts) + r'\Z', _GLOB_FLAGS)
+
+
+class ScriptIndex:
+    """אינדקס של תיקיית הסקריפטים - נבנה בסריקה אחת (os.scandir) ומשמש לבדיקת
+    קיום ולהרחבת תבניות glob בלי גישה נוספת לדיסק
+
+    directories - נתיב תיקייה יחסי עם / ('' = השורש) -> שמות הקבצים בה במיון טבעי.
+    בדיקת שייכות (in) היא על נתיב מנורמל עם os.path.normcase - מתנהגת כמו
+    os.path.exists גם במערכות קבצים שאינן רגישות לאותיות גדולות/קטנות.
+    """
+
+    def __init__(self, root_folder):
+        self.root_folder = root_folder
+        self.directories = {}
+        self._paths = set()
+        self._directory_keys = {}
+
+    def add(self, relative_dir, name):
+        self.directories.setdefault(relative_dir, []).append(name)
+        self._paths.add(os.path.normcase(os.path.join(relative_dir, name)))
+
+    def finish(self):
+        for names in self.directories.values():
+            names.sort(key=natural_sort_key)
+        self._directory_keys = {os.path.normcase(directory): directory for directory in self.directories}
+
+    def __contains__(self, path):
+        return path in self._paths
+
+    def __len__(self):
+        return len(self._paths)
+
+    def glob(self, pattern):
+        """מחזיר (תיקייה, קובץ) לכל קובץ שמתאים לתבנית (יחסית לשורש, עם /), במיון טבעי"""
+        directory_pattern, _, name_pattern = pattern.replace('\\', '/').rpartition('/')
+        if directory_pattern == '.':
+            directory_pattern = ''
+        name_re = _glob_regex(name_pattern)
+        if has_glob_magic(directory_pattern):
+            directory_re = _glob_regex(directory_pattern)
+            directories = [directory for directory in self.directories if directory_re.match(directory)]
+            directories.sort(key=lambda directory: [natural_sort_key(part) for part in directory.split('/')])
+        else:
+            directory = self._directory_keys.get(os.path.normcase(directory_pattern))
+            directories = [directory] if directory is not None else []
+        return [
+            (directory, name)
+            for directory in directories
+            for name in self.directories[directory] if name_re.match(name)
+        ]
+
+
+def build_script_index(root_folder):
+    """סורק את תיקיית הסקריפטים פעם אחת (os.scandir) ומחזיר ScriptIndex"""
+    index = ScriptIndex(root_folder)
+    pending = ['']
+    while pending:
+        relative_dir = pending.pop()
+        try:
+            entries = os.scandir(os.path.join(root_folder, relative_dir))
+        except FileNotFoundError:
+            logger.warning(f"Script folder not found: {os.path.join(root_folder, relative_dir)}")
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir():
+                    pending.append(f"{relative_dir}/{entry.name}" if relative_dir else entry.name)
+                else:
+                    index.add(relative_dir, entry.name)
+    index.finish()
+    logger.debug(f"Indexed {len(index)} files under {root_folder}")
+    return index
+
+
+def index_contains(index, folder_name, filename):
+    return os.path.normcase(os.path.normpath(os.path.join(folder_name, filename))) in index
+
+
+def _unbalanced_parentheses(statement):
+    stripped = _QUOTED_RE.sub('', statement)
+    return stripped.count('(') != stripped.count(')')
+
+
+def analyze_script(script_path):
+    """מפרק סקריפט ומחזיר מספר הצהרות, גודל ובעיות ברמת התחביר
+
+    רץ בתהליך נפרד - מחזיר מילון פשוט בלבד. בעיות הן זוגות (מספר הצהרה, תיאור);
+    מספר 0 מתייחס לקובץ כולו.
+    """
+    result = {'script': script_path, 'bytes': script_size(script_path), 'statements': 0, 'problems': []}
+    problems = result['problems']
+    state = {}
+    try:
+        with open_script(script_path) as f:
+            for index, statement in enumerate(iter_sql_statements(f, state=state), 1):
+                result['statements'] = index
+                if not _STATEMENT_START_RE.match(statement):
+                    problems.append((index, f"unexpected statement start: {statement[:40]!r}"))
+                elif _unbalanced_parentheses(statement):
+                    problems.append((index, "unbalanced parentheses"))
+    except UnicodeDecodeError as e:
+        problems.append((0, f"not valid UTF-8: {e}"))
+        return result
+    except DECOMPRESSION_ERRORS as e:
+        problems.append((0, f"corrupt or truncated compressed file: {e}"))
+        return result
+    except ValueError as e:
+        # למשל .sql.zst בלי החבילה zstandard
+        problems.append((0, str(e)))
+        return result
+
+    if state.get('quote'):
+        problems.append((result['statements'], f"unterminated {_QUOTE_NAMES[state['quote']]}"))
+    if state.get('in_comment'):
+        problems.append((result['statements'], "unterminated /* comment"))
+    if state.get('delimiter', ';') != ';':
+        problems.append((0, f"DELIMITER {state['delimiter']} is not reset to ; at the end of the script"))
+    if result['statements'] == 0:
+        problems.append((0, "script contains no statements"))
+    return result
+
+
+def preflight_scripts(script_paths, workers=None):
+    """מפרק את כל הסקריפטים במקביל (process pool) ומחזיר את תוצאות analyze_script לפי הסדר"""
+    if workers == 1 or len(script_paths) < _MIN_PARALLEL_SCRIPTS:
+        return [analyze_script(script_path) for script_path in script_paths]
+
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(script_paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze_script, script_paths, chunksize=chunksize))
+
+
+def estimate_duration(results, seconds_per_statement, megabytes_per_second):
+    """הערכה גסה של זמן ההרצה לפי מספר ההצהרות (round-trips) ונפח הנתונים"""
+    statements = sum(result['statements'] for result in results)
+    size = sum(result['bytes'] for result in results)
+    return statements * seconds_per_statement + size / (megabytes_per_second * 1024 * 1024)
+
+
+def _format_duration(seconds):
+    if seconds < 120:
+        return f"{seconds:.0f}s"
+    return f"{seconds / 60:.1f} min"
+
+
+def format_preflight_report(results, missing_scripts, estimated_seconds, max_problems=50):
+    """דוח טקסטואלי של בדיקת ה-pre-flight"""
+    statements = sum(result['statements'] for result in results)
+    size = sum(result['bytes'] for result in results)
+    problems = [(result['script'], index, problem) for result in results for index, problem in result['problems']]
+
+    lines = [
+        f"Scripts: {len(results)} found, {len(missing_scripts)} missing",
+        f"Statements: {statements}",
+        f"Size: {size / (1024 * 1024):.1f} MB",
+        f"Estimated duration: {_format_duration(estimated_seconds)}",
+        f"Problems: {len(problems)}",
+    ]
+    for script_path, index, problem in problems[:max_problems]:
+        location = f" #{index}" if index else ''
+        lines.append(f"  {os.path.basename(script_path)}{location}: {problem}")
+    if len(problems) > max_problems:
+        lines.append(f"  ... and {len(problems) - max_problems} more")
+    return '\n'.join(lines)
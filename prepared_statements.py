@@ -0,0 +1,207 @@
+import logging
+import re
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from bulk_load import decode_sql_string
+from sql_tokenizer import utf8_length
+
+
+logger = logging.getLogger(__name__)
+
+# רק הצהרות DML - בהן ליטרלים הם תמיד ערכים ולא חלק מהגדרת מבנה
+_PARAMETERIZABLE_RE = re.compile(r'\s*(INSERT|REPLACE|UPDATE|DELETE)\b', re.IGNORECASE)
+
+# ORDER BY 1 / GROUP BY 1 הם מספרי עמודות - פרמטר היה משנה את המשמעות
+_POSITIONAL_BY_RE = re.compile(r'\bBY\s+\d', re.IGNORECASE)
+
+# ליטרלים שהופכים לפרמטרים: מחרוזת בגרש או מספר שאינו חלק משם (t1, col_2, 1e5, 0x1F).
+# שמות במרכאות הפוכות נשמרים כפי שהם; הערות, מרכאות כפולות ו-? - ההצהרה נשארת טקסט.
+_LITERAL_RE = re.compile(
+    r"""(`[^`]*`)|'((?:[^'\\]|\\.|'')*)'|(?<![\w$.])(\d{1,18}(?:\.\d+)?)(?![\w$.])|("|/\*|--|\#|\?)""",
+    re.DOTALL
+)
+
+# שגיאות של שלב ה-prepare בלבד - השרת לא מכין את התבנית (למשל DATE ?, יותר מדי
+# פרמטרים, מכסת ההצהרות המוכנות בשרת מלאה) ומריצים את הרצף כטקסט
+_PREPARE_ERRNOS = {
+    errorcode.ER_PARSE_ERROR,                      # 1064
+    errorcode.ER_UNSUPPORTED_PS,                   # 1295
+    errorcode.ER_PS_MANY_PARAM,                    # 1390
+    errorcode.ER_PS_NO_RECURSION,                  # 1444
+    errorcode.ER_MAX_PREPARED_STMT_COUNT_REACHED,  # 1461
+}
+
+# מקסימום placeholders בהצהרה מוכנה בפרוטוקול של MySQL (ER_PS_MANY_PARAM מעבר לזה)
+MAX_PARAMETERS = 65535
+
+
+def parameterize_statement(statement):
+    """מחליף את הליטרלים בהצהרת DML ב-? ומחזיר (תבנית, פרמטרים), או None אם אין בזה טעם
+
+    התבנית מנורמלת ברווחים, כך שהצהרות באותה צורה מקבלות תבנית זהה.
+    """
+    if not _PARAMETERIZABLE_RE.match(statement) or _POSITIONAL_BY_RE.search(statement):
+        return None
+
+    parts = []
+    params = []
+    pos = 0
+    for match in _LITERAL_RE.finditer(statement):
+        identifier, string, number, unsupported = match.groups()
+        if unsupported is not None:
+            return None
+        if identifier is not None:
+            continue
+        if string is not None:
+            # מחרוזת עם קידומת (_utf8mb4'..', x'..', N'..') אינה ערך פשוט
+            if match.start() and (statement[match.start() - 1].isalnum() or statement[match.start() - 1] == '_'):
+                return None
+            params.append(decode_sql_string(string, "'"))
+        elif '.' in number:
+            params.append(Decimal(number))
+        else:
+            params.append(int(number))
+        parts.append(statement[pos:match.start()])
+        parts.append('?')
+        pos = match.end()
+
+    if not params or len(params) > MAX_PARAMETERS:
+        # INSERT מרובה שורות (bulk_load extended) יכול לעבור את מגבלת הפרמטרים
+        return None
+    parts.append(statement[pos:])
+    return ' '.join(''.join(parts).split()), tuple(params)
+
+
+class PreparedRun(list):
+    """רצף הצהרות באותה צורה - רשימת ההצהרות המקוריות ובנוסף תבנית ופרמטרים לכל אחת
+
+    חיתוך (run[n:]) מחזיר רשימה רגילה, כך שהמשך אחרי שגיאה או ניתוק רץ כטקסט.
+    """
+
+    def __init__(self, template, statements, params):
+        super().__init__(statements)
+        self.template = template
+        self.params = params
+
+
+def group_statement_runs(statements, min_run, max_run, max_bytes):
+    """שלב בין הפירוק לביצוע: רצף של לפחות min_run הצהרות באותה צורה הופך ל-PreparedRun
+
+    רצף חסום ב-max_run הצהרות וב-max_bytes (ההצהרות נשמרות בזיכרון עד הביצוע);
+    שאר ההצהרות עוברות כפי שהן.
+    """
+    template = None
+    pending = []
+    params = []
+    size = 0
+
+    def flush():
+        if len(pending) >= min_run:
+            yield PreparedRun(template, list(pending), list(params))
+        else:
+            yield from pending
+
+    for statement in statements:
+        parsed = parameterize_statement(statement)
+        if pending and (parsed is None or parsed[0] != template or len(pending) >= max_run or
+                        size + utf8_length(statement) > max_bytes):
+            yield from flush()
+            pending.clear()
+            params.clear()
+            size = 0
+        if parsed is None:
+            yield statement
+            continue
+        template = parsed[0]
+        pending.append(statement)
+        params.append(parsed[1])
+        size += utf8_length(statement)
+
+    if pending:
+        yield from flush()
+
+
+class PreparedStatementCache:
+    """הצהרות מוכנות (server-side) של חיבור אחד - cursor מוכן לכל תבנית, עם פינוי LRU
+
+    גודל המטמון חסום ב-max_size (גם השרת מגביל ב-max_prepared_stmt_count). תבנית
+    שהשרת דחה ב-prepare נזכרת, והרצפים שלה רצים כטקסט.
+    """
+
+    def __init__(self, connection, max_size):
+        self.connection = connection
+        self.max_size = max(1, max_size)
+        self._cursors = OrderedDict()   # תבנית -> cursor מוכן, או None אם אי אפשר להכין אותה
+        self.prepares = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def _cursor(self, template):
+        if template in self._cursors:
+            self._cursors.move_to_end(template)
+            self.hits += 1
+            return self._cursors[template], False
+        if len(self._cursors) >= self.max_size:
+            _, evicted = self._cursors.popitem(last=False)
+            self.evictions += 1
+            if evicted is not None:
+                evicted.close()
+        cursor = self.connection.cursor(prepared=True)
+        self._cursors[template] = cursor
+        self.prepares += 1
+        return cursor, True
+
+    def execute_run(self, run, timings=None):
+        """מבצע את הרצף כהצהרה מוכנה - כמו cursor.executemany, הצהרה אחרי הצהרה
+
+        לפרוטוקול הבינארי של MySQL אין ביצוע של כמה סטים של פרמטרים בבקשה אחת, כך
+        שכל סט הוא round-trip; הרווח הוא פירוק ותכנון אחד בשרת לכל התבנית. ביצוע
+        סט-סט גם מזהה את ההצהרה המדויקת שנכשלה.
+        מחזיר (הצהרות שהסתיימו, שגיאה או None) כמו execute_statement_batch,
+        או None אם השרת לא הצליח להכין את התבנית (ואז יש להריץ את הרצף כטקסט).
+        """
+        cursor, new = self._cursor(run.template)
+        if cursor is None:
+            return None
+
+        completed = 0
+        started = time.perf_counter()
+        try:
+            for params in run.params:
+                cursor.execute(run.template, params)
+                if cursor.with_rows:
+                    cursor.fetchall()
+                completed += 1
+                if timings is not None:
+                    now = time.perf_counter()
+                    timings.append((now - started, cursor.rowcount, cursor.warning_count))
+                    started = now
+        except mysql.connector.Error as e:
+            if new and completed == 0 and e.errno in _PREPARE_ERRNOS:
+                logger.debug("Cannot prepare %.80s (%s) - executing as text", run.template, e)
+                cursor.close()
+                self._cursors[run.template] = None
+                return None
+            return completed, e
+        return completed, None
+
+    def reset(self):
+        """אחרי חיבור מחדש ההצהרות המוכנות בשרת כבר לא קיימות - שוכחים אותן בלי לסגור"""
+        self._cursors.clear()
+
+    def close(self):
+        for cursor in self._cursors.values():
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except mysql.connector.Error as e:
+                    logger.debug("Error closing prepared statement: %s", e)
+        self._cursors.clear()
+        if self.prepares:
+            logger.debug("Prepared statements: %d prepared, %d reused, %d evicted",
+                         self.prepares, self.hits, self.evictions)
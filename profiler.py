@@ -0,0 +1,145 @@
+import csv
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+
+from sql_tokenizer import utf8_length
+
+
+logger = logging.getLogger(__name__)
+
+# אורך מקסימלי של טקסט הצהרה שנשמר בפרופיל
+STATEMENT_PREVIEW_LENGTH = 200
+
+_CSV_FIELDS = ('kind', 'script', 'index', 'seconds', 'rows', 'warnings', 'bytes', 'status', 'statement')
+
+
+class RunProfiler:
+    """אוסף זמני ריצה לכל הצהרה ולכל סקריפט בהרצה
+
+    הזיכרון חסום: לכל סקריפט נשמר רק סיכום, ומההצהרות נשמרות רק top_n האיטיות
+    ביותר. פרופיל CSV נכתב תוך כדי ההרצה (שורה לכל הצהרה), פרופיל JSON נכתב
+    בסוף ההרצה עם הסיכומים וההצהרות האיטיות. בטוח לשימוש מכמה threads.
+    """
+
+    def __init__(self, output_path=None, top_n=20):
+        self.output_path = output_path
+        self.top_n = top_n
+        self.started = time.perf_counter()
+        self.scripts = {}       # script_path -> סיכום
+        self.slowest = []       # heap של (seconds, seq, record)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._csv_file = None
+        self._csv_writer = None
+
+        if output_path and output_path.lower().endswith('.csv'):
+            self._csv_file = open(output_path, 'w', encoding='utf-8', newline='')
+            self._csv_writer = csv.DictWriter(self._csv_file, fieldnames=_CSV_FIELDS)
+            self._csv_writer.writeheader()
+
+    def _script_summary(self, script_path):
+        summary = self.scripts.get(script_path)
+        if summary is None:
+            summary = {
+                'script': script_path,
+                'seconds': 0.0,
+                'statements': 0,
+                'rows': 0,
+                'warnings': 0,
+                'bytes': 0,
+                'status': 'running',
+            }
+            self.scripts[script_path] = summary
+        return summary
+
+    def record_statement(self, script_path, index, statement, seconds, rows, warnings):
+        """רושם הצהרה שבוצעה: זמן, שורות שהושפעו, אזהרות ובתים שנשלחו"""
+        size = utf8_length(statement)
+        record = {
+            'kind': 'statement',
+            'script': script_path,
+            'index': index,
+            'seconds': round(seconds, 6),
+            'rows': max(rows or 0, 0),
+            'warnings': warnings or 0,
+            'bytes': size,
+            'status': 'ok',
+            'statement': statement[:STATEMENT_PREVIEW_LENGTH],
+        }
+        with self._lock:
+            summary = self._script_summary(script_path)
+            summary['statements'] += 1
+            summary['rows'] += record['rows']
+            summary['warnings'] += record['warnings']
+            summary['bytes'] += size
+
+            self._seq += 1
+            if len(self.slowest) < self.top_n:
+                heapq.heappush(self.slowest, (seconds, self._seq, record))
+            elif self.slowest and seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, (seconds, self._seq, record))
+
+            if self._csv_writer is not None:
+                self._csv_writer.writerow(record)
+
+    def record_script(self, script_path, seconds, success):
+        """רושם את זמן הריצה הכולל והסטטוס של סקריפט"""
+        with self._lock:
+            summary = self._script_summary(script_path)
+            summary['seconds'] = round(seconds, 6)
+            summary['status'] = 'ok' if success else 'failed'
+            if self._csv_writer is not None:
+                self._csv_writer.writerow({
+                    'kind': 'script',
+                    'script': script_path,
+                    'seconds': summary['seconds'],
+                    'rows': summary['rows'],
+                    'warnings': summary['warnings'],
+                    'bytes': summary['bytes'],
+                    'status': summary['status'],
+                    'index': summary['statements'],
+                })
+
+    def slowest_statements(self):
+        return [record for _, _, record in sorted(self.slowest, key=lambda item: -item[0])]
+
+    def slowest_scripts(self):
+        return sorted(self.scripts.values(), key=lambda summary: -summary['seconds'])[:self.top_n]
+
+    def format_report(self):
+        """דוח טקסטואלי של הסקריפטים וההצהרות האיטיים ביותר"""
+        lines = [f"Top {self.top_n} slowest scripts:"]
+        for summary in self.slowest_scripts():
+            lines.append(
+                f"  {summary['seconds']:9.3f}s  {summary['statements']:7d} stmts  "
+                f"{summary['rows']:9d} rows  {os.path.basename(summary['script'])} ({summary['status']})"
+            )
+        lines.append(f"Top {self.top_n} slowest statements:")
+        for record in self.slowest_statements():
+            preview = ' '.join(record['statement'].split())[:80]
+            lines.append(
+                f"  {record['seconds']:9.3f}s  {os.path.basename(record['script'])} #{record['index']}: {preview}"
+            )
+        return '\n'.join(lines)
+
+    def close(self):
+        """סוגר את קובץ ה-CSV או כותב את פרופיל ה-JSON"""
+        with self._lock:
+            if self._csv_file is not None:
+                self._csv_file.close()
+                self._csv_file = None
+                self._csv_writer = None
+            elif self.output_path:
+                profile = {
+                    'total_seconds': round(time.perf_counter() - self.started, 3),
+                    'scripts': list(self.scripts.values()),
+                    'slowest_statements': self.slowest_statements(),
+                }
+                with open(self.output_path, 'w', encoding='utf-8') as f:
+                    json.dump(profile, f, ensure_ascii=False, indent=2)
+        if self.output_path:
+            logger.info(f"Execution profile written to {self.output_path}")
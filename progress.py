@@ -0,0 +1,138 @@
+import logging
+import os
+import threading
+import time
+
+from script_files import script_size
+
+
+logger = logging.getLogger(__name__)
+
+
+class RunCancelled(Exception):
+    """ההרצה בוטלה על ידי המשתמש (נזרקת בגבול ההצהרה הבאה)"""
+
+
+class RunProgress:
+    """מעקב התקדמות וביטול של הרצה - משותף לכל ה-threads של ההרצה
+
+    ההתקדמות נמדדת בבתים של הצהרות שבוצעו מול גודל הסקריפטים, כך שאפשר לחשב
+    אחוז ו-ETA בלי לפרק את כל הסקריפטים מראש. listener מקבל snapshot (מילון)
+    לכל היותר פעם ב-interval שניות, מה-thread שמבצע את ההרצה.
+    """
+
+    def __init__(self, listener=None, interval=0.25):
+        self.listener = listener
+        self.interval = interval
+        self.scripts_total = 0
+        self.bytes_total = 0
+        self.scripts_done = 0
+        self.scripts_failed = 0
+        self.statements_done = 0
+        self.bytes_done = 0
+        self.current_scripts = []
+        self._sizes = {}            # script_path -> גודל המקור
+        self._script_bytes = {}     # (thread, script_path) -> (גודל הקובץ, בתים שנספרו עד עכשיו)
+        self.started = time.perf_counter()
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._last_notified = 0.0
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """מבקש לעצור את ההרצה - בטוח לקריאה מכל thread"""
+        logger.info("Cancellation requested")
+        self._cancel_event.set()
+        self._notify(force=True)
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise RunCancelled("Execution cancelled by user")
+
+    def add_scripts(self, script_paths, sizes=None):
+        """מוסיף סקריפטים לסך העבודה (אפשר לקרוא כמה פעמים, למשל לכל יעד ב-fan-out)
+
+        sizes - גודל המקור לכל נתיב, לסקריפטים שאינם קבצים על הדיסק (bundle)
+        """
+        with self._lock:
+            for script_path in script_paths:
+                size = sizes[script_path] if sizes else script_size(script_path)
+                self._sizes[script_path] = size
+                self.scripts_total += 1
+                self.bytes_total += size
+        self._notify(force=True)
+
+    def start_script(self, script_path):
+        with self._lock:
+            self.current_scripts.append(os.path.basename(script_path))
+            self._script_bytes[threading.get_ident(), script_path] = (self._sizes.get(script_path, 0), 0)
+        self._notify(force=True)
+
+    def finish_script(self, script_path, success):
+        """מסיים סקריפט - יתרת גודל הקובץ (הערות, רווחים) נספרת כהתקדמות"""
+        with self._lock:
+            name = os.path.basename(script_path)
+            if name in self.current_scripts:
+                self.current_scripts.remove(name)
+            size, counted = self._script_bytes.pop((threading.get_ident(), script_path), (0, 0))
+            self.bytes_done += max(size - counted, 0)
+            self.scripts_done += 1
+            if not success:
+                self.scripts_failed += 1
+        self._notify(force=True)
+
+    def add_statements(self, script_path, count, size):
+        """size - בתים של UTF-8 שנשלחו (כמו גודל המקור ב-bytes_total)"""
+        with self._lock:
+            self.statements_done += count
+            self.bytes_done += size
+            key = (threading.get_ident(), script_path)
+            if key in self._script_bytes:
+                total, counted = self._script_bytes[key]
+                self._script_bytes[key] = (total, counted + size)
+        self._notify()
+
+    def snapshot(self):
+        """מצב ההתקדמות הנוכחי: ספירות, קצב, אחוז ו-ETA (בשניות, או None)"""
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            fraction = min(self.bytes_done / self.bytes_total, 1.0) if self.bytes_total else 0.0
+            eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+            return {
+                'scripts_total': self.scripts_total,
+                'scripts_done': self.scripts_done,
+                'scripts_failed': self.scripts_failed,
+                'statements_done': self.statements_done,
+                'bytes_done': self.bytes_done,
+                'bytes_total': self.bytes_total,
+                'statements_per_sec': self.statements_done / elapsed if elapsed else 0.0,
+                'bytes_per_sec': self.bytes_done / elapsed if elapsed else 0.0,
+                'fraction': fraction,
+                'elapsed': elapsed,
+                'eta': eta,
+                'current_scripts': list(self.current_scripts),
+                'cancelled': self._cancel_event.is_set(),
+            }
+
+    def _notify(self, force=False):
+        if self.listener is None:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_notified < self.interval:
+            return
+        self._last_notified = now
+        self.listener(self.snapshot())
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return '--:--'
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
@@ -0,0 +1,117 @@
+import logging
+import sys
+import threading
+from abc import ABC, abstractmethod
+
+
+logger = logging.getLogger(__name__)
+
+
+class Reporter(ABC):
+    """ממשק דיווח למשתמש - הודעות מידע, שגיאות ושאלות אישור
+
+    הקוד הראשי מדווח רק דרך הממשק הזה, כך שאותו קוד משמש גם את הממשק
+    הגרפי וגם הרצה לא אינטראקטיבית (CLI / pipelines). reporter שחסרה לו
+    מתודה נכשל כבר ביצירה, ולא באמצע הרצה.
+    """
+
+    @abstractmethod
+    def info(self, title, message):
+        """הודעת מידע"""
+
+    @abstractmethod
+    def error(self, title, message):
+        """הודעת שגיאה"""
+
+    @abstractmethod
+    def confirm(self, title, message):
+        """שאלת אישור - מחזירה True / False"""
+
+
+class ConsoleReporter(Reporter):
+    """דיווח לקונסול בלי שום דיאלוג - שאלות אישור נענות לפי assume_yes"""
+
+    def __init__(self, assume_yes=False, stream=None):
+        self.assume_yes = assume_yes
+        self.stream = stream
+
+    def _write(self, text):
+        stream = self.stream or sys.stderr
+        stream.write(text + '\n')
+        stream.flush()
+
+    def info(self, title, message):
+        self._write(f"[{title}] {message}")
+
+    def error(self, title, message):
+        self._write(f"[{title}] ERROR: {message}")
+
+    def confirm(self, title, message):
+        answer = 'yes' if self.assume_yes else 'no'
+        logger.info(f"{title}: {message.splitlines()[0]} -> answering '{answer}' (non-interactive)")
+        self._write(f"[{title}] {message} -> {answer}")
+        return self.assume_yes
+
+
+class TkReporter(Reporter):
+    """דיווח בחלונות messagebox של tkinter (טעינה עצלה של tkinter)
+
+    Tk אינו thread-safe - הודעות מ-thread אחר נרשמות ללוג (warning) ולא מוצגות,
+    ושאלת אישור מ-thread אחר נענית "לא".
+    """
+
+    def __init__(self):
+        from tkinter import messagebox
+        self._messagebox = messagebox
+
+    @staticmethod
+    def _on_main_thread():
+        return threading.current_thread() is threading.main_thread()
+
+    def info(self, title, message):
+        if self._on_main_thread():
+            self._messagebox.showinfo(title, message)
+        else:
+            logger.warning(f"{title}: {message} (not shown - reported from a background thread)")
+
+    def error(self, title, message):
+        if self._on_main_thread():
+            self._messagebox.showerror(title, message)
+        else:
+            logger.warning(f"{title}: {message} (error dialog not shown - reported from a background thread)")
+
+    def confirm(self, title, message):
+        if not self._on_main_thread():
+            logger.warning(f"{title}: {message} (cannot ask from a background thread - answering no)")
+            return False
+        return self._messagebox.askyesno(title, message)
+
+
+class QueueReporter(Reporter):
+    """דיווח מ-thread רקע דרך תור שהממשק הגרפי קורא (Tk עצמו נשאר ב-thread הראשי)
+
+    כל הודעה היא tuple: ('info' / 'error', title, message). שאלת אישור נשלחת
+    כ-('confirm', title, message, reply) ו-thread ההרצה מחכה עד שהממשק קורא
+    ל-reply(answer).
+    """
+
+    def __init__(self, event_queue):
+        self.event_queue = event_queue
+
+    def info(self, title, message):
+        self.event_queue.put(('info', title, message))
+
+    def error(self, title, message):
+        self.event_queue.put(('error', title, message))
+
+    def confirm(self, title, message):
+        answered = threading.Event()
+        answer = []
+
+        def reply(value):
+            answer.append(bool(value))
+            answered.set()
+
+        self.event_queue.put(('confirm', title, message, reply))
+        answered.wait()
+        return answer[0]
@@ -0,0 +1,116 @@
+import csv
+import datetime
+import decimal
+import json
+import logging
+import os
+import re
+
+
+logger = logging.getLogger(__name__)
+
+RESULT_EXPORT_FORMATS = ('csv', 'jsonl')
+
+# שורות שנקראות מהשרת בכל פעם - הזיכרון חסום בגודל הזה ולא בגודל התוצאה
+FETCH_ROWS = 1000
+
+# כל תו אחר (כולל מפרידי תיקיות ו-%) מקודד כ-%XX - כך שנתיבים שונים לא מקבלים אותו שם
+_UNSAFE_NAME_RE = re.compile(r'[^\w.-]')
+
+
+def _escape_name(text):
+    return _UNSAFE_NAME_RE.sub(lambda match: ''.join(f'%{byte:02X}' for byte in match.group().encode('utf-8')), text)
+
+
+def _json_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            return value.decode('utf-8')
+        except UnicodeDecodeError:
+            return value.hex()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+        return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    return str(value)
+
+
+class _CsvWriter:
+    def __init__(self, result_file, columns):
+        self.writer = csv.writer(result_file)
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(
+            [value.decode('utf-8', 'replace') if isinstance(value, (bytes, bytearray)) else value for value in row]
+            for row in rows
+        )
+
+
+class _JsonLinesWriter:
+    def __init__(self, result_file, columns):
+        self.result_file = result_file
+        self.columns = columns
+
+    def write_rows(self, rows):
+        self.result_file.writelines(
+            json.dumps(dict(zip(self.columns, row)), ensure_ascii=False, default=_json_value) + '\n'
+            for row in rows
+        )
+
+
+class ResultExporter:
+    """כותב את תוצאות ה-SELECT / SHOW של סקריפט לקבצים - קובץ לכל הצהרה
+
+    שם הקובץ נגזר מהנתיב המלא של הסקריפט יחסית ל-script_root (כולל שם הקובץ
+    המלא) ומאינדקס ההצהרה בסקריפט, למשל results/qa_db/reports%2Fcheck_totals.sql.00012.csv
+    """
+
+    def __init__(self, directory, result_format, script_path, script_root=None):
+        if result_format not in RESULT_EXPORT_FORMATS:
+            raise ValueError(f"Unknown result export format '{result_format}' "
+                             f"(expected one of: {', '.join(RESULT_EXPORT_FORMATS)})")
+        self.directory = directory
+        self.result_format = result_format
+        name = os.path.relpath(script_path, script_root) if script_root else script_path
+        self.prefix = _escape_name(name.replace('\\', '/'))
+        self.files = 0
+
+    def path_for(self, statement_index):
+        return os.path.join(self.directory, f"{self.prefix}.{statement_index:05d}.{self.result_format}")
+
+    def open(self, statement_index, columns):
+        """פותח את קובץ התוצאה של ההצהרה; מחזיר (קובץ, writer)"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path_for(statement_index)
+        result_file = open(path, 'w', encoding='utf-8', newline='')
+        writer_class = _CsvWriter if self.result_format == 'csv' else _JsonLinesWriter
+        self.files += 1
+        logger.debug("Exporting result of statement %d to %s", statement_index, path)
+        return result_file, writer_class(result_file, list(columns))
+
+
+def drain_result(cursor, exporter=None, statement_index=0):
+    """קורא את התוצאה הנוכחית של ה-cursor עד הסוף, FETCH_ROWS שורות בכל פעם
+
+    עם cursor לא-buffered השורות מגיעות מהשרת תוך כדי הקריאה, כך שגם תוצאה
+    של מיליוני שורות לא נטענת לזיכרון. אם ניתן exporter, השורות נכתבות לקובץ
+    של ההצהרה; אחרת הן נזרקות (רק כדי שהחיבור יהיה פנוי להצהרה הבאה).
+    מחזיר את מספר השורות.
+    """
+    result_file = writer = None
+    if exporter is not None:
+        result_file, writer = exporter.open(statement_index, cursor.column_names)
+    rows = 0
+    try:
+        while True:
+            chunk = cursor.fetchmany(FETCH_ROWS)
+            if not chunk:
+                break
+            rows += len(chunk)
+            if writer is not None:
+                writer.write_rows(chunk)
+    finally:
+        if result_file is not None:
+            result_file.close()
+    return rows
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import struct
+import threading
+
+from ledger import file_sha256
+from script_files import script_size
+
+
+logger = logging.getLogger(__name__)
+
+# גרסת הפורמט - נכנסת למפתח, כך ששינוי ב-tokenizer או בפורמט פוסל את המטמון הישן
+CACHE_FORMAT_VERSION = 2
+
+# כל הצהרה נשמרת כאורך (8 בתים) ואחריו הטקסט ב-UTF-8
+_LENGTH = struct.Struct('<Q')
+
+_cache_lock = threading.Lock()
+_cache_instance = None
+
+
+class ScriptCache:
+    """מטמון על הדיסק של סקריפטים מעובדים ומפורקים להצהרות
+
+    המפתח הוא hash של תוכן הקובץ יחד עם פרמטרי ההחלפה (שם מסד היעד), כך
+    שהרצות חוזרות ויעדים נוספים מדלגים על קריאה, החלפה ופירוק מחדש.
+    הגודל הכולל חסום; הרשומות שלא נעשה בהן שימוש הכי הרבה זמן נמחקות ראשונות.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def cache_path(self, script_path, db_name):
+        key_source = f"{CACHE_FORMAT_VERSION}|{file_sha256(script_path)}|{db_name or ''}"
+        key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, key + '.stmts')
+
+    def iter_statements(self, script_path, db_name, produce):
+        """מחזיר את הצהרות הסקריפט מהמטמון, או מ-produce() תוך כדי כתיבה למטמון
+
+        produce - פונקציה שמחזירה iterable של הצהרות (נקראת רק כשאין רשומה)
+        """
+        if script_size(script_path) > self.max_bytes:
+            yield from produce()
+            return
+
+        path = self.cache_path(script_path, db_name)
+        try:
+            cache_file = open(path, 'rb')
+        except FileNotFoundError:
+            self.misses += 1
+            logger.debug("Script cache miss: %s", script_path)
+            yield from self._fill(path, produce())
+            return
+
+        self.hits += 1
+        logger.debug("Script cache hit: %s", script_path)
+        with cache_file:
+            # עדכון זמן השימוש האחרון - משמש לסדר הפינוי (LRU)
+            os.utime(path)
+            yield from _read_statements(cache_file)
+
+    def _fill(self, path, statements):
+        """מעביר את ההצהרות הלאה וכותב אותן לרשומה חדשה; רשומה נשמרת רק אם הזרם נקרא עד סופו"""
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        completed = False
+        try:
+            with open(temp_path, 'wb') as temp_file:
+                for statement in statements:
+                    data = statement.encode('utf-8')
+                    temp_file.write(_LENGTH.pack(len(data)))
+                    temp_file.write(data)
+                    yield statement
+            os.replace(temp_path, path)
+            completed = True
+        finally:
+            if not completed:
+                _remove_quietly(temp_path)
+        self.evict()
+
+    def evict(self):
+        """מוחק את הרשומות הישנות ביותר עד שהגודל הכולל בתוך המגבלה"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.stmts'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            _remove_quietly(path)
+            total -= size
+            logger.debug(f"Evicted script cache entry: {path}")
+
+
+def _read_statements(cache_file):
+    """קורא הצהרות מרשומת מטמון"""
+    header_size = _LENGTH.size
+    while True:
+        header = cache_file.read(header_size)
+        if len(header) < header_size:
+            return
+        (length,) = _LENGTH.unpack(header)
+        yield cache_file.read(length).decode('utf-8')
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def get_script_cache(directory, max_bytes):
+    """מחזיר מופע משותף של המטמון (נוצר פעם אחת לכל תהליך)"""
+    global _cache_instance
+    with _cache_lock:
+        if _cache_instance is None or _cache_instance.directory != directory:
+            _cache_instance = ScriptCache(directory, max_bytes)
+            logger.info(f"Using script cache at {directory} (max {max_bytes // (1024 * 1024)} MB)")
+        return _cache_instance
@@ -0,0 +1,88 @@
+import gzip
+import io
+import logging
+import lzma
+import os
+import struct
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+# סקריפטים דחוסים נקראים כזרם - בלי לפרוס אותם לדיסק
+COMPRESSED_EXTENSIONS = ('.sql.gz', '.sql.zst', '.sql.xz')
+SCRIPT_EXTENSIONS = ('.sql',) + COMPRESSED_EXTENSIONS
+
+# יחס דחיסה משוער לטקסט SQL - להערכת הגודל כשהקובץ לא שומר את הגודל המקורי
+ESTIMATED_COMPRESSION_RATIO = 6
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# שגיאות של קובץ דחוס פגום או קטוע
+DECOMPRESSION_ERRORS = (EOFError, zlib.error, lzma.LZMAError, gzip.BadGzipFile)
+if zstandard is not None:
+    DECOMPRESSION_ERRORS += (zstandard.ZstdError,)
+
+_MAX_DEFLATE_RATIO = 1032
+
+# כמה בתים לקרוא מהקובץ הדחוס בכל פעם
+_READ_BUFFER_BYTES = 1024 * 1024
+
+
+class MissingDecompressorError(ValueError):
+    """סקריפט דחוס בפורמט שהחבילה לפריסה שלו לא מותקנת (.sql.zst בלי zstandard)"""
+
+
+def is_script_file(name):
+    return name.lower().endswith(SCRIPT_EXTENSIONS)
+
+
+def is_compressed_script(name):
+    return name.lower().endswith(COMPRESSED_EXTENSIONS)
+
+
+def _open_zstd(script_path):
+    if zstandard is None:
+        raise MissingDecompressorError(f"Reading {os.path.basename(script_path)} needs the 'zstandard' package "
+                                       f"(pip install zstandard)")
+    raw = open(script_path, 'rb')
+    try:
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_size=_READ_BUFFER_BYTES, closefd=True)
+    except BaseException:
+        raw.close()
+        raise
+
+
+def open_script(script_path):
+    """פותח סקריפט לקריאה כטקסט UTF-8 - .sql רגיל, או .sql.gz / .sql.zst / .sql.xz
+    שנפרסים תוך כדי קריאה (הזיכרון חסום בגודל ה-buffer ולא בגודל הקובץ)"""
+    name = script_path.lower()
+    if name.endswith('.gz'):
+        binary = gzip.open(script_path, 'rb')
+    elif name.endswith('.xz'):
+        binary = lzma.open(script_path, 'rb')
+    elif name.endswith('.zst'):
+        binary = _open_zstd(script_path)
+    else:
+        return open(script_path, 'r', encoding='utf-8')
+    return io.TextIOWrapper(io.BufferedReader(binary, _READ_BUFFER_BYTES), encoding='utf-8')
+
+
+def script_size(script_path):
+    """גודל הסקריפט אחרי פריסה (להתקדמות ולהערכת זמן) - מדויק ל-.sql, ול-gzip
+    מתוך הגודל שנשמר בסוף הקובץ; לשאר הקבצים הדחוסים הערכה לפי יחס דחיסה"""
+    size = os.path.getsize(script_path)
+    if not is_compressed_script(script_path):
+        return size
+    if script_path.lower().endswith('.gz') and size >= 4:
+        with open(script_path, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            (original,) = struct.unpack('<I', f.read(4))
+        # gzip שומר את הגודל modulo 2^32 - בקובץ של יותר מ-4GB (או קובץ קטוע) הערך
+        # לא שימושי; deflate לא דוחס יותר מ-1:1032
+        if size <= original <= size * _MAX_DEFLATE_RATIO:
+            return original
+    return size * ESTIMATED_COMPRESSION_RATIO
@@ -0,0 +1,54 @@
+import logging
+import re
+
+import mysql.connector
+
+
+logger = logging.getLogger(__name__)
+
+_VARIABLE_NAME_RE = re.compile(r'^\w+$')
+
+
+def _check_variable_names(settings):
+    for name in settings:
+        if not _VARIABLE_NAME_RE.match(name):
+            raise ValueError(f"Invalid session variable name: {name!r}")
+
+
+def apply_session_settings(connection, settings):
+    """שומר את הערכים הנוכחיים של משתני ה-session ומחיל את הערכים החדשים
+
+    מחזיר את הערכים המקוריים לשחזור עם restore_session_settings.
+    """
+    _check_variable_names(settings)
+    names = list(settings)
+    saved = {}
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT " + ", ".join(f"@@SESSION.{name}" for name in names))
+        current = dict(zip(names, cursor.fetchone()))
+        for name in names:
+            cursor.execute(f"SET SESSION {name} = %s", (settings[name],))
+            saved[name] = current[name]
+    except mysql.connector.Error:
+        # חלק מהמשתנים כבר שונו - מחזירים אותם לפני שמדווחים על השגיאה
+        restore_session_settings(connection, saved)
+        raise
+    finally:
+        cursor.close()
+
+    logger.debug(f"Applied session settings: {settings}")
+    return saved
+
+
+def restore_session_settings(connection, saved):
+    """מחזיר משתני session לערכים המקוריים; כשל בשחזור נרשם ללוג בלבד"""
+    cursor = connection.cursor()
+    try:
+        for name, value in saved.items():
+            cursor.execute(f"SET SESSION {name} = %s", (value,))
+        logger.debug(f"Restored session settings: {saved}")
+    except mysql.connector.Error as e:
+        logger.warning(f"Failed to restore session settings {saved}: {e}")
+    finally:
+        cursor.close()
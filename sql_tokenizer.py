@@ -0,0 +1,153 @@
+import io
+import re
+
+
+# זיהוי פקודת DELIMITER של לקוח mysql בתחילת שורה
+_DELIMITER_RE = re.compile(r'\s*delimiter\s+(\S+)', re.IGNORECASE)
+
+# סיום מחרוזת - תו בריחה (כולל תו הבא) או מרכאה סוגרת
+_QUOTE_END_RE = {
+    "'": re.compile(r"\\.|'", re.DOTALL),
+    '"': re.compile(r'\\.|"', re.DOTALL),
+    '`': re.compile(r'`'),
+}
+
+_TRANSACTION_START_RE = re.compile(r'(START\s+TRANSACTION|BEGIN(\s+WORK)?\s*$)', re.IGNORECASE)
+_TRANSACTION_END_RE = re.compile(r'(COMMIT|ROLLBACK)\b(?!\s+(WORK\s+)?TO\b)', re.IGNORECASE)
+_STANDALONE_RE = re.compile(
+    r'(CREATE\s+(DEFINER\s*=\s*\S+\s+)?(PROCEDURE|FUNCTION|TRIGGER|EVENT)\b|CALL\b|LOAD\s+DATA\b|/\*@chunk\b)',
+    re.IGNORECASE
+)
+
+# הצהרות שמבצעות commit מרומז בשרת (DDL, הרשאות, LOCK TABLES)
+_IMPLICIT_COMMIT_RE = re.compile(
+    r'((CREATE|DROP)\s+(?!TEMPORARY\b)|ALTER\b|RENAME\b|TRUNCATE\b|GRANT\b|REVOKE\b|(UN)?LOCK\s+TABLES?\b)',
+    re.IGNORECASE
+)
+
+
+def _token_pattern(delimiter):
+    """בונה את ביטוי החיפוש לתווים מיוחדים עבור מפריד נתון"""
+    return re.compile(r"""['"`#]|--(?=\s|$)|/\*|""" + re.escape(delimiter))
+
+
+def iter_sql_statements(lines, delimiter=';', state=None):
+    """מחזיר (generator) את הצהרות ה-SQL מתוך זרם שורות במעבר יחיד
+
+    תומך במחרוזות ('...', "...", `...`) כולל תווי בריחה, בהערות (--, #, /* */)
+    ובפקודות DELIMITER. הערות /*! ... */ ו-/*+ ... */ נשמרות כי השרת מפרש אותן.
+    הזיכרון חסום בגודל ההצהרה הגדולה ביותר ולא בגודל הקובץ.
+    state - מילון אופציונלי שמתמלא בסוף הזרם: delimiter, quote (מרכאה שלא נסגרה),
+    in_comment (הערה שלא נסגרה) ו-unterminated (ההצהרה האחרונה בלי מפריד).
+    """
+    pattern = _token_pattern(delimiter)
+    pieces = []          # חלקי ההצהרה הנוכחית
+    significant = False  # האם יש בהצהרה תוכן מלבד רווחים והערות
+    quote = None         # תו המרכאה הפתוחה, אם יש
+    in_comment = False   # בתוך הערת /* */
+    keep_comment = False
+
+    for line in lines:
+        # פקודת DELIMITER מזוהה רק בתחילת הצהרה חדשה
+        if quote is None and not in_comment and not significant:
+            match = _DELIMITER_RE.match(line)
+            if match:
+                delimiter = match.group(1)
+                pattern = _token_pattern(delimiter)
+                pieces = []
+                continue
+
+        pos = 0
+        length = len(line)
+        while pos < length:
+            if quote is not None:
+                match = _QUOTE_END_RE[quote].search(line, pos)
+                if match is None:
+                    pieces.append(line[pos:])
+                    break
+                if match.group() == quote:
+                    quote = None
+                pieces.append(line[pos:match.end()])
+                pos = match.end()
+                continue
+
+            if in_comment:
+                end = line.find('*/', pos)
+                if end == -1:
+                    if keep_comment:
+                        pieces.append(line[pos:])
+                    break
+                pieces.append(line[pos:end + 2] if keep_comment else ' ')
+                in_comment = False
+                pos = end + 2
+                continue
+
+            match = pattern.search(line, pos)
+            if match is None:
+                rest = line[pos:]
+                pieces.append(rest)
+                significant = significant or bool(rest.strip())
+                break
+
+            before = line[pos:match.start()]
+            pieces.append(before)
+            significant = significant or bool(before.strip())
+            token = match.group()
+            pos = match.end()
+
+            if token in _QUOTE_END_RE:
+                quote = token
+                pieces.append(token)
+                significant = True
+            elif token == '#' or token == '--':
+                # הערת שורה - שומרים רק את ירידת השורה
+                pieces.append('\n')
+                break
+            elif token == '/*':
+                in_comment = True
+                # הערות /*! ו-/*+ נשלחות לשרת; /*@chunk היא הוראת ביצוע (chunked.py)
+                keep_comment = line[pos:pos + 1] in ('!', '+') or line[pos:pos + 6].lower() == '@chunk'
+                if keep_comment:
+                    pieces.append(token)
+                    significant = True
+            else:
+                # הגענו למפריד - סוף הצהרה
+                if significant:
+                    yield ''.join(pieces).strip()
+                pieces = []
+                significant = False
+
+    if state is not None:
+        state.update(delimiter=delimiter, quote=quote, in_comment=in_comment, unterminated=significant)
+    if significant:
+        yield ''.join(pieces).strip()
+
+
+def split_sql_statements(script_content, delimiter=';'):
+    """מפצל טקסט סקריפט מלא לרשימת הצהרות"""
+    return list(iter_sql_statements(io.StringIO(script_content), delimiter))
+
+
+def is_transaction_start(statement):
+    """האם ההצהרה פותחת טרנזקציה מפורשת (START TRANSACTION / BEGIN)"""
+    return _TRANSACTION_START_RE.match(statement) is not None
+
+
+def is_transaction_end(statement):
+    """האם ההצהרה סוגרת טרנזקציה מפורשת (COMMIT / ROLLBACK)"""
+    return _TRANSACTION_END_RE.match(statement) is not None
+
+
+def is_standalone_statement(statement):
+    """האם ההצהרה צריכה round-trip משלה (גוף מורכב, CALL שמחזיר כמה תוצאות או LOAD DATA)"""
+    return _STANDALONE_RE.match(statement) is not None
+
+
+def is_implicit_commit(statement):
+    """האם השרת מבצע commit מרומז לפני/אחרי ההצהרה (DDL וכו') - לא ניתן לבטל אותה ב-rollback"""
+    return _IMPLICIT_COMMIT_RE.match(statement) is not None
+
+
+def utf8_length(statement):
+    """גודל ההצהרה בבתים כפי שנשלחת לשרת (UTF-8) - ולא מספר התווים"""
+    return len(statement) if statement.isascii() else len(statement.encode('utf-8'))
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+from mysql.connector import errorcode
+
+
+logger = logging.getLogger(__name__)
+
+# טבלה במסד התבנית עם ה-hash של התוכנית שבנתה אותו - לא מועתקת לשיבוטים
+TEMPLATE_MARKER_TABLE = '_template_plan'
+
+_DEFINER_RE = re.compile(r'DEFINER\s*=\s*(`[^`]*`|\S+)@(`[^`]*`|\S+)\s*', re.IGNORECASE)
+
+# עמודות טקסט שבהן שם התבנית (שהחליף את שם מסד הנתונים בסקריפטים) מוחלף בשם היעד
+_TEXT_TYPES = {'char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext'}
+
+
+def compute_plan_hash(stages, script_profiles, script_hashes):
+    """hash של תוכנית ההרצה - סדר השלבים והקבוצות, פרופילי ה-session וה-hash של כל סקריפט
+
+    script_hashes - מילון "folder/filename" -> SHA-256 של הסקריפט (None לסקריפט חסר)
+    """
+    plan = {
+        'stages': [[[group_name, [list(entry) for entry in scripts]] for group_name, scripts in stage]
+                   for stage in stages],
+        'profiles': sorted([folder_name, filename, profile]
+                           for (folder_name, filename), profile in script_profiles.items()),
+        'scripts': sorted(script_hashes.items(), key=lambda item: item[0]),
+    }
+    return hashlib.sha256(json.dumps(plan, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def read_template_hash(cursor, template_name):
+    """ה-hash שנרשם במסד התבנית, או None אם התבנית לא קיימת / לא הושלמה"""
+    try:
+        cursor.execute(f"SELECT plan_hash FROM `{template_name}`.`{TEMPLATE_MARKER_TABLE}`")
+        row = cursor.fetchone()
+    except mysql.connector.Error as e:
+        if e.errno in (errorcode.ER_BAD_DB_ERROR, errorcode.ER_NO_SUCH_TABLE):
+            return None
+        raise
+    return row[0] if row else None
+
+
+def mark_template(connection, template_name, plan_hash):
+    """רושם שהתבנית נבנתה בהצלחה מהתוכנית הזו"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS `{template_name}`.`{TEMPLATE_MARKER_TABLE}` ("
+            "plan_hash CHAR(64) NOT NULL, "
+            "built_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP"
+            ") CHARACTER SET utf8mb4"
+        )
+        cursor.execute(f"DELETE FROM `{template_name}`.`{TEMPLATE_MARKER_TABLE}`")
+        cursor.execute(f"INSERT INTO `{template_name}`.`{TEMPLATE_MARKER_TABLE}` (plan_hash) VALUES (%s)",
+                       (plan_hash,))
+        connection.commit()
+    finally:
+        cursor.close()
+    logger.info(f"Template '{template_name}' marked with plan {plan_hash[:12]}")
+
+
+def _retarget_definition(definition, template_name, target_name):
+    """מפנה הגדרה (table / view / trigger / routine) מהתבנית ליעד; ה-DEFINER מוסר (= המשתמש הנוכחי)
+
+    כל הופעה של שם התבנית מוחלפת - עם או בלי גרשיים הפוכים, וגם בתוך מחרוזות (גוף
+    trigger / routine נשמר כמו שנכתב) - כמו החלפת שם מסד הנתונים בסקריפטים בהרצה ישירה.
+    """
+    definition = _DEFINER_RE.sub('', definition)
+    return definition.replace(template_name, target_name)
+
+
+def _list_objects(cursor, template_name):
+    cursor.execute(
+        "SELECT TABLE_NAME, TABLE_TYPE FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s",
+        (template_name,)
+    )
+    tables, views = [], []
+    for name, table_type in cursor.fetchall():
+        if name == TEMPLATE_MARKER_TABLE:
+            continue
+        (views if table_type == 'VIEW' else tables).append(name)
+    cursor.execute("SELECT TRIGGER_NAME FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA = %s",
+                   (template_name,))
+    triggers = [name for (name,) in cursor.fetchall()]
+    cursor.execute(
+        "SELECT ROUTINE_NAME, ROUTINE_TYPE FROM information_schema.ROUTINES WHERE ROUTINE_SCHEMA = %s",
+        (template_name,)
+    )
+    routines = cursor.fetchall()
+    return tables, views, triggers, routines
+
+
+def _copy_table(connection, template_name, target_name, table):
+    """יוצר את הטבלה ביעד (SHOW CREATE TABLE - כולל מפתחות זרים) ומעתיק את הנתונים
+
+    שם התבנית מוחלף בשם היעד בהגדרה ובעמודות הטקסט, כך שהטבלה זהה להרצה ישירה על היעד.
+    """
+    started = time.perf_counter()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(f"SHOW CREATE TABLE `{template_name}`.`{table}`")
+        cursor.execute(_retarget_definition(cursor.fetchone()[1], template_name, target_name))
+        # עמודות מחושבות (GENERATED) לא מקבלות ערך ב-INSERT
+        cursor.execute(
+            "SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND GENERATION_EXPRESSION = '' "
+            "ORDER BY ORDINAL_POSITION",
+            (template_name, table)
+        )
+        columns = cursor.fetchall()
+        names = ', '.join(f"`{name}`" for name, _ in columns)
+        values = ', '.join(
+            f"REPLACE(`{name}`, %(template)s, %(target)s)" if data_type.lower() in _TEXT_TYPES else f"`{name}`"
+            for name, data_type in columns
+        )
+        cursor.execute(f"INSERT INTO `{table.replace(template_name, target_name)}` ({names}) "
+                       f"SELECT {values} FROM `{template_name}`.`{table}`",
+                       {'template': template_name, 'target': target_name})
+        rows = cursor.rowcount
+        connection.commit()
+    finally:
+        cursor.close()
+    logger.debug("Cloned table %s (%d rows) in %.2fs", table, rows, time.perf_counter() - started)
+    return rows
+
+
+def _create_views(cursor, template_name, target_name, views):
+    """יוצר את ה-views; view שתלוי ב-view שעוד לא נוצר מנוסה שוב בסבב הבא"""
+    pending = list(views)
+    while pending:
+        failed = []
+        last_error = None
+        for view in pending:
+            cursor.execute(f"SHOW CREATE VIEW `{template_name}`.`{view}`")
+            definition = _retarget_definition(cursor.fetchone()[1], template_name, target_name)
+            try:
+                cursor.execute(definition)
+            except mysql.connector.Error as e:
+                if e.errno != errorcode.ER_NO_SUCH_TABLE:
+                    raise
+                failed.append(view)
+                last_error = e
+        if len(failed) == len(pending):
+            raise last_error
+        pending = failed
+
+
+def clone_database(connection_manager, template_name, target_name, workers=4, progress=None):
+    """משבט את מסד התבנית למסד חדש: טבלאות במקביל (חיבור לכל worker), ואחריהן
+    views, triggers ו-routines
+
+    connection_manager - ConnectionManager של השרת (החיבור המשותף משמש ליצירת המסד)
+    progress - RunProgress; ביטול נבדק לפני כל טבלה
+    מחזיר מילון עם מספר האובייקטים והשורות שהועתקו.
+    """
+    started = time.perf_counter()
+    connection = connection_manager.shared_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT SCHEMA_NAME FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s", (target_name,))
+        if cursor.fetchone() is not None:
+            raise ValueError(f"Database '{target_name}' already exists - drop it before cloning from a template")
+        cursor.execute(
+            "SELECT DEFAULT_CHARACTER_SET_NAME, DEFAULT_COLLATION_NAME FROM information_schema.SCHEMATA "
+            "WHERE SCHEMA_NAME = %s",
+            (template_name,)
+        )
+        charset, collation = cursor.fetchone()
+        tables, views, triggers, routines = _list_objects(cursor, template_name)
+        logger.info(f"Cloning '{template_name}' into '{target_name}': {len(tables)} tables, {len(views)} views, "
+                    f"{len(triggers)} triggers, {len(routines)} routines")
+        cursor.execute(f"CREATE DATABASE `{target_name}` CHARACTER SET {charset} COLLATE {collation}")
+    finally:
+        cursor.close()
+    try:
+        rows = _clone_objects(connection_manager, connection, template_name, target_name,
+                              tables, views, triggers, routines, workers, progress)
+    except BaseException:
+        # שיבוט חלקי לא נשאר - אחרת כל הרצה הבאה נכשלת על "already exists"
+        logger.error(f"Cloning into '{target_name}' failed - dropping the partial database")
+        _drop_database(connection_manager, target_name)
+        raise
+
+    duration = time.perf_counter() - started
+    logger.info(f"Cloned '{template_name}' into '{target_name}': {len(tables)} tables, {rows} rows in {duration:.1f}s")
+    return {
+        'tables': len(tables),
+        'views': len(views),
+        'triggers': len(triggers),
+        'routines': len(routines),
+        'rows': rows,
+        'duration': duration,
+    }
+
+
+def _drop_database(connection_manager, name):
+    # מסד שנמחק לא יכול להישאר מסד ברירת המחדל של חיבורים חדשים
+    connection_manager.config.pop('database', None)
+    try:
+        connection = connection_manager.shared_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+        finally:
+            cursor.close()
+    except mysql.connector.Error as e:
+        logger.warning(f"Could not drop partial database '{name}': {e}")
+
+
+def _clone_objects(connection_manager, connection, template_name, target_name, tables, views, triggers, routines,
+                   workers, progress):
+    """מעתיק את הטבלאות במקביל ויוצר את ה-views, ה-triggers וה-routines; מחזיר את מספר השורות"""
+    connection_manager.use_database(target_name)
+
+    def copy(table):
+        if progress is not None:
+            progress.check_cancelled()
+        worker_connection = connection_manager.connect()
+        try:
+            worker_cursor = worker_connection.cursor()
+            # הנתונים כבר עברו את הבדיקות בתבנית - סדר הטבלאות לא משנה
+            worker_cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+            worker_cursor.close()
+            return _copy_table(worker_connection, template_name, target_name, table)
+        finally:
+            worker_connection.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        rows = sum(executor.map(copy, tables))
+
+    # triggers נוצרים אחרי העתקת הנתונים, כך שלא מופעלים על השורות שהועתקו
+    cursor = connection.cursor()
+    try:
+        _create_views(cursor, template_name, target_name, views)
+        for trigger in triggers:
+            cursor.execute(f"SHOW CREATE TRIGGER `{template_name}`.`{trigger}`")
+            cursor.execute(_retarget_definition(cursor.fetchone()[2], template_name, target_name))
+        for name, routine_type in routines:
+            cursor.execute(f"SHOW CREATE {routine_type} `{template_name}`.`{name}`")
+            cursor.execute(_retarget_definition(cursor.fetchone()[2], template_name, target_name))
+        connection.commit()
+    finally:
+        cursor.close()
+    return rows